@@ -1,19 +1,29 @@
 import os
-from flask import Blueprint, render_template, redirect, url_for, request, flash, session
-from models import db, Product
+import math
+import base64
+from datetime import datetime
+from flask import Blueprint, render_template, redirect, url_for, request, flash, session, jsonify, Response, stream_with_context, stream_template
+from sqlalchemy import and_, or_
+from models import db, Product, Order
+from catalog_cache import catalog_cache, bump_catalog_version
+from image_jobs import queue_product_image
+from jobs import get_status
+from bulk import detect_format, export_rows, import_products
+from catalog import count_products, filters_from_args, keyset_page
+from metrics import registry as metrics_registry
+import order_rollups
+import related
 from dotenv import load_dotenv
-import cloudinary
-import cloudinary.uploader
 
 load_dotenv()
 admin_bp = Blueprint("admin", __name__, url_prefix="/admin")
 
-# 🧩 Cấu hình Cloudinary
-cloudinary.config(
-    cloud_name=os.getenv("CLOUDINARY_CLOUD_NAME"),
-    api_key=os.getenv("CLOUDINARY_API_KEY"),
-    api_secret=os.getenv("CLOUDINARY_API_SECRET")
-)
+# danh sách admin: cột sắp xếp được -> sort của catalog.sort_keys
+ADMIN_SORTS = ("newest", "oldest", "title_asc", "title_desc", "price_asc", "price_desc", "relevance")
+ADMIN_PER_PAGE = 50
+# trang đánh số (OFFSET) chỉ tới đây, sâu hơn thì đi tiếp bằng cursor
+MAX_NUMBERED_PAGES = 20
+ORDERS_PER_PAGE = 50
 
 # 🧠 Hàm kiểm tra đăng nhập
 def require_login():
@@ -46,8 +56,47 @@ def logout():
 def index():
     if not session.get("is_admin"):
         return redirect(url_for("admin.login"))
-    products = Product.query.order_by(Product.id.desc()).all()
-    return render_template("admin/index.html", products=products)
+
+    # cùng bộ lọc / sắp xếp / tìm kiếm với /api/products (catalog.py)
+    filters = filters_from_args(request.args)
+    sort = request.args.get("sort", type=str)
+    if sort not in ADMIN_SORTS or (sort == "relevance" and not filters["q"]):
+        sort = None
+    per_page = max(1, min(request.args.get("per_page", ADMIN_PER_PAGE, type=int), 200))
+    cursor = request.args.get("cursor", type=str)
+    page = max(1, min(request.args.get("page", 1, type=int), MAX_NUMBERED_PAGES))
+
+    try:
+        if cursor:
+            # trang sâu: keyset, không OFFSET
+            products, next_cursor = keyset_page(filters, sort, cursor, per_page)
+            page = None
+        else:
+            products, next_cursor = keyset_page(filters, sort, None, per_page, offset=(page - 1) * per_page)
+    except ValueError:
+        flash("❌ Cursor không hợp lệ", "danger")
+        return redirect(_list_url(cursor=None, page=None))
+
+    total = count_products(filters)
+    # stream HTML từng phần, trang luôn tối đa per_page dòng
+    return Response(stream_template(
+        "admin/index.html",
+        products=products,
+        filters=filters,
+        sort=sort or "newest",
+        page=page,
+        pages=min(math.ceil(total / per_page), MAX_NUMBERED_PAGES),
+        total=total,
+        next_cursor=next_cursor,
+        list_url=_list_url,
+    ))
+
+
+def _list_url(**changes):
+    """URL của danh sách admin với query string hiện tại + thay đổi (None = bỏ)."""
+    args = request.args.to_dict()
+    args.update(changes)
+    return url_for("admin.index", **{k: v for k, v in args.items() if v not in (None, "")})
 
 # 🟢 Thêm sản phẩm
 @admin_bp.route("/add", methods=["GET", "POST"])
@@ -63,21 +112,21 @@ def add_product():
         rating = request.form.get("rating")
         image_file = request.files.get("image")
 
-        image_url = None
-        if image_file:
-            upload_result = cloudinary.uploader.upload(image_file)
-            image_url = upload_result.get("secure_url")
-
         product = Product(
             title=title,
             description=description,
             price=float(price or 0),
             category=category,
-            rating=float(rating or 0),
-            image=image_url
+            rating=float(rating or 0)
         )
         db.session.add(product)
         db.session.commit()
+        if image_file:
+            # ⏳ Ảnh được upload ở background, sản phẩm lưu ngay với trạng thái "pending"
+            queue_product_image(product, image_file)
+        bump_catalog_version()
+        # 🔗 Tính lại "sản phẩm tương tự" quanh sản phẩm mới (background)
+        related.queue_refresh([product.id])
         flash("✅ Đã thêm sản phẩm mới!", "success")
         return redirect(url_for("admin.index"))
 
@@ -92,29 +141,22 @@ def edit_product(product_id):
     product = Product.query.get_or_404(product_id)
 
     if request.method == "POST":
+        # vị trí cũ (danh mục, giá): hàng xóm cũ cũng cần tính lại "sản phẩm tương tự"
+        previous = [(product.id, product.category, product.price)]
         product.title = request.form.get("title")
         product.description = request.form.get("description")
         product.price = float(request.form.get("price") or 0)
         product.category = request.form.get("category")
         product.rating = float(request.form.get("rating") or 0)
 
+        db.session.commit()
+
         image_file = request.files.get("image")
         if image_file:
-            # 🧠 Nếu sản phẩm đã có ảnh Cloudinary cũ → xóa
-            if product.image and product.image.startswith("https://res.cloudinary.com/"):
-                try:
-                    # Tách public_id từ URL cũ
-                    old_public_id = product.image.split("/")[-1].split(".")[0]
-                    cloudinary.uploader.destroy(old_public_id)
-                    print(f"🗑️ Đã xóa ảnh cũ trên Cloudinary: {old_public_id}")
-                except Exception as e:
-                    print("⚠️ Không thể xóa ảnh cũ:", e)
-
-            # 🆕 Upload ảnh mới
-            upload_result = cloudinary.uploader.upload(image_file)
-            product.image = upload_result.get("secure_url")
-
-        db.session.commit()
+            # 🆕 Upload ảnh mới ở background; ảnh cũ được xóa khi upload xong
+            queue_product_image(product, image_file, old_image=product.image)
+        bump_catalog_version()
+        related.queue_refresh([product.id], previous)
         flash("✅ Cập nhật sản phẩm thành công!", "success")
         return redirect(url_for("admin.index"))
 
@@ -128,7 +170,136 @@ def delete_product(product_id):
         return redirect(url_for("admin.login"))
 
     product = Product.query.get_or_404(product_id)
+    previous = [(product.id, product.category, product.price)]
     db.session.delete(product)
     db.session.commit()
+    bump_catalog_version()
+    related.queue_refresh([product_id], previous)
     flash("🗑️ Đã xóa sản phẩm", "warning")
     return redirect(url_for("admin.index"))
+
+
+# 📊 Thống kê cache catalog (hit / miss)
+@admin_bp.route("/cache-stats")
+def cache_stats():
+    if not session.get("is_admin"):
+        return redirect(url_for("admin.login"))
+    return jsonify(catalog_cache.stats())
+
+
+# 📈 Số liệu request / SQL của process này (Prometheus: /metrics)
+@admin_bp.route("/metrics")
+def metrics_page():
+    if not session.get("is_admin"):
+        return redirect(url_for("admin.login"))
+    snapshot = metrics_registry.snapshot()
+    if request.args.get("format") == "json":
+        return jsonify(snapshot)
+    return render_template("admin/metrics.html", m=snapshot)
+
+
+# ⏳ Trạng thái job background (upload ảnh, ...)
+@admin_bp.route("/jobs/<job_id>")
+def job_status(job_id):
+    if not session.get("is_admin"):
+        return redirect(url_for("admin.login"))
+    status = get_status(job_id)
+    if status is None:
+        return jsonify({"error": "job not found"}), 404
+    return jsonify(status)
+
+
+# 📥 Nhập sản phẩm hàng loạt (CSV / JSONL, cập nhật theo SKU)
+@admin_bp.route("/import", methods=["GET", "POST"])
+def import_products_view():
+    if not session.get("is_admin"):
+        return redirect(url_for("admin.login"))
+
+    report = None
+    if request.method == "POST":
+        upload = request.files.get("file")
+        if not upload or not upload.filename:
+            flash("❌ Chưa chọn file!", "danger")
+            return redirect(url_for("admin.import_products_view"))
+        fmt = request.form.get("format") or detect_format(upload.filename)
+        dry_run = bool(request.form.get("dry_run"))
+        # đọc thẳng từ stream upload, không nạp cả file vào bộ nhớ
+        report = import_products(upload.stream, fmt, dry_run=dry_run)
+        if not dry_run and (report.inserted or report.updated):
+            # nhập hàng loạt: tính lại toàn bộ "sản phẩm tương tự" (background)
+            related.queue_rebuild()
+        flash(f"✅ Thêm {report.inserted}, cập nhật {report.updated}, {report.error_count} dòng lỗi"
+              + (" (chạy thử)" if dry_run else ""), "success" if not report.error_count else "warning")
+    return render_template("admin/import.html", report=report)
+
+
+# 📤 Xuất toàn bộ sản phẩm (stream, bộ nhớ không tăng theo số sản phẩm)
+@admin_bp.route("/export")
+def export_products():
+    if not session.get("is_admin"):
+        return redirect(url_for("admin.login"))
+    fmt = "jsonl" if request.args.get("format") == "jsonl" else "csv"
+    mimetype = "application/x-ndjson" if fmt == "jsonl" else "text/csv"
+    return Response(
+        stream_with_context(export_rows(fmt)),
+        mimetype=mimetype,
+        headers={"Content-Disposition": f"attachment; filename=products.{fmt}"},
+    )
+
+
+# 🧾 Đơn hàng: danh sách (keyset, mới nhất trước) + biểu đồ doanh thu từ bảng rollup
+@admin_bp.route("/orders")
+def orders():
+    if not session.get("is_admin"):
+        return redirect(url_for("admin.login"))
+
+    currency = request.args.get("currency", "USD", type=str)
+    # biểu đồ: chỉ đọc order_daily_rollups (vài trăm dòng), không quét bảng orders
+    try:
+        charts = {
+            "daily": order_rollups.daily(currency, days=request.args.get("days", 30, type=int)),
+            "monthly": order_rollups.monthly(currency, months=request.args.get("months", 12, type=int)),
+        }
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
+    if request.args.get("format") == "json":
+        return jsonify(dict(charts, currency=currency))
+
+    per_page = max(1, min(request.args.get("per_page", ORDERS_PER_PAGE, type=int), 200))
+    cursor = request.args.get("cursor", type=str)
+    # (created_at, id) giảm dần = đúng thứ tự của ix_orders_created_at_id
+    query = Order.query.order_by(Order.created_at.desc(), Order.id.desc())
+    if cursor:
+        try:
+            created_at, order_id = _decode_order_cursor(cursor)
+        except ValueError:
+            flash("❌ Cursor không hợp lệ", "danger")
+            return redirect(url_for("admin.orders", currency=currency))
+        query = query.filter(or_(Order.created_at < created_at,
+                                 and_(Order.created_at == created_at, Order.id < order_id)))
+    rows = query.limit(per_page + 1).all()
+    next_cursor = _encode_order_cursor(rows[per_page - 1]) if len(rows) > per_page else None
+
+    return render_template(
+        "admin/orders.html",
+        orders=rows[:per_page],
+        next_cursor=next_cursor,
+        first_page=not cursor,
+        currency=currency,
+        currencies=order_rollups.currencies() or ["USD"],
+        charts=charts,
+    )
+
+
+def _encode_order_cursor(order):
+    raw = f"{order.created_at.isoformat()}|{order.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def _decode_order_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode((cursor + "=" * (-len(cursor) % 4)).encode()).decode()
+        created_at, order_id = raw.split("|")
+        return datetime.fromisoformat(created_at), int(order_id)
+    except Exception:
+        raise ValueError("invalid cursor")
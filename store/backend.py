@@ -1,10 +1,9 @@
 import os
 from decimal import Decimal
-from flask import Flask, render_template, request, jsonify, redirect, url_for, flash, session
+from flask import Flask, render_template, request, jsonify, redirect, url_for, flash, abort
 from dotenv import load_dotenv
-from flask import Flask, session
-from flask_session import Session
-import redis
+from markupsafe import Markup
+from werkzeug.datastructures import MultiDict
 
 
 # load .env
@@ -13,25 +12,34 @@ load_dotenv()
 # IMPORTS: models provides db, Product, Order
 from models import db, Product, Order
 from forms import CheckoutForm
-
-# PayPal SDK
-from paypalcheckoutsdk.core import PayPalHttpClient, SandboxEnvironment
-from paypalcheckoutsdk.orders import OrdersCreateRequest, OrdersCaptureRequest
-
-# Flask-Migrate import
-from flask_migrate import Migrate
-
-app = Flask(__name__)
-app.config['SECRET_KEY'] = 'your-secret-key'
-
-# Cấu hình Redis làm nơi lưu session
-redis_url = os.getenv("REDIS_URL", "redis://localhost:6379")
-
-app.config["SESSION_TYPE"] = "redis"
-app.config["SESSION_REDIS"] = redis.from_url(redis_url)
-app.config["SESSION_PERMANENT"] = False
-app.config["SESSION_USE_SIGNER"] = True
-Session(app)
+from cart import cart_version, load_products, price_cart
+import cart_store
+from cart_store import add_item, current_cart, parse_ops, remove_item, set_item
+from catalog_cache import catalog_cache
+from serializers import GRID_FIELDS, parse_fields, serialize_product, serialize_products
+import json_provider
+import images
+import image_audit
+import jobs
+import bulk
+import catalog_gen
+import order_rollups
+import related
+import metrics
+import compression
+import static_assets
+import http_cache
+import db_engine
+from http_cache import conditional, conditional_on, conditional_page
+from catalog import build_product_query, count_products, filters_from_args, keyset_page
+import search
+import catalog_explain
+from facets import product_facets
+from paypal_gateway import PayPalError, get_gateway
+from payments import CaptureInProgress, capture_once
+
+# heavy SDKs (requests for PayPal, cloudinary, redis, alembic) are imported on first use,
+# so web workers boot fast; see bench_boot.py
 
 # ----- App factory / init -----
 def create_app():
@@ -43,62 +51,49 @@ def create_app():
     app.config['PERMANENT_SESSION_LIFETIME'] = 86400  # 1 ngày
 
 
+    db_engine.init_app(app)
     db.init_app(app)
+    metrics.init_app(app)
+    compression.init_app(app)
+    static_assets.init_app(app)
+    http_cache.init_app(app)
+    json_provider.init_app(app)
+    catalog_cache.init_app(app)
+    search.init_app(app)
+    catalog_explain.init_app(app)
+    images.init_app(app)
+    image_audit.init_app(app)
+    jobs.init_app(app)
+    bulk.init_app(app)
+    catalog_gen.init_app(app)
+    order_rollups.init_app(app)
+    related.init_app(app)
+    cart_store.init_app(app)
     return app
 
+# the one app instance: `flask` CLI (FLASK_APP=backend.py) and wsgi.py both use it
 app = create_app()
-migrate = Migrate(app, db)
+if os.environ.get("FLASK_RUN_FROM_CLI"):
+    # `flask db ...` only; alembic is not needed to serve requests
+    from flask_migrate import Migrate
+    migrate = Migrate(app, db)
 from admin import admin_bp
 app.register_blueprint(admin_bp)
 
 
 
-# ----- PayPal client factory -----
-def paypal_client():
-    client_id = os.getenv("PAYPAL_CLIENT_ID")
-    client_secret = os.getenv("PAYPAL_CLIENT_SECRET")
-    if not client_id or not client_secret:
-        raise RuntimeError("PAYPAL CLIENT ID / SECRET missing")
-    environment = SandboxEnvironment(client_id=client_id, client_secret=client_secret)
-    return PayPalHttpClient(environment)
+# ----- Helpers -----
+def _json_bytes(obj):
+    # serialized once, then stored as-is in the catalog cache
+    return app.json.dumps_bytes(obj)
 
 
-# ----- Helpers -----
-def _cart_summary_from_session():
-    """
-    Return dict { items: [...], total: float, count: int }
-    Items: { id, title, price (float), qty (int), subtotal (float), image }
-    """
-    cart = session.get("cart", {}) or {}
-    items = []
-    total = 0.0
-    count = 0
-    for pid_str, qty in cart.items():
-        try:
-            pid = int(pid_str)
-            qty_i = int(qty)
-        except Exception:
-            continue
-        product = Product.query.get(pid)
-        if not product:
-            continue
-        # ensure numeric price
-        try:
-            price = float(product.price)
-        except Exception:
-            price = 0.0
-        subtotal = price * qty_i
-        total += subtotal
-        count += qty_i
-        items.append({
-            "id": product.id,
-            "title": getattr(product, "title", None) or getattr(product, "name", ""),
-            "price": price,
-            "qty": qty_i,
-            "subtotal": subtotal,
-            "image": getattr(product, "image", "") or ""
-        })
-    return {"items": items, "total": total, "count": count}
+def _json_response(body):
+    return app.response_class(body, mimetype="application/json")
+
+
+# grid page size, same as state.per_page in products.js
+GRID_PER_PAGE = 9
 
 
 # ----- Routes: UI -----
@@ -108,28 +103,55 @@ def index():
 
 
 @app.route("/products")
+@conditional_page
 def products():
-    # the template + products.js will call /api/products to fetch JSON
-    return render_template("products.html")
+    # first grid page rendered here: no second round trip before products show up.
+    # products.js hydrates from the embedded state and only fetches on filter / "Xem thêm"
+    filters = filters_from_args(request.args)
+    sort = request.args.get("sort", type=str)
+    args = _grid_args(request.args)
+    page = app.json.loads(_cursor_page_body(args, filters, sort, None, GRID_PER_PAGE, GRID_FIELDS))
+    page["total"] = count_products(filters)
+    facets = app.json.loads(_facets_body(filters))
+    initial = {
+        "filters": {k: v for k, v in filters.items() if v is not None},
+        "sort": sort or "",
+        "per_page": GRID_PER_PAGE,
+        "page": page,
+        "facets": facets,
+    }
+    return render_template(
+        "products.html",
+        cards=[_card_html(p) for p in page["products"]],
+        page=page,
+        facets=facets,
+        filters=filters,
+        sort=sort or "",
+        initial=initial,
+    )
+
+
+def _grid_args(source):
+    """The args products.js sends for the first grid page: SSR and the API share one cache entry."""
+    args = MultiDict((k, source[k]) for k in ("q", "category", "price_min", "price_max", "sort") if source.get(k))
+    args.add("per_page", str(GRID_PER_PAGE))
+    args.add("fields", ",".join(GRID_FIELDS))
+    args.add("cursor", "")
+    args.add("with_total", "1")
+    return args
+
+
+def _card_html(p):
+    """Rendered grid card; cached per product and catalog version, so repeat SSR is a lookup."""
+    html = catalog_cache.value(("card", p["id"]), lambda: render_template("_product_card.html", p=p).encode())
+    return Markup(html.decode())
 
 
 @app.route("/cart")
 def view_cart():
-    cart = session.get("cart", {}) or {}
-    items_for_template = []
-    total = 0.0
-    for pid_str, qty in cart.items():
-        try:
-            pid = int(pid_str)
-            qty_i = int(qty)
-        except Exception:
-            continue
-        product = Product.query.get(pid)
-        if not product:
-            continue
-        price = float(product.price)
-        total += price * qty_i
-        items_for_template.append({"product": product, "qty": qty_i})
+    summary = price_cart(current_cart())
+    items_for_template = summary.template_items()
+    total = summary.total
 
     paypal_client_id = os.getenv("PAYPAL_CLIENT_ID")
 
@@ -139,6 +161,7 @@ def view_cart():
 
 
 @app.route("/product/<int:product_id>")
+@conditional_page
 def product_detail_page(product_id):
     # keep for potential direct HTML product pages
     p = Product.query.get_or_404(product_id)
@@ -147,98 +170,188 @@ def product_detail_page(product_id):
 
 # ----- API: products (with pagination) -----
 @app.route("/api/products")
+@conditional
 def api_products():
     page = request.args.get("page", 1, type=int)
     per_page = request.args.get("per_page", 9, type=int)
-    q = request.args.get("q", type=str)
-    category = request.args.get("category", type=str)
-    price_min = request.args.get("price_min", type=float)
-    price_max = request.args.get("price_max", type=float)
     sort = request.args.get("sort", type=str)
+    filters = filters_from_args(request.args)
+    # sparse fieldsets: ?fields=id,title,price,...
+    fields = parse_fields(request.args.get("fields", type=str))
+
+    # opt-in keyset mode: ?cursor= (empty for the first page, then next_cursor)
+    cursor = request.args.get("cursor", type=str)
+    if cursor is not None:
+        return _api_products_cursor(filters, sort, cursor, per_page, fields)
+
+    # filters + sort (incl. full-text search) live in catalog.py
+    query = build_product_query(filters, sort)
+
+    def build():
+        pagination = query.paginate(page=page, per_page=per_page, error_out=False)
+        return _json_bytes({
+            "products": serialize_products(pagination.items, fields),
+            "total": pagination.total,
+            "page": pagination.page,
+            "pages": pagination.pages,
+            "per_page": pagination.per_page
+        })
 
-    query = Product.query
-
-    # basic filters (if model has fields)
-    if q:
-        # search title or description (simple)
-        query = query.filter(
-            (Product.title.ilike(f"%{q}%")) | (Product.description.ilike(f"%{q}%"))
-        )
-    if category:
-        # if Product has category attribute
-        if hasattr(Product, "category"):
-            query = query.filter(Product.category == category)
-    if price_min is not None:
-        query = query.filter(Product.price >= price_min)
-    if price_max is not None:
-        query = query.filter(Product.price <= price_max)
-
-    # simple sort options
-    if sort == "price_asc":
-        query = query.order_by(Product.price.asc())
-    elif sort == "price_desc":
-        query = query.order_by(Product.price.desc())
-    else:
-        # default order by id desc
-        query = query.order_by(Product.id.desc())
+    # cached per catalog version + query string
+    return _json_response(catalog_cache.query(request.args, build))
 
-    pagination = query.paginate(page=page, per_page=per_page, error_out=False)
 
-    items = []
-    for p in pagination.items:
-        # ensure numeric price and default values JS expects
+def _api_products_cursor(filters, sort, cursor, per_page, fields):
+    """
+    Keyset pagination: no OFFSET scan and no COUNT(*) unless with_total=1,
+    so every page costs the same however deep the client scrolls.
+    """
+    per_page = max(1, min(per_page, 100))
+    body = _cursor_page_body(request.args, filters, sort, cursor, per_page, fields)
+    if body is None:
+        return jsonify({"error": "invalid cursor"}), 400
+    if not request.args.get("with_total", type=int):
+        return _json_response(body)
+
+    # exact total on demand; computed once per filter set and catalog version
+    data = app.json.loads(body)
+    data["total"] = count_products(filters)
+    return jsonify(data)
+
+
+def _cursor_page_body(args, filters, sort, cursor, per_page, fields):
+    """Serialized keyset page (bytes, None for a bad cursor), cached per catalog version + args."""
+    def build():
         try:
-            price_val = float(p.price)
-        except Exception:
-            price_val = 0.0
-        items.append({
-            "id": p.id,
-            "title": getattr(p, "title", None) or getattr(p, "name", ""),
-            "description": getattr(p, "description", "") or "",
-            "price": price_val,
-            "currency": getattr(p, "currency", "USD") or "USD",
-            "image": getattr(p, "image", "") or "",
-            # optional fields used by frontend
-            "rating": float(getattr(p, "rating", 0) or 0),
-            "category": getattr(p, "category", "") or ""
+            products, next_cursor = keyset_page(filters, sort, cursor or None, per_page)
+        except ValueError:
+            return None
+        return _json_bytes({
+            "products": serialize_products(products, fields),
+            "next_cursor": next_cursor,
+            "per_page": per_page
         })
 
-    return jsonify({
-        "products": items,
-        "total": pagination.total,
-        "page": pagination.page,
-        "pages": pagination.pages,
-        "per_page": pagination.per_page
-    })
+    return catalog_cache.query(args, build)
+
+
+@app.route("/api/products/facets")
+@conditional
+def api_product_facets():
+    """Sidebar counts for the same q / category / price_min / price_max as /api/products."""
+    return _json_response(_facets_body(filters_from_args(request.args)))
+
+
+def _facets_body(filters):
+    # cached per filter signature; a catalog write bumps the version and drops it
+    key = ("facets",) + tuple(sorted(filters.items()))
+    return catalog_cache.value(key, lambda: _json_bytes(product_facets(filters)))
 
 
-# API single product JSON used by modal
 @app.route("/api/products/<int:product_id>")
+@conditional
 def api_product_detail(product_id):
-    p = Product.query.get_or_404(product_id)
-    try:
-        price_val = float(p.price)
-    except Exception:
-        price_val = 0.0
-    return jsonify({
-        "id": p.id,
-        "title": getattr(p, "title", None) or getattr(p, "name", ""),
-        "description": getattr(p, "description", "") or "",
-        "price": price_val,
-        "currency": getattr(p, "currency", "USD") or "USD",
-        "image": getattr(p, "image", "") or "",
-        "rating": float(getattr(p, "rating", 0) or 0),
-        "category": getattr(p, "category", "") or ""
-    })
+    fields = parse_fields(request.args.get("fields", type=str))
+
+    def build():
+        p = Product.query.get(product_id)
+        if not p:
+            return None
+        return _json_bytes(serialize_product(p, fields))
+
+    body = catalog_cache.product((product_id, fields), build)
+    if body is None:
+        abort(404)
+    return _json_response(body)
+
+
+@app.route("/api/products/<int:product_id>/related")
+@conditional_on(related.lists_version)
+def api_product_related(product_id):
+    """Precomputed "similar items" (related.py): one query, then cached per catalog + lists version."""
+    limit = max(1, min(request.args.get("limit", related.TOP_K, type=int), related.TOP_K))
+
+    def build():
+        products = related.related_products(product_id, limit)
+        return _json_bytes({"product_id": product_id, "related": serialize_products(products, GRID_FIELDS)})
+
+    key = ("related", product_id, limit, related.lists_version()[0])
+    return _json_response(catalog_cache.value(key, build))
 
 
 # ----- API: cart endpoints (JS expects /api/cart for GET, but /cart/add & /cart/update for actions) -----
 
 @app.route("/api/cart")
 def api_get_cart():
-    summary = _cart_summary_from_session()
-    # totals already numeric
-    return jsonify(summary)
+    cart = current_cart()
+    # the version needs no products query: an unchanged cart costs one cart read
+    version = cart_version(cart)
+    if request.if_none_match.contains_weak(version):
+        response = app.response_class(status=304)
+    else:
+        # totals already numeric
+        response = jsonify(price_cart(cart).to_dict())
+    response.set_etag(version)
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+
+def _load_cart_products(ops):
+    """Every product the ops add, with one query: (products, None) or (None, 404 response)."""
+    wanted = {pid for op, pid, qty in ops if op == "add" or (op == "set" and qty > 0)}
+    products = load_products(wanted)
+    missing = sorted(wanted - products.keys())
+    if missing:
+        return None, (jsonify({"success": False, "error": "product not found", "missing": missing}), 404)
+    return products, None
+
+
+def _apply_cart_ops(ops):
+    """
+    Validate every product the ops add with one query, apply all ops or none,
+    answer with the recomputed summary (priced once, products reused).
+    """
+    products, error = _load_cart_products(ops)
+    if error:
+        return error
+    # atomic for the whole batch (WATCH / MULTI with the Redis store), see cart_store.py
+    cart, changed = cart_store.apply(ops)
+    summary = price_cart(cart, products).to_dict()
+    return jsonify({"success": True, "changed": changed, "version": summary["version"], "cart": summary})
+
+
+def _apply_cart_line(op, pid, qty=0):
+    """
+    One line change for /cart/add, /cart/update and /api/cart/remove: a single
+    atomic HINCRBY / HSET / HDEL with the Redis store (no transaction to retry).
+    """
+    products, error = _load_cart_products([(op, pid, qty)])
+    if error:
+        return error
+    if op == "add":
+        cart = add_item(pid, qty)
+    elif op == "set":
+        cart = set_item(pid, qty)
+    else:
+        cart = remove_item(pid)
+    summary = price_cart(cart, products).to_dict()
+    return jsonify({"success": True, "version": summary["version"], "cart": summary})
+
+
+@app.route("/api/cart/batch", methods=["POST"])
+def api_cart_batch():
+    """
+    body: {"ops": [{"op": "add" | "set" | "remove", "product_id": 3, "qty": 1}, ...]}
+    One round trip for any number of line changes; the response carries the
+    new summary and its version (see /api/cart), nothing to refetch.
+    """
+    data = request.get_json(silent=True) or {}
+    try:
+        ops = parse_ops(data.get("ops"))
+    except ValueError as exc:
+        return jsonify({"success": False, "error": str(exc)}), 400
+    return _apply_cart_ops(ops)
 
 
 # Accepts either JSON or form-encoded body (URLSearchParams)
@@ -258,17 +371,7 @@ def cart_add():
     except Exception:
         return jsonify({"success": False, "error": "invalid product_id"}), 400
 
-    product = Product.query.get(pid)
-    if not product:
-        return jsonify({"success": False, "error": "product not found"}), 404
-
-    cart = session.get("cart", {}) or {}
-    cart[str(pid)] = cart.get(str(pid), 0) + qty
-    session["cart"] = cart
-    session.modified = True
-
-    summary = _cart_summary_from_session()
-    return jsonify({"success": True, "cart": summary})
+    return _apply_cart_line("add", pid, qty)
 
 
 @app.route("/cart/update", methods=["POST"])
@@ -290,8 +393,6 @@ def cart_update():
     except Exception:
         return jsonify({"success": False, "error": "invalid product_id"}), 400
 
-    cart = session.get("cart", {}) or {}
-
     # if qty is None treat as toggle or error
     if qty is None:
         return jsonify({"success": False, "error": "qty required"}), 400
@@ -301,33 +402,15 @@ def cart_update():
     except Exception:
         return jsonify({"success": False, "error": "invalid qty"}), 400
 
-    if qty_i <= 0:
-        cart.pop(str(pid), None)
-    else:
-        # ensure product exists
-        product = Product.query.get(pid)
-        if not product:
-            return jsonify({"success": False, "error": "product not found"}), 404
-        cart[str(pid)] = qty_i
-
-    session["cart"] = cart
-    session.modified = True
-    summary = _cart_summary_from_session()
-    return jsonify({"success": True, "cart": summary})
+    # qty <= 0 removes the line (no product check needed for that)
+    return _apply_cart_line("set", pid, qty_i)
 
 
 # (optional) keep older api endpoints for compatibility
 @app.route("/api/cart/add", methods=["POST"])
 def api_cart_add_compat():
-    # alias to /cart/add but accepts JSON
-    if request.is_json:
-        data = request.get_json()
-        product_id = data.get("product_id")
-        qty = int(data.get("qty", 1))
-        # reuse logic
-        return cart_add()
-    else:
-        return cart_add()
+    # alias to /cart/add, which reads JSON or form bodies itself
+    return cart_add()
 
 
 @app.route("/api/cart/remove", methods=["POST"])
@@ -340,14 +423,20 @@ def api_cart_remove_compat():
         pid = request.form.get("product_id") or request.values.get("product_id")
     if pid is None:
         return jsonify({"success": False, "error": "product_id required"}), 400
-    cart = session.get("cart", {}) or {}
-    cart.pop(str(pid), None)
-    session["cart"] = cart
-    session.modified = True
-    return jsonify({"success": True, "cart": _cart_summary_from_session()})
+    try:
+        pid = int(pid)
+    except Exception:
+        return jsonify({"success": False, "error": "invalid product_id"}), 400
+    return _apply_cart_line("remove", pid)
+
+
+# ----- PayPal endpoints -----
+# one gateway per process: cached OAuth token + keep-alive connections (paypal_gateway.py)
+def _paypal_error(exc):
+    app.logger.warning("%s (debug id %s): %s", exc, exc.debug_id, exc.body)
+    return jsonify({"error": "payment provider unavailable", "debug_id": exc.debug_id}), 502
 
 
-# ----- PayPal endpoints (unchanged) -----
 @app.route("/api/create-paypal-order", methods=["POST"])
 def create_paypal_order():
     data = request.json or {}
@@ -355,35 +444,24 @@ def create_paypal_order():
     if not purchase_units:
         return jsonify({"error": "purchase_units required"}), 400
 
-    request_order = OrdersCreateRequest()
-    request_order.prefer('return=representation')
-    request_order.request_body({"intent": "CAPTURE", "purchase_units": purchase_units})
-
-    response = paypal_client().execute(request_order)
-    return jsonify({"orderID": response.result.id})
-
+    try:
+        result = get_gateway().create_order(purchase_units)
+    except PayPalError as exc:
+        return _paypal_error(exc)
+    return jsonify({"orderID": result["id"]})
 
-from models import Order
 
 @app.route("/api/capture-paypal-order/<order_id>", methods=["POST"])
 def capture_paypal_order(order_id):
-    request_capture = OrdersCaptureRequest(order_id)
-    resp = paypal_client().execute(request_capture)
-    result = resp.result
-    amount = result.purchase_units[0].payments.captures[0].amount.value
-
-    # Lưu đơn hàng
-    order = Order(
-        fullname="Khách hàng PayPal",
-        email="paypal@example.com",
-        address="Thanh toán qua PayPal",
-        total_amount=amount,
-        paypal_order_id=order_id
-    )
-    db.session.add(order)
-    db.session.commit()
+    # idempotent: retries / double clicks get the first capture back (payments.py)
+    try:
+        order, result, replayed = capture_once(order_id)
+    except PayPalError as exc:
+        return _paypal_error(exc)
+    except CaptureInProgress:
+        return jsonify({"error": "capture in progress, retry shortly"}), 409
 
-    return jsonify({"status": "success", "capture": result.__dict__})
+    return jsonify({"status": "success", "order_id": order.id, "replayed": replayed, "capture": result})
 
 
 
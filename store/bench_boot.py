@@ -0,0 +1,130 @@
+# bench_boot.py -- import / boot time of the web app, fails on regressions
+# usage: python bench_boot.py [--runs 5] [--max-import-ms 600] [--no-gunicorn] [--out boot.json]
+#
+# Each measurement runs in a fresh interpreter (a throwaway SQLite DB, no Redis).
+# Exit status 1 when a heavy SDK is imported eagerly again or a budget is exceeded.
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# must stay out of `import backend` (loaded on first use instead)
+LAZY_MODULES = ["requests", "cloudinary", "redis", "alembic", "flask_migrate", "PIL", "numpy"]
+
+_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+ms = (time.perf_counter() - start) * 1000
+print(json.dumps({{"ms": ms, "loaded": [m for m in {lazy!r} if m in sys.modules]}}))
+"""
+
+
+def _env(db_dir, **extra):
+    env = dict(os.environ)
+    env.pop("REDIS_URL", None)
+    env.pop("FLASK_RUN_FROM_CLI", None)
+    env["DATABASE_URL"] = "sqlite:///" + os.path.join(db_dir, "boot.db")
+    env.update(extra)
+    return env
+
+
+def probe_import(module, runs, env):
+    samples, loaded = [], []
+    for _ in range(runs):
+        out = subprocess.check_output(
+            [sys.executable, "-c", _PROBE.format(module=module, lazy=LAZY_MODULES)], cwd=HERE, env=env
+        )
+        data = json.loads(out.decode().strip().splitlines()[-1])
+        samples.append(data["ms"])
+        loaded = data["loaded"]
+    return {
+        "median_ms": round(statistics.median(samples), 1),
+        "min_ms": round(min(samples), 1),
+        "max_ms": round(max(samples), 1),
+        "eager_heavy_modules": loaded,
+    }
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def probe_gunicorn(env, workers=2, path="/api/products?per_page=9"):
+    """Seconds from spawning gunicorn (preload + warm-up) to the first 200."""
+    port = _free_port()
+    env = dict(env, GUNICORN_BIND=f"127.0.0.1:{port}", WEB_CONCURRENCY=str(workers), GUNICORN_ACCESSLOG="")
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "wsgi:app"],
+        cwd=HERE, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        deadline = start + 60
+        while time.perf_counter() < deadline:
+            if proc.poll() is not None:
+                raise RuntimeError("gunicorn exited during startup")
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}{path}", timeout=1) as r:
+                    if r.status == 200:
+                        return round(time.perf_counter() - start, 3)
+            except OSError:
+                time.sleep(0.05)
+        raise RuntimeError("gunicorn did not answer in 60s")
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-import-ms", type=float, help="fail if `import backend` median is slower")
+    parser.add_argument("--no-gunicorn", action="store_true")
+    parser.add_argument("--out")
+    args = parser.parse_args()
+
+    db_dir = tempfile.mkdtemp()
+    # schema for warm-up queries
+    subprocess.check_call(
+        [sys.executable, "-c", "from backend import app; from models import db\n"
+                               "with app.app_context(): db.create_all()"],
+        cwd=HERE, env=_env(db_dir),
+    )
+
+    report = {
+        "python": sys.version.split()[0],
+        "import_backend": probe_import("backend", args.runs, _env(db_dir)),
+        "import_wsgi_with_warmup": probe_import("wsgi", args.runs, _env(db_dir, WARMUP="1")),
+    }
+    if not args.no_gunicorn:
+        report["gunicorn_first_response_s"] = probe_gunicorn(_env(db_dir))
+
+    problems = []
+    eager = report["import_backend"]["eager_heavy_modules"]
+    if eager:
+        problems.append(f"imported eagerly: {', '.join(eager)}")
+    if args.max_import_ms and report["import_backend"]["median_ms"] > args.max_import_ms:
+        problems.append(f"import backend {report['import_backend']['median_ms']} ms > {args.max_import_ms} ms")
+    report["problems"] = problems
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    sys.exit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+# bench_compress.py -- bytes on the wire and CPU per request, uncompressed vs gzip vs brotli
+# usage: python bench_compress.py [rounds]   (uses a throwaway SQLite DB and a copy of static/)
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+_tmp = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(_tmp, "bench_compress.db")
+os.environ["WARMUP"] = "0"
+os.environ["METRICS_ENABLED"] = "0"
+
+from backend import app
+from models import db, Product
+import static_assets
+
+WORDS = ["áo", "thun", "cotton", "thoáng", "mát", "form", "rộng", "phù", "hợp", "mặc", "hàng", "ngày",
+         "chất", "liệu", "co", "giãn", "bốn", "chiều", "đường", "may", "tỉ", "mỉ", "giặt", "máy"]
+FULL_FIELDS = "id,title,description,price,currency,image,rating,category"
+URLS = [
+    ("products.html", "/products"),
+    ("api 100 full", f"/api/products?per_page=100&cursor=&fields={FULL_FIELDS}"),
+    ("api 9 grid", "/api/products?per_page=9&cursor=&fields=id,title,excerpt,price,image,rating,category"),
+    ("styles.css", "/static/css/styles.css"),
+    ("products.js", "/static/js/products.js"),
+]
+MODES = [
+    ("off", ""),
+    ("gzip", "gzip"),
+    ("br", "br, gzip"),
+    ("br+cache", "br, gzip"),
+]
+
+
+def generate(n=2000):
+    rnd = random.Random(7)
+    db.session.bulk_insert_mappings(Product, [{
+        "title": f"Áo Thun {' '.join(rnd.sample(WORDS, 2))} {i}",
+        "description": " ".join(rnd.choice(WORDS) for _ in range(80)),
+        "price": round(rnd.uniform(5, 900), 2),
+        "category": rnd.choice(["Áo", "Quần", "Váy", "Áo khoác"]),
+        "rating": round(rnd.uniform(3, 5), 1),
+        "image": f"a{i % 9 + 1}.jpg",
+    } for i in range(n)])
+    db.session.commit()
+
+
+def configure(app, label, built):
+    """One app (the routes live on backend.app), switched between the modes in place."""
+    compressor = app.extensions["compression"]
+    compressor.min_size = sys.maxsize if label == "off" else 500
+    compressor.cache_size = 256 if label.endswith("+cache") else 0
+    compressor._cache.clear()
+    # 'off' = before: static files straight from static/, Flask's short cache lifetime
+    app.static_folder = built
+    assets = app.extensions["static_assets"]
+    assets.reload()
+    if label == "off":
+        assets.manifest, assets.hashed = {}, set()
+
+
+def measure(app, url, accept, rounds):
+    client = app.test_client()
+    if url.startswith("/static/"):
+        with app.test_request_context():
+            url = app.url_for("static", filename=url[len("/static/"):])
+    headers = {"Accept-Encoding": accept}
+    response = client.get(url, headers=headers)  # warm up (catalog cache, templates)
+    size = len(response.data)
+    response.close()
+    cpu = time.process_time()
+    for _ in range(rounds):
+        client.get(url, headers=headers).close()
+    return size, (time.process_time() - cpu) / rounds * 1000
+
+
+def main():
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    built = os.path.join(_tmp, "static")
+    shutil.copytree(os.path.join(os.path.dirname(os.path.abspath(__file__)), "static"), built,
+                    ignore=shutil.ignore_patterns("images", "dist"))
+    static_assets.build(built)
+
+    with app.app_context():
+        db.create_all()
+        generate()
+
+    print(f"{'':14s}" + "".join(f"{label:>22s}" for label, _ in MODES))
+    print(f"{'':14s}" + "".join(f"{'bytes   cpu ms/req':>22s}" for _ in MODES))
+    for name, url in URLS:
+        row = f"{name:14s}"
+        for label, accept in MODES:
+            configure(app, label, built)
+            size, ms = measure(app, url, accept, rounds)
+            row += f"{size:>12d} {ms:9.3f}"
+        print(row)
+    print(f"({rounds} requests each, CPU = process time of the test client + app;"
+          f" static files: {'brotli + ' if static_assets.brotli else ''}gzip built once by `flask assets-build`)")
+
+
+if __name__ == "__main__":
+    main()
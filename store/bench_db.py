@@ -0,0 +1,204 @@
+# bench_db.py -- catalog reads while admin writes / orders are committed, per SQLite journal mode
+# usage: python bench_db.py [--rows 20000] [--readers 8] [--duration 10]
+#                           [--write-rows 500] [--hold-ms 50] [--modes DEFAULT,WAL] [--out report.json]
+#
+# One writer process loops over "bulk edit `--write-rows` prices + insert an order",
+# keeping each transaction open for --hold-ms; --readers processes (like gunicorn
+# workers, no shared GIL) run listing pages (catalog.keyset_page) meanwhile.
+# Each mode gets its own throwaway DB. Big transactions (--write-rows 20000) are
+# the interesting case: they overflow SQLite's default 2 MB page cache, and in
+# rollback-journal mode the writer then locks every reader out until COMMIT.
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+CATEGORIES = ["Áo", "Quần", "Áo khoác", "Váy", "Đầm", "Phụ kiện"]
+SORTS = ["price_asc", "price_desc", "title_asc", None]
+
+
+def _percentile(sorted_ms, p):
+    if not sorted_ms:
+        return None
+    index = min(len(sorted_ms) - 1, max(0, int(round(p / 100 * len(sorted_ms) + 0.5)) - 1))
+    return round(sorted_ms[index], 3)
+
+
+def _stats(samples, elapsed):
+    ms = sorted(samples)
+    return {
+        "count": len(ms),
+        "per_s": round(len(ms) / elapsed, 1) if elapsed else None,
+        "p50_ms": _percentile(ms, 50),
+        "p95_ms": _percentile(ms, 95),
+        "p99_ms": _percentile(ms, 99),
+        "max_ms": round(ms[-1], 3) if ms else None,
+    }
+
+
+def _app():
+    sys.path.insert(0, HERE)
+    from backend import create_app
+    return create_app()
+
+
+def reader(seed, start_at, deadline, writing, out):
+    from catalog import keyset_page
+    from models import db
+
+    rnd = random.Random(seed)
+    samples = []
+    with _app().app_context():
+        time.sleep(max(0, start_at - time.time()))
+        while time.time() < deadline:
+            filters = {"q": None, "category": rnd.choice(CATEGORIES + [None]),
+                       "price_min": None, "price_max": rnd.choice([None, 200.0, 500.0])}
+            during_write = writing.is_set()
+            start = time.perf_counter()
+            try:
+                keyset_page(filters, rnd.choice(SORTS), limit=9)
+                ok = True
+            except Exception:
+                db.session.rollback()
+                ok = False
+            finally:
+                db.session.remove()
+            samples.append(((time.perf_counter() - start) * 1000, ok, during_write or writing.is_set()))
+    out.put(("read", samples))
+
+
+def writer(seed, rows, write_rows, hold_ms, start_at, deadline, writing, out):
+    from sqlalchemy import update
+    from models import db, Order, Product
+
+    rnd = random.Random(seed)
+    samples = []
+    with _app().app_context():
+        time.sleep(max(0, start_at - time.time()))
+        sign = 1
+        while time.time() < deadline:
+            ids = rnd.sample(range(1, rows + 1), min(write_rows, rows))
+            start = time.perf_counter()
+            try:
+                db.session.execute(
+                    update(Product).where(Product.id.in_(ids)).values(price=Product.price + sign)
+                )
+                writing.set()
+                db.session.add(Order(fullname="Bench", email="bench@example.com", address="-",
+                                     total_amount=sign + 1))
+                db.session.flush()
+                # the rest of the request (templating, a payment call...) inside the transaction
+                time.sleep(hold_ms / 1000)
+                db.session.commit()
+                ok = True
+            except Exception:
+                db.session.rollback()
+                ok = False
+            finally:
+                writing.clear()
+                db.session.remove()
+            samples.append(((time.perf_counter() - start) * 1000, ok))
+            sign = -sign
+            time.sleep(0.01)
+    out.put(("write", samples))
+
+
+def run_mode(mode, args):
+    from models import db, Product
+    from catalog_gen import generate
+
+    # "default": SQLite as it comes (rollback journal, synchronous=FULL, 2 MB cache)
+    os.environ["SQLITE_PRAGMAS"] = "0" if mode == "DEFAULT" else "1"
+    os.environ["SQLITE_JOURNAL_MODE"] = mode
+    os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(), f"bench_db_{mode.lower()}.db")
+    app = _app()
+    with app.app_context():
+        db.create_all()
+        generate(args.rows)
+        rows = Product.query.count()
+        journal = db.session.execute(db.text("PRAGMA journal_mode")).scalar()
+        db.session.remove()
+
+    # spawn: every process opens its own connections, as gunicorn workers do after fork
+    ctx = multiprocessing.get_context("spawn")
+    writing = ctx.Event()
+    out = ctx.Queue()
+    start_at = time.time() + 3  # after every process has imported the app
+    deadline = start_at + args.duration
+    procs = [ctx.Process(target=writer, args=(args.seed, rows, args.write_rows, args.hold_ms,
+                                              start_at, deadline, writing, out))]
+    procs += [
+        ctx.Process(target=reader, args=(args.seed + i + 1, start_at, deadline, writing, out))
+        for i in range(args.readers)
+    ]
+    for p in procs:
+        p.start()
+    reads, writes = [], []
+    for _ in procs:
+        kind, samples = out.get()
+        (reads if kind == "read" else writes).extend(samples)
+    for p in procs:
+        p.join()
+    elapsed = args.duration
+
+    return {
+        "journal_mode": journal,
+        "reads": dict(_stats([ms for ms, ok, _ in reads if ok], elapsed),
+                      errors=sum(1 for _, ok, _ in reads if not ok)),
+        # the point of WAL: these should not stall behind the open write transaction
+        "reads_during_write": _stats([ms for ms, ok, during in reads if ok and during], elapsed),
+        "writes": dict(_stats([ms for ms, ok in writes if ok], elapsed),
+                       errors=sum(1 for _, ok in writes if not ok)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=20_000)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--write-rows", type=int, default=500, help="products updated per write transaction")
+    parser.add_argument("--hold-ms", type=float, default=50.0, help="time a write transaction stays open")
+    parser.add_argument("--modes", default="DEFAULT,WAL",
+                        help="SQLITE_JOURNAL_MODE values to compare, DEFAULT = no pragmas at all")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", help="also write the JSON report here")
+    args = parser.parse_args()
+
+    # the module-level app in backend.py needs some DB, point it at a throwaway one too
+    os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench_db.db")
+    sys.path.insert(0, HERE)
+
+    report = {
+        "meta": {
+            "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "rows": args.rows,
+            "readers": args.readers,
+            "duration_s": args.duration,
+            "write_rows": args.write_rows,
+            "hold_ms": args.hold_ms,
+        },
+        "modes": {},
+    }
+    for mode in [m.strip().upper() for m in args.modes.split(",") if m.strip()]:
+        print(f"running {mode} ...", file=sys.stderr)
+        report["modes"][mode] = run_mode(mode, args)
+
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    print(text)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,315 @@
+# bench_load.py -- concurrent load test of the catalog / cart endpoints, JSON report
+# usage: python bench_load.py [--rows 10000] [--concurrency 8] [--duration 10]
+#                             [--gunicorn WORKERS | --url http://127.0.0.1:5000]
+#                             [--database-url URL] [--no-cache] [--out report.json]
+#
+# Default target is the Flask app in-process (test client, one per thread): no
+# network, measures the per-request cost. --gunicorn N starts a local gunicorn on
+# 127.0.0.1 against the same throwaway DB to measure real concurrency.
+import argparse
+import http.client
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from urllib.parse import urlencode, urlsplit
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+SEARCHES = ["ao thun", "quan jean", "dam", "vay midi", "khoac bomber", "linen", "form rong", "cotton den"]
+CATEGORIES = ["Áo", "Quần", "Áo khoác", "Váy", "Đầm", "Phụ kiện"]
+SORTS = ["price_asc", "price_desc", "title_asc", ""]
+GRID_FIELDS = "id,title,excerpt,price,image,images,rating,category"
+
+
+# ----- clients -----
+class FlaskClient:
+    """In-process: app.test_client(), keeps its own session cookie."""
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, data=None):
+        response = self.client.open(path, method=method, data=data)
+        return response.status_code, response.get_data()
+
+
+class HttpClient:
+    """Keep-alive HTTP/1.1 to a local server; carries the session cookie by hand."""
+
+    def __init__(self, base_url):
+        parts = urlsplit(base_url)
+        self.host, self.port = parts.hostname, parts.port or 80
+        self.conn = None
+        self.cookie = None
+
+    def request(self, method, path, data=None):
+        body = urlencode(data) if data else None
+        headers = {"Content-Type": "application/x-www-form-urlencoded"} if body else {}
+        if self.cookie:
+            headers["Cookie"] = self.cookie
+        for attempt in (1, 2):
+            if self.conn is None:
+                self.conn = http.client.HTTPConnection(self.host, self.port, timeout=30)
+            try:
+                self.conn.request(method, path, body=body, headers=headers)
+                response = self.conn.getresponse()
+                payload = response.read()
+                break
+            except (http.client.HTTPException, OSError):
+                # server closed the keep-alive connection: reconnect once
+                self.conn.close()
+                self.conn = None
+                if attempt == 2:
+                    raise
+        cookie = response.getheader("Set-Cookie")
+        if cookie:
+            self.cookie = cookie.split(";", 1)[0]
+        return response.status, payload
+
+
+# ----- scenarios -----
+def _products(params):
+    return "/api/products?" + urlencode(params)
+
+
+def s_list(client, rnd, state, rows):
+    yield "list", "GET", _products({"per_page": 9, "cursor": "", "with_total": 1, "fields": GRID_FIELDS}), None
+
+
+def s_search(client, rnd, state, rows):
+    params = {"q": rnd.choice(SEARCHES), "sort": "relevance", "per_page": 9, "cursor": "", "with_total": 1}
+    yield "search", "GET", _products(params), None
+
+
+def s_filter(client, rnd, state, rows):
+    low = rnd.choice([0, 100, 200, 400])
+    params = {"category": rnd.choice(CATEGORIES), "price_min": low, "price_max": low + rnd.choice([100, 300]),
+              "sort": rnd.choice(SORTS), "per_page": 9, "cursor": "", "with_total": 1}
+    yield "filter", "GET", _products(params), None
+
+
+def s_deep_offset(client, rnd, state, rows):
+    # OFFSET pagination deep into the catalog (worst case for page mode)
+    yield "deep_offset", "GET", _products({"page": rnd.randint(1, max(1, rows // 9)), "per_page": 9}), None
+
+
+def s_deep_cursor(client, rnd, state, rows):
+    # follow next_cursor a few pages, like "Xem thêm"
+    cursor = ""
+    for _ in range(5):
+        status, body = yield "deep_cursor", "GET", _products({"per_page": 9, "cursor": cursor, "sort": "price_asc"}), None
+        cursor = json.loads(body).get("next_cursor") if status == 200 else None
+        if not cursor:
+            return
+
+
+def s_detail(client, rnd, state, rows):
+    yield "detail", "GET", f"/api/products/{rnd.randint(1, rows)}", None
+
+
+def s_facets(client, rnd, state, rows):
+    params = {"q": rnd.choice(SEARCHES)} if rnd.random() < 0.5 else {"category": rnd.choice(CATEGORIES)}
+    yield "facets", "GET", "/api/products/facets?" + urlencode(params), None
+
+
+def s_cart(client, rnd, state, rows):
+    pid = rnd.randint(1, rows)
+    yield "cart_add", "POST", "/cart/add", {"product_id": pid, "qty": 1}
+    yield "cart_update", "POST", "/cart/update", {"product_id": pid, "qty": rnd.randint(1, 5)}
+    yield "cart_get", "GET", "/api/cart", None
+    yield "cart_remove", "POST", "/api/cart/remove", {"product_id": pid}
+
+
+# (scenario, weight)
+SCENARIOS = [
+    (s_list, 20), (s_search, 15), (s_filter, 15), (s_deep_offset, 5), (s_deep_cursor, 5),
+    (s_detail, 20), (s_facets, 10), (s_cart, 10),
+]
+
+
+def worker(client, rnd, rows, deadline, results):
+    funcs = [f for f, _ in SCENARIOS]
+    weights = [w for _, w in SCENARIOS]
+    state = {}
+    while time.perf_counter() < deadline:
+        steps = rnd.choices(funcs, weights)[0](client, rnd, state, rows)
+        reply = None
+        while True:
+            try:
+                name, method, path, data = steps.send(reply)
+            except StopIteration:
+                break
+            start = time.perf_counter()
+            try:
+                status, body = client.request(method, path, data)
+            except Exception:
+                status, body = 0, b""
+            results.append((name, (time.perf_counter() - start) * 1000, status))
+            reply = (status, body)
+
+
+# ----- report -----
+def _percentile(sorted_ms, p):
+    if not sorted_ms:
+        return None
+    index = min(len(sorted_ms) - 1, max(0, int(round(p / 100 * len(sorted_ms) + 0.5)) - 1))
+    return round(sorted_ms[index], 3)
+
+
+def _stats(samples, elapsed):
+    ms = sorted(latency for _, latency, _ in samples)
+    errors = sum(1 for _, _, status in samples if not 200 <= status < 400)
+    return {
+        "requests": len(ms),
+        "errors": errors,
+        "rps": round(len(ms) / elapsed, 1) if elapsed else None,
+        "mean_ms": round(sum(ms) / len(ms), 3) if ms else None,
+        "p50_ms": _percentile(ms, 50),
+        "p95_ms": _percentile(ms, 95),
+        "p99_ms": _percentile(ms, 99),
+        "max_ms": round(ms[-1], 3) if ms else None,
+    }
+
+
+def _git_rev():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=HERE,
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except Exception:
+        return None
+
+
+# ----- setup -----
+def prepare_db(rows):
+    from models import db, Product
+    from catalog_gen import generate
+
+    db.create_all()
+    have = Product.query.count()
+    if have < rows:
+        start = time.perf_counter()
+        generate(rows - have, start=have)
+        print(f"Generated {rows - have} products in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+    return Product.query.count()
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_gunicorn(workers, env):
+    port = _free_port()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-w", str(workers), "-b", f"127.0.0.1:{port}",
+         "--log-level", "warning", "backend:app"],
+        cwd=HERE, env=env,
+    )
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return proc, f"http://127.0.0.1:{port}"
+        except OSError:
+            if proc.poll() is not None:
+                raise RuntimeError("gunicorn exited during startup")
+            time.sleep(0.1)
+    proc.kill()
+    raise RuntimeError("gunicorn did not start")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds of load after warm-up")
+    parser.add_argument("--warmup", type=float, default=2.0)
+    parser.add_argument("--gunicorn", type=int, metavar="WORKERS", help="start a local gunicorn")
+    parser.add_argument("--url", help="an already running local server")
+    parser.add_argument("--database-url", help="default: a throwaway SQLite file")
+    parser.add_argument("--no-cache", action="store_true", help="disable the catalog cache (in-process only)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", help="also write the JSON report here")
+    args = parser.parse_args()
+
+    db_url = args.database_url or "sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench_load.db")
+    os.environ["DATABASE_URL"] = db_url
+    sys.path.insert(0, HERE)
+    from backend import app
+
+    with app.app_context():
+        rows = prepare_db(args.rows)
+    if args.no_cache:
+        app.config["CATALOG_CACHE_ENABLED"] = False
+
+    proc = None
+    if args.gunicorn:
+        proc, base_url = start_gunicorn(args.gunicorn, dict(os.environ))
+        target = f"gunicorn -w {args.gunicorn}"
+        make_client = lambda: HttpClient(base_url)  # noqa: E731
+    elif args.url:
+        target = args.url
+        make_client = lambda: HttpClient(args.url)  # noqa: E731
+    else:
+        target = "flask test client"
+        make_client = lambda: FlaskClient(app)  # noqa: E731
+
+    try:
+        def run(seconds, seed):
+            results = []
+            deadline = time.perf_counter() + seconds
+            threads = [
+                threading.Thread(target=worker, args=(make_client(), random.Random(seed + i), rows, deadline, results))
+                for i in range(args.concurrency)
+            ]
+            start = time.perf_counter()
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            return results, time.perf_counter() - start
+
+        if args.warmup:
+            run(args.warmup, args.seed + 1000)
+        results, elapsed = run(args.duration, args.seed)
+    finally:
+        if proc:
+            proc.terminate()
+            proc.wait(timeout=10)
+
+    by_name = {}
+    for sample in results:
+        by_name.setdefault(sample[0], []).append(sample)
+    report = {
+        "meta": {
+            "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "git": _git_rev(),
+            "python": platform.python_version(),
+            "target": target,
+            "database": db_url.split(":", 1)[0],
+            "rows": rows,
+            "concurrency": args.concurrency,
+            "duration_s": round(elapsed, 2),
+            "catalog_cache": not args.no_cache,
+        },
+        "total": _stats(results, elapsed),
+        "scenarios": {name: _stats(samples, elapsed) for name, samples in sorted(by_name.items())},
+    }
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    print(text)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+# bench_search.py -- compare ILIKE scan vs FTS5 index for /api/products?q=...
+# usage: python bench_search.py [rows]   (uses a throwaway SQLite DB)
+import os
+import random
+import sys
+import tempfile
+import time
+
+_tmp = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(_tmp, "bench_search.db")
+
+from backend import create_app
+from models import db, Product
+from search import apply_search
+
+WORDS = ["Áo", "Thun", "Hoodie", "Quần", "Jean", "Jogger", "Sơ Mi", "Linen", "Khoác", "Bomber",
+         "Váy", "Đầm", "Dạ Hội", "Basic", "Form Rộng", "Slimfit", "Nỉ", "Cotton", "Lụa", "Kaki"]
+QUERIES = ["ao thun", "Đầm", "quan jean", "khoac", "linen", "so mi lua", "váy", "hoodie form"]
+
+
+def generate(n):
+    rnd = random.Random(42)
+    rows = []
+    for i in range(n):
+        title = " ".join(rnd.sample(WORDS, 3)) + f" {i}"
+        rows.append({
+            "title": title,
+            "description": " ".join(rnd.sample(WORDS, 6)).lower(),
+            "price": round(rnd.uniform(5, 900), 2),
+            "category": rnd.choice(["Áo", "Quần", "Váy", "Áo khoác"]),
+            "rating": round(rnd.uniform(3, 5), 1),
+        })
+    db.session.bulk_insert_mappings(Product, rows)
+    db.session.commit()
+
+
+def run(label, make_query, repeat=5):
+    timings = []
+    hits = 0
+    for q in QUERIES:
+        start = time.perf_counter()
+        for _ in range(repeat):
+            query = make_query(q)
+            # what the API does: COUNT + first page
+            total = query.count()
+            query.order_by(Product.id.desc()).limit(9).all()
+        timings.append((time.perf_counter() - start) / repeat * 1000)
+        hits += total
+    print(f"{label:8s} avg {sum(timings) / len(timings):8.2f} ms/query   "
+          f"max {max(timings):8.2f} ms   matched rows {hits}")
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        start = time.perf_counter()
+        generate(n)
+        print(f"Inserted {n} products (FTS kept in sync by triggers) in {time.perf_counter() - start:.1f}s")
+
+        run("ilike", lambda q: Product.query.filter(
+            (Product.title.ilike(f"%{q}%")) | (Product.description.ilike(f"%{q}%"))))
+        run("fts5", lambda q: apply_search(Product.query, q)[0])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+# bench_serialize.py -- product serialization cost per 1,000 products, before / after
+# usage: python bench_serialize.py [rounds]
+import sys
+import time
+from decimal import Decimal
+
+from flask.json.provider import DefaultJSONProvider
+
+from backend import create_app
+from models import Product
+from json_provider import OrjsonProvider, StdJSONProvider, orjson
+from serializers import parse_fields, serialize_products
+
+
+def legacy_item(p):
+    # the hand-written dict api_products used to build for every row
+    try:
+        price_val = float(p.price)
+    except Exception:
+        price_val = 0.0
+    return {
+        "id": p.id,
+        "title": getattr(p, "title", None) or getattr(p, "name", ""),
+        "description": getattr(p, "description", "") or "",
+        "price": price_val,
+        "currency": getattr(p, "currency", "USD") or "USD",
+        "image": getattr(p, "image", "") or "",
+        "rating": float(getattr(p, "rating", 0) or 0),
+        "category": getattr(p, "category", "") or ""
+    }
+
+
+def make_products(n=1000):
+    return [
+        Product(id=i, title=f"Áo Thun Basic {i}", description="Áo thun cotton thoáng mát, phù hợp mặc hàng ngày " * 4,
+                price=Decimal("159.00"), currency="USD", image=f"a{i % 9 + 1}.jpg", category="Áo", rating=4.4)
+        for i in range(n)
+    ]
+
+
+def bench(label, fn, rounds):
+    fn()  # warm up
+    start = time.perf_counter()
+    for _ in range(rounds):
+        fn()
+    ms = (time.perf_counter() - start) / rounds * 1000
+    print(f"{label:44s} {ms:8.3f} ms / 1000 products")
+
+
+def main():
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    app = create_app()
+    products = make_products()
+    std = DefaultJSONProvider(app)
+    new_std = StdJSONProvider(app)
+    grid_fields = parse_fields("id,title,excerpt,price,image,rating,category")
+
+    with app.app_context():
+        bench("before: getattr dicts + flask json", lambda: std.dumps({"products": [legacy_item(p) for p in products]}).encode(), rounds)
+        bench("after: serializer + stdlib json", lambda: new_std.dumps_bytes({"products": serialize_products(products)}), rounds)
+        if orjson is not None:
+            fast = OrjsonProvider(app)
+            bench("after: serializer + orjson", lambda: fast.dumps_bytes({"products": serialize_products(products)}), rounds)
+            bench("after: serializer + orjson, grid fields", lambda: fast.dumps_bytes({"products": serialize_products(products, grid_fields)}), rounds)
+        else:
+            print("orjson not installed: skipping orjson rows")
+
+
+if __name__ == "__main__":
+    main()
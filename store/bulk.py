@@ -0,0 +1,289 @@
+# bulk.py -- streaming CSV / JSONL product import (upsert on sku) and export
+import csv
+import io
+import json
+import os
+import shutil
+import tempfile
+from decimal import Decimal, InvalidOperation
+
+import click
+
+from models import db, Product
+from catalog_cache import bump_catalog_version
+
+# columns read on import / written on export, in file order
+FIELDS = ("sku", "title", "description", "price", "currency", "image", "category", "rating")
+MAX_LENGTHS = {"sku": 64, "title": 200, "currency": 3, "image": 500, "category": 100}
+BATCH_SIZE = 1000
+# per-line errors kept on the report (the count is always exact)
+MAX_ERRORS = 1000
+
+
+def detect_format(filename, default="csv"):
+    ext = os.path.splitext(filename or "")[1].lower()
+    if ext in (".jsonl", ".ndjson"):
+        return "jsonl"
+    if ext == ".csv":
+        return "csv"
+    return default
+
+
+# ----- reading -----
+def read_rows(stream, fmt="csv"):
+    """
+    Yield (line_no, row_dict, error) from a binary stream, one record at a time.
+    `error` is set (and row is None) when the line itself cannot be parsed.
+    """
+    copy = None
+    if not hasattr(stream, "readable"):
+        # Werkzeug's SpooledTemporaryFile only has readable() (needed by
+        # TextIOWrapper) from Python 3.11: decode a real temporary file instead
+        copy = tempfile.TemporaryFile()
+        shutil.copyfileobj(stream, copy)
+        copy.seek(0)
+        stream = copy
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    try:
+        yield from _parse(text, fmt)
+    finally:
+        if copy is not None:
+            text.close()
+
+
+def _parse(text, fmt):
+    if fmt == "jsonl":
+        for line_no, line in enumerate(text, 1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                yield line_no, None, f"invalid JSON: {e}"
+                continue
+            if not isinstance(row, dict):
+                yield line_no, None, "expected a JSON object"
+                continue
+            yield line_no, row, None
+    else:
+        reader = csv.DictReader(text)
+        if reader.fieldnames:
+            reader.fieldnames = [(name or "").strip().lower() for name in reader.fieldnames]
+        for row in reader:
+            yield reader.line_num, row, None
+
+
+def clean_row(raw):
+    """
+    Validate one record. Returns (values, None) or (None, message).
+    Only known columns present in the record end up in `values`, so an
+    update touches just the columns the file provides; empty cells mean NULL.
+    """
+    values = {}
+    for field in FIELDS:
+        if field not in raw:
+            continue
+        value = raw[field]
+        if isinstance(value, str):
+            value = value.strip() or None
+        values[field] = value
+
+    for field, limit in MAX_LENGTHS.items():
+        value = values.get(field)
+        if value is None:
+            continue
+        value = str(value)
+        if len(value) > limit:
+            return None, f"{field} longer than {limit} characters"
+        values[field] = value
+    if values.get("description") is not None:
+        values["description"] = str(values["description"])
+
+    if "title" in values and not values["title"]:
+        return None, "title is required"
+    if "price" in values:
+        if values["price"] is None:
+            return None, "price is required"
+        try:
+            price = Decimal(str(values["price"]))
+        except (InvalidOperation, ValueError):
+            return None, f"invalid price {values['price']!r}"
+        if not price.is_finite() or price < 0:
+            return None, f"invalid price {values['price']!r}"
+        values["price"] = price.quantize(Decimal("0.01"))
+    if values.get("rating") is not None:
+        try:
+            rating = float(values["rating"])
+        except (TypeError, ValueError):
+            return None, f"invalid rating {values['rating']!r}"
+        if not 0 <= rating <= 5:
+            return None, "rating must be between 0 and 5"
+        values["rating"] = rating
+    if values.get("currency"):
+        values["currency"] = values["currency"].upper()
+    return values, None
+
+
+# ----- import -----
+class ImportReport:
+    def __init__(self):
+        self.inserted = 0
+        self.updated = 0
+        self.error_count = 0
+        self.errors = []  # [(line_no, message)], first MAX_ERRORS only
+        self.batches = 0
+
+    def error(self, line_no, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_ERRORS:
+            self.errors.append((line_no, message))
+
+    def to_dict(self):
+        return {
+            "inserted": self.inserted,
+            "updated": self.updated,
+            "errors": self.error_count,
+            "error_lines": [{"line": n, "error": msg} for n, msg in self.errors],
+        }
+
+
+def _flush(batch, report, dry_run):
+    skus = {values["sku"] for _, values in batch if values.get("sku")}
+    existing = {}
+    if skus:
+        existing = dict(db.session.query(Product.sku, Product.id).filter(Product.sku.in_(skus)))
+
+    inserts, updates = [], []
+    new_by_sku = {}  # a sku repeated inside the file: later lines win
+    for line_no, values in batch:
+        sku = values.get("sku")
+        if sku in existing:
+            if "image" in values:
+                # renditions belong to the old image; `flask images-build` redoes them
+                values["image_variants"] = None
+            updates.append(dict(values, id=existing[sku]))
+        elif sku and sku in new_by_sku:
+            new_by_sku[sku].update(values)
+        elif not values.get("title") or "price" not in values:
+            report.error(line_no, "new product needs title and price")
+        else:
+            inserts.append(values)
+            if sku:
+                new_by_sku[sku] = values
+
+    # executemany: one round trip per distinct column set, not per row
+    if inserts:
+        db.session.bulk_insert_mappings(Product, inserts)
+    if updates:
+        db.session.bulk_update_mappings(Product, updates)
+    if dry_run:
+        db.session.rollback()
+    else:
+        db.session.commit()
+    report.inserted += len(inserts)
+    report.updated += len(updates)
+    report.batches += 1
+
+
+def import_products(stream, fmt="csv", batch_size=BATCH_SIZE, dry_run=False, on_batch=None):
+    """
+    Stream records from `stream`, validate them and upsert on sku in batches
+    of `batch_size` (one commit per batch). Rows without a sku are inserted.
+    Returns an ImportReport; invalid lines are reported, not fatal.
+    """
+    report = ImportReport()
+    batch = []
+    try:
+        for line_no, raw, error in read_rows(stream, fmt):
+            if error is None:
+                values, error = clean_row(raw)
+            if error:
+                report.error(line_no, error)
+                continue
+            batch.append((line_no, values))
+            if len(batch) >= batch_size:
+                _flush(batch, report, dry_run)
+                batch = []
+                if on_batch:
+                    on_batch(report)
+        if batch:
+            _flush(batch, report, dry_run)
+            if on_batch:
+                on_batch(report)
+    finally:
+        if not dry_run and (report.inserted or report.updated):
+            bump_catalog_version()
+    return report
+
+
+# ----- export -----
+def _chunks(buf, rows, write, flush_at=64 * 1024):
+    for row in rows:
+        write(row)
+        if buf.tell() >= flush_at:
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+    if buf.tell():
+        yield buf.getvalue()
+
+
+def export_rows(fmt="csv", batch_size=BATCH_SIZE):
+    """
+    Generator of text chunks for the whole catalog. Rows are streamed from the
+    database `batch_size` at a time (yield_per), so memory does not grow with
+    the catalog. Output re-imports cleanly with import_products.
+    """
+    query = (
+        db.session.query(*[getattr(Product, field) for field in FIELDS])
+        .order_by(Product.id)
+        .yield_per(batch_size)
+    )
+    buf = io.StringIO()
+    if fmt == "jsonl":
+        def write(row):
+            record = {field: (str(value) if isinstance(value, Decimal) else value)
+                      for field, value in zip(FIELDS, row)}
+            buf.write(json.dumps(record, ensure_ascii=False))
+            buf.write("\n")
+    else:
+        writer = csv.writer(buf)
+        writer.writerow(FIELDS)
+
+        def write(row):
+            writer.writerow(["" if value is None else value for value in row])
+    yield from _chunks(buf, query, write)
+
+
+def init_app(app):
+    @app.cli.command("products-import")
+    @click.argument("file", type=click.File("rb"))
+    @click.option("--format", "fmt", type=click.Choice(["csv", "jsonl"]), default=None,
+                  help="Defaults to the file extension (csv if unknown).")
+    @click.option("--batch-size", default=BATCH_SIZE, show_default=True)
+    @click.option("--dry-run", is_flag=True, help="Validate and roll back every batch.")
+    def products_import(file, fmt, batch_size, dry_run):
+        """Import products from CSV / JSONL, upserting on sku."""
+        fmt = fmt or detect_format(file.name)
+
+        def progress(report):
+            click.echo(f"  ... {report.inserted + report.updated} rows", err=True)
+
+        report = import_products(file, fmt, batch_size=batch_size, dry_run=dry_run, on_batch=progress)
+        for line_no, message in report.errors[:50]:
+            click.echo(f"  ! line {line_no}: {message}")
+        if report.error_count > 50:
+            click.echo(f"  ... and {report.error_count - 50} more error(s)")
+        prefix = "[dry run] " if dry_run else ""
+        click.echo(f"{prefix}Inserted {report.inserted}, updated {report.updated}, "
+                   f"{report.error_count} error(s)")
+
+    @app.cli.command("products-export")
+    @click.argument("file", type=click.File("w", encoding="utf-8"), default="-")
+    @click.option("--format", "fmt", type=click.Choice(["csv", "jsonl"]), default=None,
+                  help="Defaults to the file extension (csv if unknown).")
+    def products_export(file, fmt):
+        """Export every product as CSV / JSONL (stdout by default)."""
+        fmt = fmt or detect_format(file.name)
+        for chunk in export_rows(fmt):
+            file.write(chunk)
@@ -0,0 +1,106 @@
+# cart.py -- pricing a session cart with one products query
+import hashlib
+
+from catalog_cache import catalog_cache
+from images import variant_urls
+from models import Product
+
+
+def _parse_cart(cart):
+    """
+    Normalize the raw session cart { "pid": qty } into [(pid, qty)].
+    Lines with non-numeric ids / quantities are skipped.
+    """
+    lines = []
+    for pid_str, qty in (cart or {}).items():
+        try:
+            lines.append((int(pid_str), int(qty)))
+        except Exception:
+            continue
+    return lines
+
+
+def load_products(ids):
+    """
+    Load every product in `ids` with a single IN (...) query.
+    Returns { id: Product }. Missing ids are simply absent.
+    """
+    ids = set(ids)
+    if not ids:
+        return {}
+    rows = Product.query.filter(Product.id.in_(ids)).all()
+    return {p.id: p for p in rows}
+
+
+def cart_version(cart):
+    """
+    Version of the priced cart: its lines + the catalog version (prices,
+    titles). Equal versions mean an equal summary, so a client holding one
+    can skip refetching; computed without touching the products table.
+    """
+    lines = sorted(_parse_cart(cart))
+    raw = f"{catalog_cache.version()}|{lines}"
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:16]
+
+
+class CartSummary:
+    """
+    Priced cart: lines (product + qty), total and count computed once.
+    Used both for the JSON summary and for the cart.html render.
+    """
+
+    def __init__(self, lines, version=None):
+        self.lines = lines
+        self.version = version
+        self.total = 0.0
+        self.count = 0
+        for line in lines:
+            self.total += line["subtotal"]
+            self.count += line["qty"]
+
+    def to_dict(self):
+        """
+        Return dict { items: [...], total: float, count: int, version: str }
+        Items: { id, title, price (float), qty (int), subtotal (float), image, thumb }
+        """
+        items = []
+        for line in self.lines:
+            product = line["product"]
+            items.append({
+                "id": product.id,
+                "title": getattr(product, "title", None) or getattr(product, "name", ""),
+                "price": line["price"],
+                "qty": line["qty"],
+                "subtotal": line["subtotal"],
+                "image": getattr(product, "image", "") or "",
+                # small rendition for the 64x64 drawer, None when not generated yet
+                "thumb": variant_urls(product.image_variants).get("thumb")
+            })
+        return {"items": items, "total": self.total, "count": self.count, "version": self.version}
+
+    def template_items(self):
+        # cart.html expects [{ product, qty }]
+        return [{"product": line["product"], "qty": line["qty"]} for line in self.lines]
+
+
+def price_cart(cart, products=None):
+    """
+    Price a raw session cart dict with one query, whatever the number of lines.
+    `products` ({ id: Product }, e.g. just loaded to validate a batch) are
+    reused; only the other lines are queried.
+    """
+    parsed = _parse_cart(cart)
+    products = dict(products or {})
+    products.update(load_products(pid for pid, _ in parsed if pid not in products))
+    lines = []
+    for pid, qty in parsed:
+        product = products.get(pid)
+        if not product:
+            continue
+        # ensure numeric price
+        try:
+            price = float(product.price)
+        except Exception:
+            price = 0.0
+        lines.append({"product": product, "price": price, "qty": qty, "subtotal": price * qty})
+    return CartSummary(lines, cart_version(cart))
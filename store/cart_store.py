@@ -0,0 +1,245 @@
+# cart_store.py -- where carts live: one Redis hash per cart, or the cookie session
+import os
+import uuid
+
+from flask import current_app, session
+
+from redis_client import get_redis
+
+CART_OPS = ("add", "set", "remove")
+MAX_BATCH_OPS = 50
+
+
+def parse_ops(raw):
+    """
+    [{"op": "add" | "set" | "remove", "product_id": 3, "qty": 1}, ...] from a
+    request body -> [(op, pid, qty)]. ValueError names the first bad entry:
+    a batch is applied whole or not at all.
+    """
+    if not isinstance(raw, list) or not raw:
+        raise ValueError("ops must be a non-empty list")
+    if len(raw) > MAX_BATCH_OPS:
+        raise ValueError(f"at most {MAX_BATCH_OPS} ops per batch")
+    ops = []
+    for i, entry in enumerate(raw):
+        if not isinstance(entry, dict) or entry.get("op") not in CART_OPS:
+            raise ValueError(f"ops[{i}]: op must be one of {', '.join(CART_OPS)}")
+        if entry["op"] == "set" and "qty" not in entry:
+            raise ValueError(f"ops[{i}]: qty required")
+        try:
+            pid = int(entry.get("product_id"))
+            qty = int(entry.get("qty", 1 if entry["op"] == "add" else 0))
+        except (TypeError, ValueError):
+            raise ValueError(f"ops[{i}]: invalid product_id / qty") from None
+        ops.append((entry["op"], pid, qty))
+    return ops
+
+
+def apply_ops(cart, ops):
+    """New cart dict after `ops`, same rules as the single-line calls (qty <= 0 drops the line)."""
+    cart = dict(cart)
+    for op, pid, qty in ops:
+        key = str(pid)
+        if op == "add":
+            qty = cart.get(key, 0) + qty
+        if op == "remove" or qty <= 0:
+            cart.pop(key, None)
+        else:
+            cart[key] = qty
+    return cart
+
+
+class RedisCartStore:
+    """
+    cart:<id> is a hash { product_id: qty }. Each mutation is one atomic
+    command (HINCRBY / HSET / HDEL) pipelined with the TTL refresh and the
+    read-back, so a request costs a single round trip and concurrent tabs
+    never overwrite each other's lines.
+    """
+
+    def __init__(self, client=None, ttl=86400, prefix="cart:"):
+        # client=None: the shared pool from redis_client, resolved per process
+        self._client = client
+        self.ttl = ttl
+        self.prefix = prefix
+
+    @property
+    def client(self):
+        return self._client or get_redis()
+
+    def _key(self, cart_id):
+        return self.prefix + cart_id
+
+    @staticmethod
+    def _decode(raw):
+        return {(k.decode() if isinstance(k, bytes) else k): int(v) for k, v in raw.items()}
+
+    def _run(self, cart_id, command):
+        key = self._key(cart_id)
+        pipe = self.client.pipeline()
+        command(pipe, key)
+        pipe.expire(key, self.ttl)
+        pipe.hgetall(key)
+        return self._decode(pipe.execute()[-1])
+
+    def get(self, cart_id):
+        # read + sliding expiry in one round trip
+        return self._run(cart_id, lambda pipe, key: None)
+
+    def add(self, cart_id, pid, qty):
+        cart = self._run(cart_id, lambda pipe, key: pipe.hincrby(key, pid, qty))
+        if cart.get(str(pid), 0) <= 0:
+            return self.remove(cart_id, pid)
+        return cart
+
+    def set(self, cart_id, pid, qty):
+        if qty <= 0:
+            return self.remove(cart_id, pid)
+        return self._run(cart_id, lambda pipe, key: pipe.hset(key, pid, qty))
+
+    def remove(self, cart_id, pid):
+        return self._run(cart_id, lambda pipe, key: pipe.hdel(key, pid))
+
+    def replace(self, cart_id, cart):
+        def command(pipe, key):
+            pipe.delete(key)
+            if cart:
+                pipe.hset(key, mapping=cart)
+        return self._run(cart_id, command)
+
+    def apply(self, cart_id, ops):
+        """
+        Several ops as one change: read, compute, write back in MULTI under
+        WATCH, retried if another request touched the cart in between.
+        Returns (cart, changed).
+        """
+        key = self._key(cart_id)
+
+        def transaction(pipe):
+            old = self._decode(pipe.hgetall(key))
+            new = apply_ops(old, ops)
+            pipe.multi()
+            if new != old:
+                pipe.delete(key)
+                if new:
+                    pipe.hset(key, mapping=new)
+            pipe.expire(key, self.ttl)
+            return new, new != old
+
+        return self.client.transaction(transaction, key, value_from_callable=True)
+
+    def clear(self, cart_id):
+        self.client.delete(self._key(cart_id))
+
+
+class SessionCartStore:
+    """Fallback: the whole cart dict in the (signed cookie) session, as before."""
+
+    def get(self, cart_id):
+        return dict(session.get("cart") or {})
+
+    def _save(self, cart):
+        session["cart"] = cart
+        session.modified = True
+        return dict(cart)
+
+    def add(self, cart_id, pid, qty):
+        cart = self.get(cart_id)
+        cart[str(pid)] = cart.get(str(pid), 0) + qty
+        if cart[str(pid)] <= 0:
+            cart.pop(str(pid))
+        return self._save(cart)
+
+    def set(self, cart_id, pid, qty):
+        cart = self.get(cart_id)
+        if qty <= 0:
+            cart.pop(str(pid), None)
+        else:
+            cart[str(pid)] = qty
+        return self._save(cart)
+
+    def remove(self, cart_id, pid):
+        cart = self.get(cart_id)
+        cart.pop(str(pid), None)
+        return self._save(cart)
+
+    def replace(self, cart_id, cart):
+        return self._save(dict(cart))
+
+    def apply(self, cart_id, ops):
+        old = self.get(cart_id)
+        new = apply_ops(old, ops)
+        if new == old:
+            return old, False
+        return self._save(new), True
+
+    def clear(self, cart_id):
+        session.pop("cart", None)
+
+
+# ----- current request's cart -----
+def _store():
+    return current_app.extensions["cart_store"]
+
+
+def _cart_id(create=False):
+    """Id of this visitor's cart (kept in the session cookie), created on first write."""
+    store = _store()
+    if isinstance(store, SessionCartStore):
+        return None
+    cart_id = session.get("cart_id")
+    if cart_id is None and (create or "cart" in session):
+        cart_id = session["cart_id"] = uuid.uuid4().hex
+        session.permanent = True
+        legacy = session.pop("cart", None)
+        if legacy:
+            # cart from before the Redis store: move it over once
+            store.replace(cart_id, legacy)
+    return cart_id
+
+
+def current_cart():
+    """{ "product_id": qty } for this visitor; no Redis call when there is no cart yet."""
+    cart_id = _cart_id()
+    if cart_id is None and not isinstance(_store(), SessionCartStore):
+        return {}
+    return _store().get(cart_id)
+
+
+def add_item(pid, qty):
+    return _store().add(_cart_id(create=True), pid, qty)
+
+
+def set_item(pid, qty):
+    return _store().set(_cart_id(create=True), pid, qty)
+
+
+def remove_item(pid):
+    cart_id = _cart_id()
+    if cart_id is None and not isinstance(_store(), SessionCartStore):
+        return {}
+    return _store().remove(cart_id, pid)
+
+
+def apply(ops):
+    """Apply parsed ops (see parse_ops) to this visitor's cart atomically: (cart, changed)."""
+    return _store().apply(_cart_id(create=True), ops)
+
+
+def init_app(app, store=None):
+    """
+    CART_BACKEND=redis (default when REDIS_URL is set) or cookie.
+    Pass `store` to use a specific one (e.g. RedisCartStore(fakeredis.FakeRedis())).
+    """
+    if store is None:
+        backend = os.getenv("CART_BACKEND") or ("redis" if os.getenv("REDIS_URL") else "cookie")
+        if backend == "redis":
+            if not os.getenv("REDIS_URL"):
+                # the local stand-in has no hashes / pipelines: fail at boot, not on the first cart
+                raise RuntimeError("CART_BACKEND=redis needs REDIS_URL")
+            # same lifetime as the (permanent) session cookie that holds the cart id
+            ttl = int(os.getenv("CART_TTL", app.permanent_session_lifetime.total_seconds()))
+            store = RedisCartStore(ttl=ttl)
+        else:
+            store = SessionCartStore()
+    app.extensions["cart_store"] = store
@@ -0,0 +1,161 @@
+# catalog.py -- shared product listing query (filters + sort) used by the API and the admin list
+import base64
+import json
+from decimal import Decimal
+
+from sqlalchemy import and_, or_
+
+from models import Product
+from search import apply_search
+from catalog_cache import catalog_cache
+
+
+def filters_from_args(args):
+    """Read the listing filters from request args (same names as /api/products)."""
+    return {
+        "q": args.get("q", type=str),
+        "category": args.get("category", type=str),
+        "price_min": args.get("price_min", type=float),
+        "price_max": args.get("price_max", type=float),
+    }
+
+
+def filtered_query(q=None, category=None, price_min=None, price_max=None, rank=False):
+    """
+    Product.query with the listing filters applied.
+    Returns (query, relevance) -- relevance is the bm25 column, None unless rank=True and q is set.
+    """
+    query = Product.query
+    relevance = None
+
+    # basic filters (if model has fields)
+    if q:
+        query, relevance = apply_search(query, q, rank=rank)
+    if category:
+        # if Product has category attribute
+        if hasattr(Product, "category"):
+            query = query.filter(Product.category == category)
+    if price_min is not None:
+        query = query.filter(Product.price >= price_min)
+    if price_max is not None:
+        query = query.filter(Product.price <= price_max)
+    return query, relevance
+
+
+def count_products(filters):
+    """COUNT(*) for a filter set, computed once per catalog version."""
+    key = ("count",) + tuple(sorted(filters.items()))
+    return int(catalog_cache.value(key, lambda: str(filtered_query(**filters)[0].count()).encode()))
+
+
+def sort_keys(sort, relevance=None):
+    """
+    Ordering for a sort option as [(column, descending)].
+    Always ends with Product.id so the order is total (needed for cursors).
+    """
+    if sort == "price_asc":
+        return [(Product.price, False), (Product.id, False)]
+    if sort == "price_desc":
+        return [(Product.price, True), (Product.id, True)]
+    if sort == "title_asc":
+        return [(Product.title, False), (Product.id, False)]
+    if sort == "title_desc":
+        return [(Product.title, True), (Product.id, True)]
+    if sort == "oldest":
+        return [(Product.id, False)]
+    if sort == "relevance" and relevance is not None:
+        # bm25: lower is better
+        return [(relevance, False), (Product.id, True)]
+    # default order by id desc
+    return [(Product.id, True)]
+
+
+def _order_by(keys):
+    return [col.desc() if desc else col.asc() for col, desc in keys]
+
+
+def build_product_query(filters, sort=None):
+    """Filtered + sorted listing query for /api/products (page / offset mode)."""
+    query, relevance = filtered_query(rank=(sort == "relevance"), **filters)
+    return query.order_by(*_order_by(sort_keys(sort, relevance)))
+
+
+# ----- keyset (cursor) pagination -----
+def encode_cursor(sort, values):
+    raw = json.dumps({"s": sort or "", "v": [str(v) if isinstance(v, Decimal) else v for v in values]})
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def _cursor_value(col, value):
+    """A cursor value as its sort column's type (as encode_cursor wrote it); ValueError otherwise."""
+    if col is Product.price:
+        if isinstance(value, (str, int, float)) and not isinstance(value, bool):
+            try:
+                price = Decimal(str(value))
+            except ArithmeticError:
+                price = None
+            if price is not None and price.is_finite():
+                return price
+    elif col is Product.id:
+        if isinstance(value, int) and not isinstance(value, bool):
+            return value
+    elif col is Product.title:
+        if isinstance(value, str):
+            return value
+    elif isinstance(value, (int, float)) and not isinstance(value, bool):
+        # relevance (bm25)
+        return float(value)
+    raise ValueError("invalid cursor")
+
+
+def decode_cursor(cursor, sort, keys):
+    """Opaque cursor -> key values. Raises ValueError if it is malformed or for another sort."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        values = data["v"]
+    except Exception:
+        raise ValueError("invalid cursor")
+    if not isinstance(values, list):
+        raise ValueError("invalid cursor")
+    if data.get("s") != (sort or "") or len(values) != len(keys):
+        raise ValueError("cursor does not match sort")
+    return [_cursor_value(col, v) for v, (col, _) in zip(values, keys)]
+
+
+def _after(keys, values):
+    """Rows strictly after `values` in `keys` order: (k1 > v1) OR (k1 = v1 AND (k2 > v2 ...))."""
+    (col, desc), value = keys[0], values[0]
+    past = col < value if desc else col > value
+    if len(keys) == 1:
+        return past
+    return or_(past, and_(col == value, _after(keys[1:], values[1:])))
+
+
+def keyset_query(filters, sort=None, cursor=None):
+    """
+    Listing query seeking past `cursor` on the sort keys instead of using OFFSET.
+    Each row is (Product, *key values) so the next cursor can be built from the last one.
+    """
+    query, relevance = filtered_query(rank=(sort == "relevance"), **filters)
+    keys = sort_keys(sort, relevance)
+    if cursor:
+        query = query.filter(_after(keys, decode_cursor(cursor, sort, keys)))
+    return query.add_columns(*[col for col, _ in keys]).order_by(*_order_by(keys))
+
+
+def keyset_page(filters, sort=None, cursor=None, limit=9, offset=0):
+    """
+    One page after `cursor` (None = first page).
+    Returns (products, next_cursor); next_cursor is None on the last page.
+    `offset` serves numbered pages (shallow only) while still handing out a
+    cursor for the page after them.
+    """
+    query = keyset_query(filters, sort, cursor)
+    if offset:
+        query = query.offset(offset)
+    rows = query.limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = encode_cursor(sort, list(rows[-1][1:])) if has_more and rows else None
+    return [row[0] for row in rows], next_cursor
@@ -0,0 +1,176 @@
+# catalog_cache.py -- read-through cache for catalog reads, keyed on a shared catalog version
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app, g
+
+from redis_client import get_redis
+
+VERSION_KEY = "catalog:version"
+UPDATED_AT_KEY = "catalog:updated_at"
+
+
+class LRUCache:
+    """
+    Thread-safe LRU bounded both by entry count and by total payload bytes.
+    Values are bytes (already serialized JSON) so their size is exact.
+    """
+
+    def __init__(self, max_entries=1024, max_bytes=16 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._data = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            value = self._data.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        size = len(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old)
+            self._data[key] = value
+            self._bytes += size
+            while len(self._data) > self.max_entries or self._bytes > self.max_bytes:
+                _, evicted = self._data.popitem(last=False)
+                self._bytes -= len(evicted)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._data),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+class CatalogCache:
+    """
+    Product rows and serialized /api/products results, namespaced by the
+    catalog version. Admin writes bump the version (shared through Redis, or
+    the FileRedis file without REDIS_URL), so every worker stops serving old
+    entries on its next request.
+    """
+
+    def __init__(self):
+        self.rows = LRUCache()
+        self.queries = LRUCache()
+        self._seen_version = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        app.config.setdefault("CATALOG_CACHE_ENABLED", True)
+        app.config.setdefault("CATALOG_CACHE_MAX_ENTRIES", 2048)
+        app.config.setdefault("CATALOG_CACHE_MAX_BYTES", 32 * 1024 * 1024)
+        for lru in (self.rows, self.queries):
+            lru.max_entries = app.config["CATALOG_CACHE_MAX_ENTRIES"]
+            lru.max_bytes = app.config["CATALOG_CACHE_MAX_BYTES"]
+        app.extensions["catalog_cache"] = self
+
+    # ----- version -----
+    def version(self):
+        """Current catalog version; read from Redis at most once per request."""
+        if "catalog_version" in g:
+            return g.catalog_version
+        r = get_redis()
+        raw, updated_at = r.mget(VERSION_KEY, UPDATED_AT_KEY)
+        if raw is None:
+            self._seed(r)
+            raw, updated_at = r.mget(VERSION_KEY, UPDATED_AT_KEY)
+        version = int(raw)
+        with self._lock:
+            if version != self._seen_version:
+                # entries of older versions can never be hit again: free them now
+                self.rows.clear()
+                self.queries.clear()
+                self._seen_version = version
+        g.catalog_version = version
+        g.catalog_updated_at = int(updated_at or 0)
+        return version
+
+    def updated_at(self):
+        """Unix time of the last catalog write (for Last-Modified)."""
+        self.version()
+        return g.catalog_updated_at
+
+    def _seed(self, r):
+        # seed with a timestamp so a fresh Redis / restarted stand-in never reuses old versions
+        now = time.time()
+        r.set(VERSION_KEY, int(now * 1000), nx=True)
+        r.set(UPDATED_AT_KEY, int(now), nx=True)
+
+    def bump(self):
+        """Invalidate the catalog for every worker. Call after committing a product write."""
+        r = get_redis()
+        if r.get(VERSION_KEY) is None:
+            self._seed(r)
+        version = r.incr(VERSION_KEY)
+        r.set(UPDATED_AT_KEY, int(time.time()))
+        g.pop("catalog_version", None)
+        return version
+
+    # ----- read-through helpers -----
+    def _enabled(self):
+        return current_app.config.get("CATALOG_CACHE_ENABLED", True)
+
+    def _through(self, lru, key, build):
+        if not self._enabled():
+            return build()
+        full_key = (self.version(), key)
+        body = lru.get(full_key)
+        if body is None:
+            body = build()
+            if body is not None:
+                lru.set(full_key, body)
+        return body
+
+    def product(self, product_id, build):
+        """Serialized product row; `build()` returns bytes, or None when not found."""
+        return self._through(self.rows, product_id, build)
+
+    def query(self, args, build):
+        """Serialized query result keyed on the normalized request args."""
+        key = tuple(sorted((k, v) for k, v in args.items(multi=True)))
+        return self._through(self.queries, key, build)
+
+    def value(self, key, build):
+        """Any other bytes derived from the catalog (e.g. a COUNT), keyed on a hashable key."""
+        return self._through(self.queries, key, build)
+
+    def stats(self):
+        return {
+            "version": self.version(),
+            "rows": self.rows.stats(),
+            "queries": self.queries.stats(),
+        }
+
+
+catalog_cache = CatalogCache()
+
+
+def bump_catalog_version():
+    return catalog_cache.bump()
@@ -0,0 +1,99 @@
+# catalog_explain.py -- `flask catalog-explain`: query plans for every /api/products filter combination
+import itertools
+import re
+
+import click
+from sqlalchemy import func, select, text
+
+from models import db
+from catalog import build_product_query, encode_cursor, filtered_query, keyset_query
+
+SORTS = [None, "oldest", "price_asc", "price_desc", "title_asc", "title_desc", "relevance"]
+
+# sample values for a "second page" cursor, per sort
+_CURSOR_SAMPLES = {
+    None: [1000],
+    "oldest": [1000],
+    "price_asc": ["100.00", 1000],
+    "price_desc": ["100.00", 1000],
+    "title_asc": ["Áo", 1000],
+    "title_desc": ["Áo", 1000],
+    "relevance": [-1.0, 1000],
+}
+
+_SQLITE_FULL_SCAN = re.compile(r"^SCAN (TABLE )?products\b(?!_)(?!.*USING)")
+_SQLITE_TEMP_SORT = re.compile(r"USE TEMP B-TREE FOR ORDER BY")
+_PG_FULL_SCAN = re.compile(r"Seq Scan on products\b(?!_)")
+
+
+def _combinations():
+    for q, category, price, sort in itertools.product(
+        [None, "ao thun"], [None, "Áo"], [None, (10.0, 500.0)], SORTS
+    ):
+        if sort == "relevance" and not q:
+            continue
+        yield {
+            "q": q,
+            "category": category,
+            "price_min": price[0] if price else None,
+            "price_max": price[1] if price else None,
+        }, sort
+
+
+def _statements(filters, sort):
+    """The statements /api/products issues for one filter combination."""
+    base, _ = filtered_query(**filters)
+    yield "count", select(func.count()).select_from(base.order_by(None).subquery())
+    yield "page", build_product_query(filters, sort).limit(9).offset(0).statement
+    yield "keyset", keyset_query(filters, sort).limit(10).statement
+    # a later page: exercises the seek predicate
+    cursor = encode_cursor(sort, _CURSOR_SAMPLES[sort])
+    yield "keyset+cursor", keyset_query(filters, sort, cursor).limit(10).statement
+
+
+def _explain(conn, dialect, kind, stmt):
+    sql = str(stmt.compile(dialect=dialect, compile_kwargs={"literal_binds": True}))
+    if dialect.name == "sqlite":
+        lines = [row[3] for row in conn.execute(text("EXPLAIN QUERY PLAN " + sql))]
+        flags = []
+        temp_sort = any(_SQLITE_TEMP_SORT.search(line) for line in lines)
+        if any(_SQLITE_FULL_SCAN.search(line) for line in lines):
+            # a rowid-order scan feeding ORDER BY id ... LIMIT stops after one page
+            flags.append("FULL SCAN" if temp_sort or kind == "count" else "ORDERED SCAN")
+        if temp_sort:
+            flags.append("TEMP SORT")
+    else:
+        lines = [row[0] for row in conn.execute(text("EXPLAIN " + sql))]
+        flags = ["FULL SCAN"] if any(_PG_FULL_SCAN.search(line) for line in lines) else []
+    return lines, flags
+
+
+def explain_catalog():
+    """Yield (label, kind, plan lines, flags) for every filter combination."""
+    engine = db.engine
+    with engine.connect() as conn:
+        for filters, sort in _combinations():
+            label = ", ".join(f"{k}={v}" for k, v in filters.items() if v is not None) or "no filter"
+            label += f" | sort={sort or 'default'}"
+            for kind, stmt in _statements(filters, sort):
+                lines, flags = _explain(conn, engine.dialect, kind, stmt)
+                yield label, kind, lines, flags
+
+
+def init_app(app):
+    @app.cli.command("catalog-explain")
+    @click.option("--verbose", "-v", is_flag=True, help="Print the plan of every statement.")
+    @click.option("--strict", is_flag=True, help="Exit with status 1 when a full scan is found.")
+    def catalog_explain(verbose, strict):
+        """EXPLAIN each /api/products filter combination and flag full scans."""
+        full_scans = 0
+        for label, kind, lines, flags in explain_catalog():
+            if "FULL SCAN" in flags:
+                full_scans += 1
+            if flags or verbose:
+                click.echo(f"[{' '.join(flags) or 'ok'}] {label} ({kind})")
+                for line in lines:
+                    click.echo(f"      {line}")
+        click.echo(f"{full_scans} statement(s) with a full scan of products")
+        if strict and full_scans:
+            raise SystemExit(1)
@@ -0,0 +1,95 @@
+# catalog_gen.py -- synthetic catalog (10k .. 1M products) for load tests / benchmarks
+import random
+import time
+
+import click
+
+from models import db, Product
+from catalog_cache import bump_catalog_version
+
+# category -> (product types, price range)
+CATEGORIES = {
+    "Áo": (["Áo Thun", "Áo Polo", "Áo Sơ Mi", "Áo Hoodie", "Áo Len", "Áo Croptop", "Áo Tank Top"], (89, 459)),
+    "Quần": (["Quần Jean", "Quần Jogger", "Quần Kaki", "Quần Short", "Quần Tây", "Quần Ống Rộng"], (129, 599)),
+    "Áo khoác": (["Áo Khoác Bomber", "Áo Khoác Gió", "Áo Blazer", "Áo Khoác Dù", "Áo Cardigan"], (249, 990)),
+    "Váy": (["Váy Baby Doll", "Váy Midi", "Chân Váy Xếp Ly", "Váy Maxi", "Váy Suông"], (159, 690)),
+    "Đầm": (["Đầm Dạ Hội", "Đầm Công Sở", "Đầm Body", "Đầm Hoa Nhí", "Đầm Suông"], (199, 1290)),
+    "Phụ kiện": (["Mũ Lưỡi Trai", "Túi Tote", "Thắt Lưng Da", "Khăn Lụa", "Tất Cổ Cao"], (39, 349)),
+}
+MATERIALS = ["Cotton", "Linen", "Nỉ", "Lụa", "Kaki", "Denim", "Len", "Dù", "Voan", "Thun Lạnh"]
+STYLES = ["Basic", "Form Rộng", "Slimfit", "Oversize", "Hàn Quốc", "Vintage", "Streetwear", "Công Sở", "Unisex"]
+COLORS = ["Đen", "Trắng", "Be", "Xám", "Xanh Navy", "Đỏ Đô", "Nâu", "Hồng Pastel", "Xanh Rêu"]
+PHRASES = [
+    "chất liệu thoáng mát, thấm hút mồ hôi",
+    "đường may chắc chắn, không xù lông",
+    "phù hợp đi học, đi làm và dạo phố",
+    "dễ phối đồ, tôn dáng người mặc",
+    "giặt máy thoải mái, không phai màu",
+    "thiết kế trẻ trung, năng động",
+    "đóng gói cẩn thận, đổi trả trong 7 ngày",
+]
+IMAGES = [f"a{i}.jpg" for i in range(1, 10)]
+
+
+def fake_product(rnd, n):
+    category = rnd.choice(list(CATEGORIES))
+    kinds, (low, high) = CATEGORIES[category]
+    title = f"{rnd.choice(kinds)} {rnd.choice(MATERIALS)} {rnd.choice(STYLES)} {rnd.choice(COLORS)}"
+    # shop-style prices ending in 9, like the seed data (159, 349, ...)
+    price = rnd.randrange(low + 1, high + 2, 10) - 1
+    # most products rate well, a long tail does not
+    rating = round(min(5.0, max(1.0, rnd.gauss(4.3, 0.5))), 1)
+    return {
+        "sku": f"GEN-{n:07d}",
+        "title": title,
+        "description": ", ".join(rnd.sample(PHRASES, 3)).capitalize() + ".",
+        "price": price,
+        "currency": "USD",
+        "category": category,
+        "rating": rating,
+        "image": rnd.choice(IMAGES),
+    }
+
+
+def generate(rows, seed=42, batch_size=5000, start=0, on_batch=None):
+    """
+    Insert `rows` synthetic products (skus GEN-<start>.. so runs can be appended),
+    `batch_size` per executemany + commit. Deterministic for a given seed.
+    """
+    rnd = random.Random(seed + start)
+    done = 0
+    while done < rows:
+        n = min(batch_size, rows - done)
+        db.session.bulk_insert_mappings(
+            Product, [fake_product(rnd, start + done + i) for i in range(n)]
+        )
+        db.session.commit()
+        done += n
+        if on_batch:
+            on_batch(done)
+    bump_catalog_version()
+    return done
+
+
+def init_app(app):
+    @app.cli.command("catalog-generate")
+    @click.option("--rows", default=10_000, show_default=True, help="How many products to add.")
+    @click.option("--seed", default=42, show_default=True)
+    @click.option("--batch-size", default=5000, show_default=True)
+    @click.option("--reset", is_flag=True, help="Delete every product first.")
+    def catalog_generate(rows, seed, batch_size, reset):
+        """Fill the catalog with realistic synthetic products (bulk inserts)."""
+        if reset:
+            Product.query.delete()
+            db.session.commit()
+        # continue after the last generated sku so repeated runs append
+        last = db.session.query(db.func.max(Product.sku)).filter(Product.sku.like("GEN-%")).scalar()
+        start = int(last[4:]) + 1 if last else 0
+        began = time.perf_counter()
+
+        def progress(done):
+            rate = done / max(time.perf_counter() - began, 1e-9)
+            click.echo(f"  ... {done}/{rows} ({rate:,.0f} rows/s)", err=True)
+
+        generate(rows, seed=seed, batch_size=batch_size, start=start, on_batch=progress)
+        click.echo(f"Inserted {rows} products in {time.perf_counter() - began:.1f}s")
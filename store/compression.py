@@ -0,0 +1,109 @@
+# compression.py -- gzip / brotli for dynamic responses (HTML, JSON), negotiated per request
+import gzip
+import os
+import threading
+from collections import OrderedDict
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only without it
+    brotli = None
+
+COMPRESSIBLE = {
+    "text/html", "text/css", "text/plain", "text/javascript", "application/javascript",
+    "application/json", "image/svg+xml",
+}
+
+
+class Compressor:
+    """
+    Compresses finished responses in after_request. Responses that carry a
+    strong ETag (catalog reads, see http_cache.py) name their content, so
+    their compressed bytes are kept in a small LRU: one compression per
+    catalog version and URL instead of one per request.
+    """
+
+    def __init__(self, min_size=500, gzip_level=6, br_quality=5, cache_size=256):
+        self.min_size = min_size
+        self.gzip_level = gzip_level
+        # per request: brotli 5 is smaller than gzip -6 at about half its CPU (bench_compress.py);
+        # 11 is for build-time assets (static_assets.py), far too slow here
+        self.br_quality = br_quality
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def encodings(self):
+        return ("br", "gzip") if brotli else ("gzip",)
+
+    def negotiate(self, accept_encodings):
+        """Best encoding the client accepts (q > 0), or None."""
+        best, best_q = None, 0
+        for encoding in self.encodings():
+            q = accept_encodings[encoding]
+            if q > best_q:
+                best, best_q = encoding, q
+        return best
+
+    def compress(self, data, encoding):
+        if encoding == "br":
+            return brotli.compress(data, quality=self.br_quality)
+        return gzip.compress(data, compresslevel=self.gzip_level, mtime=0)
+
+    def _cached(self, key, data, encoding):
+        if key is None or not self.cache_size:
+            return self.compress(data, encoding)
+        with self._lock:
+            body = self._cache.get(key)
+            if body is not None:
+                self._cache.move_to_end(key)
+                return body
+        body = self.compress(data, encoding)
+        with self._lock:
+            self._cache[key] = body
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return body
+
+    def __call__(self, response):
+        if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+                or "Content-Encoding" in response.headers or response.mimetype not in COMPRESSIBLE
+                or response.cache_control.no_transform):
+            return response
+        data = response.get_data()
+        if len(data) < self.min_size:
+            return response
+        # the answer depends on Accept-Encoding from here on, whatever it is
+        response.vary.add("Accept-Encoding")
+        encoding = self.negotiate(request.accept_encodings)
+        if encoding is None:
+            return response
+        etag, weak = response.get_etag()
+        key = (request.full_path, etag, encoding) if etag and not weak else None
+        response.set_data(self._cached(key, data, encoding))
+        response.headers["Content-Encoding"] = encoding
+        if etag:
+            # same entity, different bytes: a strong tag would claim byte equality
+            response.set_etag(etag, weak=True)
+        return response
+
+
+def init_app(app):
+    """
+    COMPRESS_ENABLED (default on), COMPRESS_MIN_SIZE (bytes), COMPRESS_GZIP_LEVEL,
+    COMPRESS_BR_QUALITY, COMPRESS_CACHE_SIZE (compressed catalog bodies kept, 0 = off).
+    Call after metrics.init_app: after_request hooks run last-registered first,
+    so the compression time is part of the request's Server-Timing.
+    """
+    if os.getenv("COMPRESS_ENABLED", "1") in ("0", "false", "no"):
+        return
+    compressor = Compressor(
+        min_size=int(os.getenv("COMPRESS_MIN_SIZE", 500)),
+        gzip_level=int(os.getenv("COMPRESS_GZIP_LEVEL", 6)),
+        br_quality=int(os.getenv("COMPRESS_BR_QUALITY", 5)),
+        cache_size=int(os.getenv("COMPRESS_CACHE_SIZE", 256)),
+    )
+    app.extensions["compression"] = compressor
+    app.after_request(compressor)
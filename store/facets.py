@@ -0,0 +1,105 @@
+# facets.py -- counts for the filter sidebar (categories, price histogram, rating buckets)
+import json
+import math
+from decimal import Decimal
+
+from sqlalchemy import case, func
+
+from models import db, Product
+from catalog import filtered_query
+from catalog_cache import catalog_cache
+
+PRICE_BUCKETS = 6
+RATING_THRESHOLDS = (4, 3, 2, 1)
+
+
+def _without(filters, *names):
+    # a facet ignores its own filter, so the other choices keep their counts
+    return dict(filters, **{name: None for name in names})
+
+
+def _nice_step(span, buckets):
+    """Round span / buckets up to 1, 2 or 5 x 10^k."""
+    raw = Decimal(str(span)) / buckets
+    if raw <= 0:
+        return Decimal(1)
+    magnitude = Decimal(10) ** math.floor(math.log10(raw))
+    for m in (1, 2, 5, 10):
+        if raw <= m * magnitude:
+            return m * magnitude
+    return 10 * magnitude
+
+
+def price_edges(buckets=PRICE_BUCKETS):
+    """
+    (lower bounds, step) of the histogram buckets over the whole catalog's
+    price range. The MIN/MAX is two index lookups, cached per catalog
+    version, so the histogram stays one grouped query.
+    """
+    def build():
+        low, high = db.session.query(func.min(Product.price), func.max(Product.price)).one()
+        return json.dumps([str(low), str(high)] if low is not None else []).encode()
+
+    bounds = json.loads(catalog_cache.value(("price_range",), build))
+    if not bounds:
+        return [], None
+    low, high = Decimal(bounds[0]), Decimal(bounds[1])
+    step = _nice_step(high - low, buckets)
+    start = (low // step) * step
+    edges = [start]
+    while edges[-1] + step <= high:
+        edges.append(edges[-1] + step)
+    return edges, step
+
+
+def category_counts(filters):
+    query, _ = filtered_query(**_without(filters, "category"))
+    rows = (
+        query.with_entities(Product.category, func.count())
+        .filter(Product.category.isnot(None))
+        .group_by(Product.category)
+        .order_by(func.count().desc(), Product.category)
+    )
+    return [{"value": category, "count": count} for category, count in rows]
+
+
+def price_histogram(filters):
+    edges, step = price_edges()
+    if not edges:
+        return []
+    query, _ = filtered_query(**_without(filters, "price_min", "price_max"))
+    if len(edges) == 1:
+        # one price across the catalog: a single bucket (a CASE needs at least one WHEN)
+        return [{"min": float(edges[0]), "max": float(edges[0] + step), "count": query.count()}]
+    # bucket index: first upper bound the price is below
+    bucket = case(
+        *[(Product.price < edge + step, i) for i, edge in enumerate(edges[:-1])],
+        else_=len(edges) - 1,
+    )
+    counts = dict(query.with_entities(bucket, func.count()).group_by(bucket))
+    return [
+        {"min": float(edge), "max": float(edge + step), "count": counts.get(i, 0)}
+        for i, edge in enumerate(edges)
+    ]
+
+
+def rating_buckets(filters):
+    query, _ = filtered_query(**filters)
+    row = query.with_entities(
+        *[func.sum(case((Product.rating >= t, 1), else_=0)) for t in RATING_THRESHOLDS]
+    ).one()
+    return [{"min": t, "count": int(n or 0)} for t, n in zip(RATING_THRESHOLDS, row)]
+
+
+def product_facets(filters):
+    """
+    { categories: [{value, count}], price: [{min, max, count}], rating: [{min, count}] }
+    One grouped query per facet; categories ignore the category filter and
+    the price histogram ignores the price range (standard facet behaviour).
+    Rating counts are cumulative ("4 sao trở lên").
+    """
+    return {
+        "categories": category_counts(filters),
+        "price": price_histogram(filters),
+        "rating": rating_buckets(filters),
+    }
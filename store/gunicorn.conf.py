@@ -0,0 +1,48 @@
+# gunicorn.conf.py -- gunicorn -c gunicorn.conf.py wsgi:app
+# Every setting can be overridden from the environment (WEB_CONCURRENCY, ...).
+import multiprocessing
+import os
+
+cpus = multiprocessing.cpu_count()
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:5000")
+
+# small boxes: few processes with threads (requests mostly wait on DB / Redis / PayPal);
+# bigger boxes: the classic 2 x CPU + 1 sync workers
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "gthread" if cpus <= 2 else "sync")
+workers = int(os.getenv("WEB_CONCURRENCY", cpus + 1 if worker_class == "gthread" else min(2 * cpus + 1, 12)))
+threads = int(os.getenv("GUNICORN_THREADS", 4 if worker_class == "gthread" else 1))
+
+# import (and warm up, see wsgi.py) once in the master, fork copy-on-write workers
+preload_app = os.getenv("GUNICORN_PRELOAD", "1") not in ("0", "false", "no")
+
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 30))
+graceful_timeout = 20
+keepalive = 5
+# recycle workers now and then so slow leaks cannot pile up
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", 2000))
+max_requests_jitter = 200
+
+# GUNICORN_ACCESSLOG="" turns the access log off
+accesslog = os.getenv("GUNICORN_ACCESSLOG", "-") or None
+loglevel = os.getenv("GUNICORN_LOGLEVEL", "info")
+
+
+def post_fork(server, worker):
+    """
+    Sockets opened in the master (during preload / warm-up) must not be
+    shared between workers: drop them so each worker opens its own.
+    """
+    from backend import app
+    from models import db
+    from redis_client import reset_redis
+    from paypal_gateway import reset_gateway
+    import metrics
+
+    with app.app_context():
+        # close=False: leave the master's connections alone, just forget them here
+        db.engine.dispose(close=False)
+    # the catalog version lives in Redis / the shared FileRedis file, nothing to keep
+    reset_redis()
+    reset_gateway()
+    metrics.registry.reset()
@@ -0,0 +1,126 @@
+# http_cache.py -- conditional GET (ETag / Last-Modified / Cache-Control) for catalog reads
+import hashlib
+from datetime import datetime, timezone
+from functools import wraps
+
+from flask import current_app, make_response, request
+from flask.sessions import SecureCookieSessionInterface
+
+from catalog_cache import catalog_cache
+
+
+def catalog_etag(assets=False, extra=None):
+    """
+    Strong ETag for the current request: catalog version + endpoint + arguments.
+    Any product write bumps the version, so the tag changes with the content.
+    `assets`: the page links hashed css / js, so the asset build is part of it too.
+    `extra`: (version, unix time) of other data the answer is built from.
+    """
+    args = sorted(request.args.items(multi=True))
+    raw = f"{request.endpoint}|{sorted(request.view_args.items())}|{args}"
+    if assets:
+        raw += f"|{current_app.extensions['static_assets'].build_id}"
+    if extra:
+        raw += f"|{extra[0]}"
+    digest = hashlib.sha1(raw.encode("utf-8")).hexdigest()[:16]
+    return f"{catalog_cache.version()}-{digest}"
+
+
+def _last_modified(assets=False, extra=None):
+    updated_at = catalog_cache.updated_at()
+    if assets:
+        updated_at = max(updated_at, current_app.extensions["static_assets"].built_at)
+    if extra:
+        updated_at = max(updated_at, extra[1])
+    return datetime.fromtimestamp(updated_at, tz=timezone.utc)
+
+
+def _cache_control(response):
+    cfg = current_app.config
+    response.cache_control.public = True
+    response.cache_control.max_age = cfg.get("CATALOG_MAX_AGE", 60)
+    # shared caches (CDN) may keep it a little longer and revalidate in the background
+    response.cache_control.s_maxage = cfg.get("CATALOG_S_MAXAGE", 60)
+    # set as a raw directive: Werkzeug < 3.1 has no stale_while_revalidate property
+    # and silently drops the attribute
+    swr = cfg.get("CATALOG_STALE_WHILE_REVALIDATE", 30)
+    if swr:
+        response.cache_control["stale-while-revalidate"] = str(swr)
+    return response
+
+
+def _private(response):
+    """Per-user answer after all: browser cache only, nothing a CDN may store."""
+    response.cache_control.public = False
+    response.cache_control.private = True
+    response.cache_control.s_maxage = None
+    response.cache_control.pop("stale-while-revalidate", None)
+    return response
+
+
+class CatalogSessionInterface(SecureCookieSessionInterface):
+    """
+    The cookie session, minus Set-Cookie on publicly cacheable answers.
+    Permanent sessions (the cart id) are re-sent on every request; on a
+    catalog read that cookie would be stored by a CDN and handed to other
+    visitors. Such answers skip the refresh; one whose view did use or change
+    the session is downgraded to private instead.
+    """
+
+    def save_session(self, app, session, response):
+        if response.cache_control.public:
+            if not (session.accessed or session.modified):
+                return
+            _private(response)
+        super().save_session(app, session, response)
+
+
+def _validators(response, etag, last_modified):
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    return _cache_control(response)
+
+
+def _not_modified(etag, last_modified):
+    if request.if_none_match:
+        # weak comparison (RFC 9110): compressed answers carry W/"<etag>", see compression.py
+        return request.if_none_match.contains_weak(etag)
+    if request.if_modified_since:
+        return last_modified <= request.if_modified_since
+    return False
+
+
+def conditional(view, assets=False, validators=None):
+    """
+    Answer If-None-Match / If-Modified-Since with 304 *before* running the view
+    (no query, no serialization), and add validators + Cache-Control to 200s.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not current_app.config.get("CATALOG_CONDITIONAL_GET", True):
+            return view(*args, **kwargs)
+        extra = validators() if validators else None
+        etag = catalog_etag(assets, extra)
+        last_modified = _last_modified(assets, extra)
+        if _not_modified(etag, last_modified):
+            return _validators(current_app.response_class(status=304), etag, last_modified)
+
+        response = make_response(view(*args, **kwargs))
+        if response.status_code == 200:
+            _validators(response, etag, last_modified)
+        return response
+    return wrapper
+
+
+def conditional_page(view):
+    """`conditional` for HTML pages: a new asset build (new dist/ names) also changes the validators."""
+    return conditional(view, assets=True)
+
+
+def conditional_on(validators):
+    """`conditional` for answers built from more than the catalog: validators() -> (version, unix time)."""
+    return lambda view: conditional(view, validators=validators)
+
+
+def init_app(app):
+    app.session_interface = CatalogSessionInterface()
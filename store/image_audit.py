@@ -0,0 +1,328 @@
+# image_audit.py -- `flask images-audit`: check every product image (local or remote), write a JSON report
+#
+# Products are streamed (yield_per) and each distinct image is checked once,
+# as soon as it is first seen: local files against an index of static/images
+# built once up front, remote URLs (Cloudinary) through a thread pool and a
+# pluggable fetcher. Dimensions come from Pillow in a process pool. Flags:
+#   missing      no such file / HTTP 404 (or any other HTTP error, see "status")
+#   miscased     only a file differing in case exists (fine on macOS, 404 on Linux)
+#   oversized    more than --max-bytes, or a side longer than --max-px
+#   unreadable   Pillow cannot read it
+#   unreachable  the fetch failed (timeout, DNS, ...)
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+
+import click
+
+from images import DERIVED_DIR, IMAGES_DIR
+
+SAMPLE_IDS = 20
+MAX_DOWNLOAD = 32 * 1024 * 1024
+
+
+# ----- fetchers: fetch(url) -> Fetched -----
+class Fetched:
+    __slots__ = ("status", "body", "size", "error")
+
+    def __init__(self, status=None, body=None, size=None, error=None):
+        self.status = status
+        self.body = body
+        self.size = size if size is not None else (len(body) if body is not None else None)
+        self.error = error
+
+
+class HttpFetcher:
+    """GET over one pooled requests.Session shared by the audit threads."""
+
+    def __init__(self, pool_size=16, connect_timeout=3.05, read_timeout=15, max_bytes=MAX_DOWNLOAD):
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self._requests = requests
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_bytes = max_bytes
+
+    def fetch(self, url):
+        try:
+            with self.session.get(url, timeout=self.timeout, stream=True) as response:
+                if response.status_code >= 400:
+                    return Fetched(status=response.status_code)
+                length = response.headers.get("Content-Length")
+                if length and int(length) > self.max_bytes:
+                    # size is known, no need to download it: too big anyway
+                    return Fetched(status=response.status_code, size=int(length))
+                body = response.raw.read(self.max_bytes + 1, decode_content=True)
+                if len(body) > self.max_bytes:
+                    return Fetched(status=response.status_code, size=len(body))
+                return Fetched(status=response.status_code, body=body)
+        except self._requests.RequestException as exc:
+            return Fetched(error=f"{type(exc).__name__}: {exc}")
+
+
+class DirectoryFetcher:
+    """Offline stub: serves a URL from `root`/<last path segment>, 404 when absent."""
+
+    def __init__(self, root):
+        self.root = root
+
+    def fetch(self, url):
+        path = os.path.join(self.root, url.rstrip("/").rsplit("/", 1)[-1].split("?")[0])
+        if not os.path.isfile(path):
+            return Fetched(status=404)
+        with open(path, "rb") as f:
+            return Fetched(status=200, body=f.read())
+
+
+class OfflineFetcher:
+    """Skip remote images (reported as not checked)."""
+
+    def fetch(self, url):
+        return None
+
+
+# ----- local files -----
+class FileIndex:
+    """Every file under static/images (derived renditions aside), listed once: exact + lower-case lookups."""
+
+    def __init__(self, root=IMAGES_DIR, skip=(DERIVED_DIR,)):
+        self.root = root
+        self.sizes = {}
+        self.lower = {}
+        skip = {os.path.abspath(s) for s in skip}
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames[:] = [d for d in dirnames if os.path.abspath(os.path.join(dirpath, d)) not in skip]
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                rel = os.path.relpath(path, root).replace(os.sep, "/")
+                self.sizes[rel] = os.path.getsize(path)
+                self.lower.setdefault(rel.lower(), []).append(rel)
+
+    def __len__(self):
+        return len(self.sizes)
+
+    def path(self, rel):
+        return os.path.join(self.root, rel)
+
+
+# ----- Pillow, in worker processes -----
+def probe_image(source):
+    """(width, height, format) of a path or bytes, or raise if Pillow cannot read it."""
+    import io
+    from PIL import Image
+
+    if isinstance(source, bytes):
+        source = io.BytesIO(source)
+    with Image.open(source) as img:
+        size, fmt = img.size, img.format
+        img.verify()  # whole file, without decoding pixels: catches truncated files
+    return size[0], size[1], fmt
+
+
+class _Inline:
+    """--processes 0: probe in the calling thread (small catalogs, debugging)."""
+
+    def submit(self, fn, *args):
+        from concurrent.futures import Future
+
+        future = Future()
+        try:
+            future.set_result(fn(*args))
+        except Exception as exc:
+            future.set_exception(exc)
+        return future
+
+    def shutdown(self, wait=True):
+        pass
+
+
+# ----- the audit -----
+def _is_remote(image):
+    return image.startswith(("http://", "https://"))
+
+
+def _new_entry(image):
+    return {"image": image, "kind": "remote" if _is_remote(image) else "local", "flags": [],
+            "product_count": 0, "product_ids": []}
+
+
+def _locate(entry, index, fetcher):
+    """I/O part (pool threads): fill status / size, return what Pillow should read (or None)."""
+    image = entry["image"]
+    if entry["kind"] == "remote":
+        fetched = fetcher.fetch(image)
+        if fetched is None:
+            entry["flags"].append("not_checked")
+            return None
+        entry["status"] = fetched.status
+        entry["bytes"] = fetched.size
+        if fetched.error:
+            entry["flags"].append("unreachable")
+            entry["error"] = fetched.error
+            return None
+        if fetched.status >= 400:
+            entry["flags"].append("missing")
+            return None
+        return fetched.body
+    rel = image.lstrip("/")
+    if rel.startswith("static/images/"):
+        rel = rel[len("static/images/"):]
+    if rel not in index.sizes:
+        matches = index.lower.get(rel.lower())
+        if not matches:
+            entry["flags"].append("missing")
+            return None
+        entry["flags"].append("miscased")
+        entry["suggestion"] = matches[0] if len(matches) == 1 else matches
+        rel = matches[0]
+    entry["file"] = rel
+    entry["bytes"] = index.sizes[rel]
+    return index.path(rel)
+
+
+def audit(products, fetcher, index=None, threads=16, processes=None, max_bytes=1024 * 1024, max_px=2400,
+          on_progress=None):
+    """
+    `products`: iterable of (id, image), streamed. Returns the report dict.
+    Each distinct image is checked once, starting as soon as it is first seen,
+    while the rest of the products are still being read. The Pillow workers
+    are spawned: from a script, call this under `if __name__ == "__main__":`.
+    """
+    index = index if index is not None else FileIndex()
+    if processes is None:
+        processes = min(4, os.cpu_count() or 1)
+    started = time.perf_counter()
+    entries = {}
+    no_image = {"product_count": 0, "product_ids": []}
+    total = 0
+
+    io_pool = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="audit")
+    # spawn: the parent holds threads and a DB connection, which must not be forked
+    cpu_pool = (ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context("spawn"))
+                if processes else _Inline())
+    located = {}  # io future -> entry
+    max_pending = threads * 8
+    probing = {}  # cpu future -> entry
+
+    def drain(block):
+        pending = set(located) | set(probing)
+        if not pending:
+            return
+        done, _ = wait(pending, timeout=None if block else 0, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future in located:
+                entry = located.pop(future)
+                source = future.result()
+                if source is not None:
+                    probing[cpu_pool.submit(probe_image, source)] = entry
+            else:
+                entry = probing.pop(future)
+                try:
+                    entry["width"], entry["height"], entry["format"] = future.result()
+                except BrokenProcessPool:
+                    raise  # the pool died, not the image
+                except Exception as exc:
+                    entry["flags"].append("unreadable")
+                    entry["error"] = f"{type(exc).__name__}: {exc}"
+
+    try:
+        for product_id, image in products:
+            total += 1
+            image = (image or "").strip()
+            bucket = no_image if not image else entries.get(image)
+            if bucket is None:
+                bucket = entries[image] = _new_entry(image)
+                located[io_pool.submit(_locate, bucket, index, fetcher)] = bucket
+                # bounded queue: thousands of distinct remote images must not all wait in memory
+                while len(located) + len(probing) > max_pending:
+                    drain(block=True)
+            bucket["product_count"] += 1
+            if len(bucket["product_ids"]) < SAMPLE_IDS:
+                bucket["product_ids"].append(product_id)
+            if total % 1000 == 0:
+                drain(block=False)
+                if on_progress:
+                    on_progress(total, len(entries))
+        while located or probing:
+            drain(block=True)
+    finally:
+        io_pool.shutdown(wait=True)
+        cpu_pool.shutdown(wait=True)
+
+    summary = {}
+    for entry in entries.values():
+        if entry.get("bytes") is not None and entry["bytes"] > max_bytes:
+            entry["flags"].append("oversized")
+        elif max(entry.get("width") or 0, entry.get("height") or 0) > max_px:
+            entry["flags"].append("oversized")
+        for flag in entry["flags"]:
+            summary[flag] = summary.get(flag, 0) + 1
+            summary[f"{flag}_products"] = summary.get(f"{flag}_products", 0) + entry["product_count"]
+
+    referenced = {e["file"] for e in entries.values() if "file" in e}
+    unreferenced = sorted(rel for rel in index.sizes if rel not in referenced)
+    return {
+        "generated_at": datetime.utcnow().isoformat() + "Z",
+        "seconds": round(time.perf_counter() - started, 2),
+        "products": total,
+        "products_without_image": no_image,
+        "images": {
+            "distinct": len(entries),
+            "local": sum(1 for e in entries.values() if e["kind"] == "local"),
+            "remote": sum(1 for e in entries.values() if e["kind"] == "remote"),
+            "files_on_disk": len(index),
+        },
+        "limits": {"max_bytes": max_bytes, "max_px": max_px},
+        "summary": summary,
+        "issues": sorted((e for e in entries.values() if e["flags"]), key=lambda e: -e["product_count"]),
+        # files no product points at (leftover uploads, renamed images): candidates for cleanup
+        "unreferenced_files": unreferenced,
+    }
+
+
+def stream_products(batch=1000):
+    from models import db, Product
+
+    return db.session.query(Product.id, Product.image).order_by(Product.id).yield_per(batch)
+
+
+def init_app(app):
+    @app.cli.command("images-audit")
+    @click.option("--out", default="image_audit.json", show_default=True, help="JSON report, '-' for stdout.")
+    @click.option("--threads", default=16, show_default=True, help="Concurrent file / HTTP checks.")
+    @click.option("--processes", type=int, help="Pillow worker processes (0 = inline; default min(4, CPUs)).")
+    @click.option("--max-bytes", default=1024 * 1024, show_default=True)
+    @click.option("--max-px", default=2400, show_default=True, help="Longest side allowed.")
+    @click.option("--offline", is_flag=True, help="Do not fetch remote images.")
+    @click.option("--mirror", type=click.Path(file_okay=False), help="Answer remote URLs from this folder (by file name).")
+    def images_audit(out, threads, processes, max_bytes, max_px, offline, mirror):
+        """Check every product image: missing, mis-cased, oversized, unreadable."""
+        if mirror:
+            fetcher = DirectoryFetcher(mirror)
+        elif offline:
+            fetcher = OfflineFetcher()
+        else:
+            fetcher = HttpFetcher(pool_size=threads)
+
+        def progress(products, images):
+            click.echo(f"  ... {products} products, {images} distinct images", err=True)
+
+        report = audit(stream_products(), fetcher, threads=threads, processes=processes,
+                       max_bytes=max_bytes, max_px=max_px, on_progress=progress)
+        data = json.dumps(report, indent=2, ensure_ascii=False)
+        if out == "-":
+            click.echo(data)
+        else:
+            with open(out, "w", encoding="utf-8") as f:
+                f.write(data)
+        summary = ", ".join(f"{k} {v}" for k, v in sorted(report["summary"].items()) if not k.endswith("_products"))
+        click.echo(f"{report['products']} products, {report['images']['distinct']} distinct images in "
+                   f"{report['seconds']}s: {summary or 'no issues'}" + ("" if out == "-" else f" -> {out}"), err=True)
@@ -0,0 +1,96 @@
+# image_jobs.py -- product image upload off the request thread (see jobs.py)
+import json
+import os
+import uuid
+
+from flask import current_app
+
+from catalog_cache import bump_catalog_version
+from images import generate_derivatives
+from jobs import enqueue, job, new_job_id
+from models import db, Product
+from uploader import get_uploader
+
+
+def _spool(image_file):
+    """Save the request's upload to instance/uploads so a job can read it later."""
+    spool_dir = os.path.join(current_app.instance_path, "uploads")
+    os.makedirs(spool_dir, exist_ok=True)
+    ext = os.path.splitext(image_file.filename or "")[1].lower() or ".jpg"
+    path = os.path.join(spool_dir, uuid.uuid4().hex + ext)
+    image_file.save(path)
+    return path
+
+
+def _discard(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def queue_product_image(product, image_file, old_image=None):
+    """
+    Mark `product` as waiting for its image and queue the upload.
+    The product row must already be committed (it needs an id).
+    """
+    path = _spool(image_file)
+    job_id = new_job_id()
+    product.image_status = "pending"
+    product.image_job_id = job_id
+    db.session.commit()
+    enqueue(
+        "product_image", product.id, path, image_file.filename or "", job_id, old_image,
+        job_id=job_id, on_failure="product_image_failed",
+    )
+    return job_id
+
+
+def _current(product_id, job_id):
+    # a newer upload for the same product supersedes this one
+    product = db.session.get(Product, product_id)
+    if product is None or product.image_job_id != job_id:
+        return None
+    return product
+
+
+@job("product_image")
+def process_product_image(product_id, path, filename, job_id, old_image=None):
+    product = _current(product_id, job_id)
+    if product is None:
+        _discard(path)
+        return {"skipped": True}
+
+    uploader = get_uploader()
+    url = uploader.upload(path)
+    try:
+        variants = json.dumps(generate_derivatives(path, os.path.splitext(filename or "img")[0]))
+    except Exception as e:
+        print("⚠️ Không thể tạo ảnh thu nhỏ:", e)
+        variants = None
+
+    # 🧠 Nếu sản phẩm đã có ảnh Cloudinary cũ → xóa
+    if old_image and old_image != url:
+        try:
+            uploader.destroy(old_image)
+            print(f"🗑️ Đã xóa ảnh cũ: {old_image}")
+        except Exception as e:
+            print("⚠️ Không thể xóa ảnh cũ:", e)
+
+    product.image = url
+    product.image_variants = variants
+    product.image_status = "ready"
+    db.session.commit()
+    bump_catalog_version()
+    _discard(path)
+    return {"image": url}
+
+
+@job("product_image_failed")
+def product_image_failed(product_id, path, filename, job_id, old_image=None):
+    product = _current(product_id, job_id)
+    if product is not None:
+        product.image_status = "failed"
+        db.session.commit()
+        bump_catalog_version()
+    _discard(path)
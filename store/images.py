@@ -0,0 +1,159 @@
+# images.py -- responsive image derivatives (thumb / grid / detail) with Pillow
+import hashlib
+import io
+import json
+import os
+
+import click
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+IMAGES_DIR = os.path.join(BASE_DIR, "static", "images")
+DERIVED_DIR = os.path.join(IMAGES_DIR, "derived")
+MEDIA_URL = "/media/"
+
+# name -> target width (px); thumb covers the 64x64 cart drawer at 2x
+SIZES = {"thumb": 128, "grid": 480, "detail": 1200}
+
+# format -> (Pillow format, extension, save options); avif only when Pillow was built with it
+FORMATS = {
+    "avif": ("AVIF", "avif", {"quality": 55}),
+    "webp": ("WEBP", "webp", {"quality": 78, "method": 4}),
+    "jpeg": ("JPEG", "jpg", {"quality": 82, "optimize": True, "progressive": True}),
+}
+
+
+def _available_formats():
+    from PIL import features
+    return [name for name in FORMATS if name != "avif" or features.check("avif")]
+
+
+def _save(img, fmt):
+    pil_format, ext, options = FORMATS[fmt]
+    buf = io.BytesIO()
+    img.save(buf, pil_format, **options)
+    return buf.getvalue(), ext
+
+
+def _write_hashed(stem, size_name, data, ext, out_dir):
+    # content-hashed name: a new rendition always gets a new URL, so it can be cached forever
+    digest = hashlib.sha1(data).hexdigest()[:12]
+    filename = f"{stem}-{size_name}-{digest}.{ext}"
+    path = os.path.join(out_dir, filename)
+    if not os.path.exists(path):
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    return filename
+
+
+def generate_derivatives(source, stem, out_dir=None):
+    """
+    Build every size x format from `source` (path, bytes or file object).
+    Returns the manifest stored on Product.image_variants:
+    { size: { "width": w, "height": h, fmt: filename, ... }, ... }
+    """
+    from PIL import Image, ImageOps
+
+    if isinstance(source, bytes):
+        source = io.BytesIO(source)
+    out_dir = out_dir or DERIVED_DIR
+    os.makedirs(out_dir, exist_ok=True)
+    stem = "".join(ch if ch.isalnum() or ch in "-_" else "-" for ch in stem)[:60] or "img"
+
+    with Image.open(source) as original:
+        original = ImageOps.exif_transpose(original)
+        if original.mode not in ("RGB", "L"):
+            # flatten transparency on white (JPEG has no alpha)
+            background = Image.new("RGB", original.size, (255, 255, 255))
+            background.paste(original, mask=original.convert("RGBA").split()[-1])
+            original = background
+        elif original.mode == "L":
+            original = original.convert("RGB")
+
+        formats = _available_formats()
+        manifest = {}
+        for size_name, width in SIZES.items():
+            img = original.copy()
+            # never upscale
+            if img.width > width:
+                img = img.resize((width, round(img.height * width / img.width)), Image.LANCZOS)
+            entry = {"width": img.width, "height": img.height}
+            for fmt in formats:
+                data, ext = _save(img, fmt)
+                entry[fmt] = _write_hashed(stem, size_name, data, ext, out_dir)
+            manifest[size_name] = entry
+    return manifest
+
+
+def variant_urls(manifest_json):
+    """
+    Product.image_variants (JSON text) -> API shape:
+    { "thumb": {"webp": url, "jpeg": url, ...}, "grid": ..., "detail": ...,
+      "srcset": {"webp": "url 128w, url 480w, ...", ...} }
+    """
+    if not manifest_json:
+        return {}
+    manifest = json.loads(manifest_json)
+    out = {}
+    srcset = {}
+    for size_name in SIZES:
+        entry = manifest.get(size_name)
+        if not entry:
+            continue
+        urls = {fmt: MEDIA_URL + entry[fmt] for fmt in FORMATS if fmt in entry}
+        out[size_name] = dict(urls, width=entry["width"], height=entry["height"])
+        for fmt, url in urls.items():
+            srcset.setdefault(fmt, []).append(f"{url} {entry['width']}w")
+    out["srcset"] = {fmt: ", ".join(items) for fmt, items in srcset.items()}
+    return out
+
+
+def local_image_path(image):
+    """Path of a product image stored under static/images, or None for remote (http) images."""
+    if not image or image.startswith(("http://", "https://")):
+        return None
+    return os.path.join(IMAGES_DIR, image)
+
+
+def init_app(app):
+    @app.route("/media/<path:filename>")
+    def media(filename):
+        from flask import send_from_directory
+        # hashed names never change content: cache forever
+        response = send_from_directory(DERIVED_DIR, filename, max_age=31536000)
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+        return response
+
+    @app.cli.command("images-build")
+    @click.option("--force", is_flag=True, help="Rebuild products that already have derivatives.")
+    def images_build(force):
+        """Generate derivatives for products whose image is a local static file."""
+        from models import db, Product
+        from catalog_cache import bump_catalog_version
+
+        done = failed = 0
+        built = {}  # several products often share one file
+        query = Product.query.order_by(Product.id)
+        if not force:
+            query = query.filter(Product.image_variants.is_(None))
+        for product in query.yield_per(200):
+            path = local_image_path(product.image)
+            if not path:
+                continue
+            if path not in built:
+                try:
+                    built[path] = json.dumps(generate_derivatives(path, os.path.splitext(product.image)[0]))
+                except Exception as e:
+                    built[path] = None
+                    click.echo(f"  ! id={product.id} {product.image}: {e}")
+            if built[path] is None:
+                failed += 1
+                continue
+            product.image_variants = built[path]
+            done += 1
+        db.session.commit()
+        if done:
+            bump_catalog_version()
+        click.echo(f"Built derivatives for {done} product(s), {failed} failed")
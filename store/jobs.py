@@ -0,0 +1,176 @@
+# jobs.py -- background jobs: Redis queue + worker, or an in-process thread pool
+import json
+import os
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import click
+
+from redis_client import get_redis
+
+QUEUE_KEY = "jobs:queue"
+DELAYED_KEY = "jobs:delayed"
+STATUS_TTL = 24 * 3600
+
+_registry = {}
+
+
+def job(name):
+    """Register a function as a job: @job("upload_product_image")."""
+    def decorator(fn):
+        _registry[name] = fn
+        return fn
+    return decorator
+
+
+# ----- status (Redis or the local stand-in) -----
+def _status_key(job_id):
+    return f"job:{job_id}"
+
+
+def set_status(job_id, **fields):
+    r = get_redis()
+    raw = r.get(_status_key(job_id))
+    status = json.loads(raw) if raw else {"id": job_id}
+    status.update(fields, updated_at=time.time())
+    r.set(_status_key(job_id), json.dumps(status), ex=STATUS_TTL)
+    return status
+
+
+def get_status(job_id):
+    raw = get_redis().get(_status_key(job_id))
+    return json.loads(raw) if raw else None
+
+
+# ----- execution -----
+def _backoff(attempt, base):
+    return base * (2 ** (attempt - 1))
+
+
+def run_job(payload):
+    """
+    Run one attempt of a job (inside an app context).
+    Returns None when done / failed for good, or the retry delay in seconds.
+    """
+    job_id, name = payload["id"], payload["name"]
+    attempt = payload.get("attempts", 0) + 1
+    payload["attempts"] = attempt
+    max_attempts = payload.get("max_attempts", 3)
+    set_status(job_id, name=name, state="running", attempts=attempt)
+    try:
+        result = _registry[name](*payload.get("args", []), **payload.get("kwargs", {}))
+    except Exception as e:
+        if attempt < max_attempts:
+            delay = _backoff(attempt, payload.get("backoff", 2.0))
+            set_status(job_id, state="retrying", error=repr(e), retry_in=delay)
+            return delay
+        set_status(job_id, state="failed", error=repr(e))
+        traceback.print_exc()
+        on_failure = payload.get("on_failure")
+        if on_failure:
+            _registry[on_failure](*payload.get("args", []), **payload.get("kwargs", {}))
+        return None
+    set_status(job_id, state="done", result=result, error=None)
+    return None
+
+
+class SyncQueue:
+    """Runs jobs inline (tests / scripts); retries sleep in place."""
+
+    def __init__(self, app):
+        self.app = app
+
+    def _run(self, payload):
+        with self.app.app_context():
+            while True:
+                delay = run_job(payload)
+                if delay is None:
+                    return
+                time.sleep(delay)
+
+    def push(self, payload):
+        self._run(payload)
+
+
+class ThreadQueue(SyncQueue):
+    """In-process pool: enough for one box, jobs are lost if the worker process dies."""
+
+    def __init__(self, app, workers=4):
+        super().__init__(app)
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="jobs")
+
+    def push(self, payload):
+        self.executor.submit(self._run, payload)
+
+
+class RedisQueue:
+    """LPUSH onto a Redis list; `flask jobs-worker` processes it. Retries wait in a sorted set."""
+
+    def __init__(self, app):
+        self.app = app
+
+    def push(self, payload):
+        get_redis().lpush(QUEUE_KEY, json.dumps(payload))
+
+    def work(self, once=False):
+        r = get_redis()
+        while True:
+            # promote retries whose delay has passed
+            now = time.time()
+            for raw in r.zrangebyscore(DELAYED_KEY, 0, now):
+                if r.zrem(DELAYED_KEY, raw):
+                    r.lpush(QUEUE_KEY, raw)
+            item = r.brpop(QUEUE_KEY, timeout=1)
+            if item is None:
+                if once:
+                    return
+                continue
+            payload = json.loads(item[1])
+            with self.app.app_context():
+                delay = run_job(payload)
+            if delay is not None:
+                r.zadd(DELAYED_KEY, {json.dumps(payload): time.time() + delay})
+
+
+def enqueue(name, *args, job_id=None, max_attempts=3, backoff=2.0, on_failure=None, **kwargs):
+    """Queue `name(*args, **kwargs)`; returns the job id (see /admin/jobs/<id>)."""
+    from flask import current_app
+
+    job_id = job_id or uuid.uuid4().hex
+    payload = {
+        "id": job_id, "name": name, "args": list(args), "kwargs": kwargs,
+        "attempts": 0, "max_attempts": max_attempts, "backoff": backoff, "on_failure": on_failure,
+    }
+    set_status(job_id, name=name, state="queued", attempts=0)
+    current_app.extensions["jobs"].push(payload)
+    return job_id
+
+
+def new_job_id():
+    return uuid.uuid4().hex
+
+
+def init_app(app):
+    """JOBS_BACKEND: redis (needs `flask jobs-worker`), thread (default) or sync."""
+    backend = os.getenv("JOBS_BACKEND", app.config.get("JOBS_BACKEND", "thread"))
+    if backend == "redis":
+        if not os.getenv("REDIS_URL"):
+            # the local stand-in has no lists: fail at boot, not on the first enqueue
+            raise RuntimeError("JOBS_BACKEND=redis needs REDIS_URL")
+        queue = RedisQueue(app)
+    elif backend == "sync":
+        queue = SyncQueue(app)
+    else:
+        queue = ThreadQueue(app, workers=int(os.getenv("JOBS_THREADS", 4)))
+    app.extensions["jobs"] = queue
+
+    @app.cli.command("jobs-worker")
+    @click.option("--once", is_flag=True, help="Exit when the queue is empty.")
+    def jobs_worker(once):
+        """Process jobs from the Redis queue."""
+        # make sure job functions are registered
+        import image_jobs  # noqa: F401
+        import related  # noqa: F401
+        RedisQueue(app).work(once=once)
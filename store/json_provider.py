@@ -0,0 +1,58 @@
+# json_provider.py -- Flask JSON provider: orjson when installed, stdlib json otherwise
+from decimal import Decimal
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # optional speed-up
+    orjson = None
+
+
+def _default(o):
+    # Numeric columns come back as Decimal: send them as JSON numbers
+    if isinstance(o, Decimal):
+        return float(o)
+    return DefaultJSONProvider.default(o)
+
+
+class StdJSONProvider(DefaultJSONProvider):
+    """Flask's provider, with Decimal -> number and a bytes helper."""
+
+    default = staticmethod(_default)
+
+    def dumps_bytes(self, obj):
+        return self.dumps(obj).encode("utf-8")
+
+
+class OrjsonProvider(StdJSONProvider):
+    """Same output as StdJSONProvider (sorted keys, compact), serialized by orjson."""
+
+    # datetimes go through _default like in Flask (HTTP date format)
+    _options = (orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME) if orjson else 0
+
+    def dumps_bytes(self, obj):
+        return orjson.dumps(obj, default=_default, option=self._options)
+
+    def dumps(self, obj, **kwargs):
+        if kwargs:
+            # indent / custom cls etc.: let the stdlib handle the unusual cases
+            return super().dumps(obj, **kwargs)
+        return self.dumps_bytes(obj).decode("utf-8")
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        if self.compact is False or (self.compact is None and self._app.debug):
+            # keep pretty-printed output in debug mode
+            return super().response(*args, **kwargs)
+        return self._app.response_class(self.dumps_bytes(obj), mimetype=self.mimetype)
+
+
+def init_app(app):
+    provider = OrjsonProvider if orjson is not None else StdJSONProvider
+    app.json = provider(app)
@@ -0,0 +1,380 @@
+# metrics.py -- per-request SQL / latency instrumentation, Prometheus text at /metrics
+import contextvars
+import heapq
+import hmac
+import logging
+import os
+import re
+import threading
+import time
+from collections import Counter
+from functools import lru_cache
+
+from flask import Response, abort, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+log = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+# distinct (endpoint, statement shape) pairs kept; later ones are only counted per endpoint
+MAX_SHAPES = 500
+
+# without METRICS_TOKEN, /metrics answers these addresses only (a scraper on the same host)
+LOCAL_ADDRESSES = ("127.0.0.1", "::1")
+
+# stats of the request running in this thread / context (None outside requests)
+_current = contextvars.ContextVar("request_metrics", default=None)
+
+
+@lru_cache(maxsize=2048)
+def statement_shape(statement):
+    """SQL with whitespace collapsed and IN (?, ?, ...) folded, so N+1 loops share one shape."""
+    shape = re.sub(r"\s+", " ", statement).strip()
+    return re.sub(r"\(\s*\?(?:\s*,\s*\?)+\s*\)", "(?, ...)", shape)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last one is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        i = 0
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                break
+        else:
+            i = len(self.buckets)
+        self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        """Estimate like Prometheus' histogram_quantile (linear inside the bucket)."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        lower = 0.0
+        for bound, n in zip(self.buckets + (float("inf"),), self.counts):
+            if seen + n >= rank and n:
+                if bound == float("inf"):
+                    return lower
+                return lower + (bound - lower) * (rank - seen) / n
+            seen += n
+            lower = bound
+        return lower
+
+
+class RequestStats:
+    __slots__ = ("start", "queries", "sql_time", "shapes", "status", "external_time")
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.queries = 0
+        self.sql_time = 0.0
+        self.shapes = {}  # shape -> [count, seconds, max seconds]
+        self.status = None
+        self.external_time = 0.0  # PayPal & co, see record_external
+
+
+class EndpointStats:
+    def __init__(self):
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.queries = Histogram(QUERY_BUCKETS)
+        self.sql_time = 0.0
+        self.statuses = Counter()
+        self.n_plus_one = 0
+
+
+class ExternalStats:
+    """Calls to one operation of a remote service (PayPal capture, ...)."""
+
+    def __init__(self):
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.outcomes = Counter()  # HTTP status, "timeout" or "error"
+
+
+class Registry:
+    """
+    In-process aggregates (one per worker process: scrape each worker, or
+    sum them in Prometheus). Updated once per request under a lock; the
+    per-query hooks only touch the request's own RequestStats.
+    """
+
+    def __init__(self, slow_queries=20, n_plus_one_threshold=5):
+        self.lock = threading.Lock()
+        self.endpoints = {}
+        self.shapes = {}  # (endpoint, shape) -> [count, total seconds, max seconds]
+        self.slowest = []  # min-heap of (seconds, ts, endpoint, shape)
+        self.slow_queries = slow_queries
+        self.n_plus_one_threshold = n_plus_one_threshold
+        self.n_plus_one_recent = []  # last detections, newest first
+        self.external = {}  # (service, operation) -> ExternalStats
+        self.started = time.time()
+
+    def reset(self):
+        """Forget everything (warm-up traffic, or a fresh worker after fork)."""
+        with self.lock:
+            self.endpoints.clear()
+            self.shapes.clear()
+            self.slowest.clear()
+            self.n_plus_one_recent.clear()
+            self.external.clear()
+            self.started = time.time()
+
+    def record_request(self, endpoint, method, stats, seconds):
+        now = time.time()
+        suspects = []
+        with self.lock:
+            ep = self.endpoints.get((endpoint, method))
+            if ep is None:
+                ep = self.endpoints[(endpoint, method)] = EndpointStats()
+            ep.latency.observe(seconds)
+            ep.queries.observe(stats.queries)
+            ep.sql_time += stats.sql_time
+            ep.statuses[stats.status or 500] += 1
+
+            for shape, (n, total, worst) in stats.shapes.items():
+                entry = self.shapes.get((endpoint, shape))
+                if entry is None and len(self.shapes) < MAX_SHAPES:
+                    entry = self.shapes[(endpoint, shape)] = [0, 0.0, 0.0]
+                if entry is not None:
+                    entry[0] += n
+                    entry[1] += total
+                    entry[2] = max(entry[2], worst)
+                item = (worst, now, endpoint, shape)
+                if len(self.slowest) < self.slow_queries:
+                    heapq.heappush(self.slowest, item)
+                elif worst > self.slowest[0][0]:
+                    heapq.heapreplace(self.slowest, item)
+                # the same statement shape over and over in one request: a loop doing queries
+                if n >= self.n_plus_one_threshold:
+                    suspects.append((shape, n))
+
+            if suspects:
+                ep.n_plus_one += 1
+                for shape, n in suspects:
+                    self.n_plus_one_recent.insert(0, {
+                        "endpoint": endpoint, "path": request.path, "count": n, "shape": shape, "ts": now,
+                    })
+                del self.n_plus_one_recent[20:]
+        for shape, n in suspects:
+            log.warning("possible N+1 on %s: %d x %s", endpoint, n, shape[:200])
+
+    def record_external(self, service, operation, seconds, outcome):
+        """One outgoing call; also counted in the current request's Server-Timing."""
+        stats = _current.get()
+        if stats is not None:
+            stats.external_time += seconds
+        with self.lock:
+            entry = self.external.get((service, operation))
+            if entry is None:
+                entry = self.external[(service, operation)] = ExternalStats()
+            entry.latency.observe(seconds)
+            entry.outcomes[str(outcome)] += 1
+
+    # ----- output -----
+    def prometheus(self):
+        def esc(value):
+            return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+        def hist(name, labels, h):
+            cumulative = 0
+            for bound, n in zip(h.buckets, h.counts):
+                cumulative += n
+                out.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+            out.append(f'{name}_bucket{{{labels},le="+Inf"}} {h.count}')
+            out.append(f"{name}_sum{{{labels}}} {h.sum}")
+            out.append(f"{name}_count{{{labels}}} {h.count}")
+
+        out = []
+        with self.lock:
+            endpoints = sorted(self.endpoints.items())
+            out.append("# HELP store_request_duration_seconds Request latency by endpoint.")
+            out.append("# TYPE store_request_duration_seconds histogram")
+            for (endpoint, method), ep in endpoints:
+                hist("store_request_duration_seconds", f'endpoint="{esc(endpoint)}",method="{method}"', ep.latency)
+            out.append("# HELP store_requests_total Requests by endpoint and status.")
+            out.append("# TYPE store_requests_total counter")
+            for (endpoint, method), ep in endpoints:
+                for status, n in sorted(ep.statuses.items()):
+                    out.append(f'store_requests_total{{endpoint="{esc(endpoint)}",method="{method}",status="{status}"}} {n}')
+            out.append("# HELP store_sql_queries_per_request SQL statements per request.")
+            out.append("# TYPE store_sql_queries_per_request histogram")
+            for (endpoint, method), ep in endpoints:
+                hist("store_sql_queries_per_request", f'endpoint="{esc(endpoint)}",method="{method}"', ep.queries)
+            out.append("# HELP store_sql_seconds_total Time spent in SQL.")
+            out.append("# TYPE store_sql_seconds_total counter")
+            for (endpoint, method), ep in endpoints:
+                out.append(f'store_sql_seconds_total{{endpoint="{esc(endpoint)}",method="{method}"}} {ep.sql_time}')
+            out.append("# HELP store_n_plus_one_requests_total Requests repeating one statement shape N+ times.")
+            out.append("# TYPE store_n_plus_one_requests_total counter")
+            for (endpoint, method), ep in endpoints:
+                out.append(f'store_n_plus_one_requests_total{{endpoint="{esc(endpoint)}",method="{method}"}} {ep.n_plus_one}')
+            external = sorted(self.external.items())
+            out.append("# HELP store_external_call_duration_seconds Latency of calls to remote services.")
+            out.append("# TYPE store_external_call_duration_seconds histogram")
+            for (service, operation), ext in external:
+                hist("store_external_call_duration_seconds", f'service="{service}",operation="{operation}"', ext.latency)
+            out.append("# HELP store_external_calls_total Calls to remote services by outcome.")
+            out.append("# TYPE store_external_calls_total counter")
+            for (service, operation), ext in external:
+                for outcome, n in sorted(ext.outcomes.items()):
+                    out.append(f'store_external_calls_total{{service="{service}",operation="{operation}",outcome="{esc(outcome)}"}} {n}')
+        return "\n".join(out) + "\n"
+
+    def snapshot(self):
+        """Plain data for the admin page."""
+        with self.lock:
+            endpoints = []
+            for (endpoint, method), ep in sorted(self.endpoints.items()):
+                n = ep.latency.count
+                endpoints.append({
+                    "endpoint": endpoint,
+                    "method": method,
+                    "requests": n,
+                    "errors": sum(c for s, c in ep.statuses.items() if s >= 500),
+                    "mean_ms": ep.latency.sum / n * 1000 if n else 0,
+                    "p50_ms": (ep.latency.quantile(0.5) or 0) * 1000,
+                    "p95_ms": (ep.latency.quantile(0.95) or 0) * 1000,
+                    "p99_ms": (ep.latency.quantile(0.99) or 0) * 1000,
+                    "queries_avg": ep.queries.sum / n if n else 0,
+                    "sql_ms_avg": ep.sql_time / n * 1000 if n else 0,
+                    "sql_share": ep.sql_time / ep.latency.sum if ep.latency.sum else 0,
+                    "n_plus_one": ep.n_plus_one,
+                })
+            shapes = sorted(
+                ({"endpoint": e, "shape": s, "count": v[0], "total_ms": v[1] * 1000,
+                  "avg_ms": v[1] / v[0] * 1000, "max_ms": v[2] * 1000}
+                 for (e, s), v in self.shapes.items()),
+                key=lambda row: row["total_ms"], reverse=True,
+            )[:30]
+            slowest = [
+                {"ms": sec * 1000, "ts": ts, "endpoint": e, "shape": s}
+                for sec, ts, e, s in sorted(self.slowest, reverse=True)
+            ]
+            external = [
+                {
+                    "service": service,
+                    "operation": operation,
+                    "calls": ext.latency.count,
+                    "errors": sum(n for o, n in ext.outcomes.items() if not o.startswith("2")),
+                    "outcomes": dict(ext.outcomes),
+                    "p50_ms": (ext.latency.quantile(0.5) or 0) * 1000,
+                    "p95_ms": (ext.latency.quantile(0.95) or 0) * 1000,
+                    "p99_ms": (ext.latency.quantile(0.99) or 0) * 1000,
+                }
+                for (service, operation), ext in sorted(self.external.items())
+            ]
+            return {
+                "since": self.started,
+                "pid": os.getpid(),
+                "endpoints": endpoints,
+                "shapes": shapes,
+                "slowest": slowest,
+                "n_plus_one": list(self.n_plus_one_recent),
+                "external": external,
+            }
+
+
+registry = Registry()
+
+
+# ----- hooks -----
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        conn.info.setdefault("metrics_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current.get()
+    if stats is None:
+        return
+    starts = conn.info.get("metrics_start")
+    if not starts:
+        return
+    seconds = time.perf_counter() - starts.pop()
+    stats.queries += 1
+    stats.sql_time += seconds
+    shape = statement_shape(statement)
+    entry = stats.shapes.get(shape)
+    if entry is None:
+        stats.shapes[shape] = [1, seconds, seconds]
+    else:
+        entry[0] += 1
+        entry[1] += seconds
+        if seconds > entry[2]:
+            entry[2] = seconds
+
+
+def _handle_error(context):
+    # a failed statement never reaches after_cursor_execute: drop its start time here
+    conn = context.connection
+    if conn is not None and _current.get() is not None:
+        starts = conn.info.get("metrics_start")
+        if starts:
+            starts.pop()
+
+
+def _metrics_allowed():
+    token = os.getenv("METRICS_TOKEN")
+    if token:
+        return hmac.compare_digest(request.headers.get("Authorization", ""), f"Bearer {token}")
+    return request.remote_addr in LOCAL_ADDRESSES
+
+
+def _before_request():
+    request.environ["store.metrics_token"] = _current.set(RequestStats())
+
+
+def _after_request(response):
+    stats = _current.get()
+    if stats is not None:
+        stats.status = response.status_code
+        # visible in the browser's network tab
+        app_ms = (time.perf_counter() - stats.start) * 1000
+        timing = f'db;dur={stats.sql_time * 1000:.1f};desc="{stats.queries} queries", app;dur={app_ms:.1f}'
+        if stats.external_time:
+            timing += f", ext;dur={stats.external_time * 1000:.1f}"
+        response.headers.add("Server-Timing", timing)
+    return response
+
+
+def _teardown_request(exc):
+    stats = _current.get()
+    token = request.environ.pop("store.metrics_token", None)
+    if stats is None:
+        return
+    registry.record_request(request.endpoint or "unknown", request.method, stats,
+                            time.perf_counter() - stats.start)
+    if token is not None:
+        _current.reset(token)
+
+
+def init_app(app):
+    """
+    METRICS_ENABLED (default on), N_PLUS_ONE_THRESHOLD, METRICS_TOKEN: bearer
+    token for /metrics; without it /metrics only answers local requests.
+    """
+    if os.getenv("METRICS_ENABLED", "1") in ("0", "false", "no"):
+        return
+    registry.n_plus_one_threshold = int(os.getenv("N_PLUS_ONE_THRESHOLD", registry.n_plus_one_threshold))
+    # engine-wide and process-wide: register once even if several apps are created
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(Engine, "handle_error", _handle_error)
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
+
+    @app.route("/metrics")
+    def prometheus_metrics():
+        if not _metrics_allowed():
+            abort(401 if os.getenv("METRICS_TOKEN") else 403)
+        return Response(registry.prometheus(), mimetype="text/plain; version=0.0.4")
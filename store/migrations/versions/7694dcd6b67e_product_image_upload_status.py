@@ -0,0 +1,29 @@
+"""product image upload status
+
+Revision ID: 7694dcd6b67e
+Revises: d2ef92cec6cb
+Create Date: 2026-10-18 17:31:23.228432
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7694dcd6b67e'
+down_revision = 'd2ef92cec6cb'
+branch_labels = None
+depends_on = None
+
+
+# plain ALTER TABLE, see b3b746e26d02 (keeps the FTS triggers on SQLite)
+
+
+def upgrade():
+    op.add_column('products', sa.Column('image_status', sa.String(length=20), nullable=True))
+    op.add_column('products', sa.Column('image_job_id', sa.String(length=36), nullable=True))
+
+
+def downgrade():
+    op.drop_column('products', 'image_job_id')
+    op.drop_column('products', 'image_status')
@@ -0,0 +1,29 @@
+"""product sku
+
+Revision ID: 80136370f5f4
+Revises: 7694dcd6b67e
+Create Date: 2026-10-18 17:34:07.139662
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '80136370f5f4'
+down_revision = '7694dcd6b67e'
+branch_labels = None
+depends_on = None
+
+
+# plain ALTER TABLE, see b3b746e26d02 (keeps the FTS triggers on SQLite)
+
+
+def upgrade():
+    op.add_column('products', sa.Column('sku', sa.String(length=64), nullable=True))
+    op.create_index('ix_products_sku', 'products', ['sku'], unique=True)
+
+
+def downgrade():
+    op.drop_index('ix_products_sku', table_name='products')
+    op.drop_column('products', 'sku')
@@ -0,0 +1,29 @@
+"""product updated_at
+
+Revision ID: b3b746e26d02
+Revises: 02e103e3756c
+Create Date: 2026-10-18 17:28:29.326688
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b3b746e26d02'
+down_revision = '02e103e3756c'
+branch_labels = None
+depends_on = None
+
+
+# plain ALTER TABLE (no batch mode): a batch rebuild of `products` on SQLite
+# would drop the full-text search triggers
+
+
+def upgrade():
+    op.add_column('products', sa.Column('updated_at', sa.DateTime(), nullable=True))
+    op.execute("UPDATE products SET updated_at = CURRENT_TIMESTAMP")
+
+
+def downgrade():
+    op.drop_column('products', 'updated_at')
@@ -0,0 +1,49 @@
+"""products full-text index
+
+SQLite FTS5 table over products.title / description plus the triggers that
+keep it in sync (the DDL lives in search.py, shared with db.create_all).
+Every statement is IF NOT EXISTS: databases that already have the index
+(created with create_all, or by an older baseline revision) are left as is.
+
+Revision ID: c41f0a8d9e27
+Revises: e6299ac9b044
+Create Date: 2026-10-18 19:02:11.514203
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from search import FTS_DDL, FTS_TABLE
+
+
+# revision identifiers, used by Alembic.
+revision = 'c41f0a8d9e27'
+down_revision = 'e6299ac9b044'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    if bind.dialect.name != "sqlite":
+        return
+    existed = bind.execute(
+        sa.text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :n"), {"n": FTS_TABLE}
+    ).first()
+    for stmt in FTS_DDL:
+        op.execute(stmt)
+    if not existed:
+        # index the rows written before the triggers existed
+        op.execute(
+            f"INSERT INTO {FTS_TABLE}(rowid, title, description) "
+            "SELECT id, fold_vi(title), fold_vi(description) FROM products"
+        )
+
+
+def downgrade():
+    if op.get_bind().dialect.name != "sqlite":
+        return
+    # the triggers live on products: drop them with the table they write to
+    for suffix in ("ai", "ad", "au"):
+        op.execute(f"DROP TRIGGER IF EXISTS {FTS_TABLE}_{suffix}")
+    op.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
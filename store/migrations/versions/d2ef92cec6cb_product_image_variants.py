@@ -0,0 +1,27 @@
+"""product image variants
+
+Revision ID: d2ef92cec6cb
+Revises: b3b746e26d02
+Create Date: 2026-10-18 17:29:35.168104
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd2ef92cec6cb'
+down_revision = 'b3b746e26d02'
+branch_labels = None
+depends_on = None
+
+
+# plain ALTER TABLE, see b3b746e26d02 (keeps the FTS triggers on SQLite)
+
+
+def upgrade():
+    op.add_column('products', sa.Column('image_variants', sa.Text(), nullable=True))
+
+
+def downgrade():
+    op.drop_column('products', 'image_variants')
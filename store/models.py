@@ -2,32 +2,45 @@
 from datetime import datetime
 from flask_sqlalchemy import SQLAlchemy
 
+from serializers import serialize_product
+
 db = SQLAlchemy()
 
 class Product(db.Model):
     __tablename__ = "products"
     id = db.Column(db.Integer, primary_key=True)
+    # supplier / external reference, the upsert key for bulk imports (see bulk.py)
+    sku = db.Column(db.String(64), nullable=True)
     title = db.Column(db.String(200), nullable=False)
     description = db.Column(db.Text, nullable=True)
     price = db.Column(db.Numeric(10,2), nullable=False)
     currency = db.Column(db.String(3), default="USD")
     image = db.Column(db.String(500), nullable=True)
+    # JSON manifest of resized renditions (see images.py)
+    image_variants = db.Column(db.Text, nullable=True)
+    # background upload: None / "pending" / "ready" / "failed", and the job that owns it
+    image_status = db.Column(db.String(20), nullable=True)
+    image_job_id = db.Column(db.String(36), nullable=True)
 
     # NEW fields
     category = db.Column(db.String(100), nullable=True)
     rating = db.Column(db.Float, nullable=True)
+    # last admin write on this row (kept by the ORM on every UPDATE)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
-    def to_dict(self):
-        return {
-            "id": self.id,
-            "title": self.title,
-            "description": self.description,
-            "price": str(self.price),
-            "currency": self.currency,
-            "image": self.image,
-            "category": self.category,
-            "rating": self.rating
-        }
+    # listing access paths: /api/products filters on category + price range,
+    # sorts by price, title or id (id is always the tie-breaker, see catalog.sort_keys)
+    __table_args__ = (
+        db.Index("ix_products_category_price", "category", "price", "id"),
+        db.Index("ix_products_category_id", "category", "id"),
+        db.Index("ix_products_price_id", "price", "id"),
+        # admin list sorted by title (see admin.index)
+        db.Index("ix_products_title_id", "title", "id"),
+        db.Index("ix_products_sku", "sku", unique=True),
+    )
+
+    def to_dict(self, fields=None):
+        return serialize_product(self, fields)
 
 class Order(db.Model):
     __tablename__ = "orders"
@@ -38,8 +51,18 @@ class Order(db.Model):
     total_amount = db.Column(db.Numeric(10,2), nullable=False)
     currency = db.Column(db.String(3), default="USD")
     paypal_order_id = db.Column(db.String(200), nullable=True)
+    # PayPal's capture answer (status + JSON body), replayed to retries without calling PayPal again
+    capture_status = db.Column(db.String(20), nullable=True)
+    capture_result = db.Column(db.Text, nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    # one row per PayPal order: the last line of defence against a double capture (see payments.py)
+    __table_args__ = (
+        db.Index("ix_orders_paypal_order_id", "paypal_order_id", unique=True),
+        # admin order list (newest first, keyset) and date-range scans of the rollup backfill
+        db.Index("ix_orders_created_at_id", "created_at", "id"),
+    )
+
     def to_dict(self):
         return {
             "id": self.id,
@@ -49,5 +72,37 @@ class Order(db.Model):
             "total_amount": str(self.total_amount),
             "currency": self.currency,
             "paypal_order_id": self.paypal_order_id,
+            "capture_status": self.capture_status,
             "created_at": self.created_at.isoformat()
         }
+
+
+class OrderDailyRollup(db.Model):
+    """
+    Orders and revenue per UTC day and currency, bumped in the same transaction
+    as each captured order (see order_rollups.py). The admin charts read only
+    this table, so they cost the same with a thousand orders or millions.
+    """
+    __tablename__ = "order_daily_rollups"
+    day = db.Column(db.Date, primary_key=True)
+    currency = db.Column(db.String(3), primary_key=True)
+    orders = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+
+
+class ProductRelated(db.Model):
+    """
+    Top-K similar products of each product, precomputed by related.py
+    (rank 0 = most similar). /api/products/<id>/related is one indexed
+    range read of this table joined to products.
+    """
+    __tablename__ = "product_related"
+    product_id = db.Column(db.Integer, primary_key=True)
+    rank = db.Column(db.SmallInteger, primary_key=True)
+    related_id = db.Column(db.Integer, nullable=False)
+    score = db.Column(db.Float, nullable=False)
+
+    __table_args__ = (
+        # "who lists this product": the rows to redo when it changes
+        db.Index("ix_product_related_related_id", "related_id"),
+    )
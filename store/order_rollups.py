@@ -0,0 +1,152 @@
+# order_rollups.py -- daily order count / revenue per currency, maintained incrementally for the admin
+import time
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+import click
+from sqlalchemy import delete, func, select
+
+from models import db, Order, OrderDailyRollup
+
+# chart ranges the admin may ask for (a year of days, three years of months)
+MAX_DAYS = 366
+MAX_MONTHS = 36
+
+
+def _upsert(values, orders, revenue):
+    """INSERT ... ON CONFLICT DO UPDATE where the dialect has it, locked read-modify-write elsewhere."""
+    dialect = db.session.get_bind().dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        if dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert
+        stmt = insert(OrderDailyRollup).values(orders=orders, revenue=revenue, **values)
+        db.session.execute(stmt.on_conflict_do_update(
+            index_elements=["day", "currency"],
+            set_={"orders": OrderDailyRollup.orders + orders, "revenue": OrderDailyRollup.revenue + revenue},
+        ))
+        return
+    row = db.session.get(OrderDailyRollup, (values["day"], values["currency"]), with_for_update=True)
+    if row is None:
+        db.session.add(OrderDailyRollup(orders=orders, revenue=revenue, **values))
+    else:
+        row.orders += orders
+        row.revenue += revenue
+
+
+def add_order(order):
+    """
+    Count `order` in its day. Runs in the caller's transaction: the rollup and
+    the order commit (or roll back) together, so they cannot drift apart.
+    """
+    created = order.created_at or datetime.utcnow()
+    _upsert({"day": created.date(), "currency": order.currency or "USD"},
+            1, Decimal(str(order.total_amount)))
+
+
+def _as_date(value):
+    # func.date() is a string on SQLite, a date on Postgres
+    return value if isinstance(value, date) else date.fromisoformat(str(value))
+
+
+def rebuild(since=None, until=None, chunk_days=31, on_chunk=None):
+    """
+    Recompute the rollups of [since, until) (default: every day with orders)
+    from the orders table, one short transaction per `chunk_days` window so
+    live captures are not blocked for long. Returns the number of days written.
+    """
+    if since is None or until is None:
+        first, last = db.session.query(func.min(Order.created_at), func.max(Order.created_at)).one()
+        if first is None:
+            return 0
+        since = since or first.date()
+        until = until or last.date() + timedelta(days=1)
+    day_col = func.date(Order.created_at)
+    currency_col = func.coalesce(Order.currency, "USD")
+    written = 0
+    start = since
+    while start < until:
+        end = min(start + timedelta(days=chunk_days), until)
+        # range on created_at: served by ix_orders_created_at_id
+        rows = db.session.execute(
+            select(day_col, currency_col, func.count(), func.sum(Order.total_amount))
+            .where(Order.created_at >= datetime.combine(start, datetime.min.time()),
+                   Order.created_at < datetime.combine(end, datetime.min.time()))
+            .group_by(day_col, currency_col)
+        ).all()
+        db.session.execute(delete(OrderDailyRollup).where(OrderDailyRollup.day >= start,
+                                                           OrderDailyRollup.day < end))
+        if rows:
+            db.session.execute(OrderDailyRollup.__table__.insert(), [
+                {"day": _as_date(day), "currency": currency, "orders": n, "revenue": Decimal(str(total or 0))}
+                for day, currency, n, total in rows
+            ])
+        db.session.commit()
+        written += len(rows)
+        if on_chunk:
+            on_chunk(end, written)
+        start = end
+    return written
+
+
+# ----- reads (admin charts) -----
+def currencies():
+    return [c for (c,) in db.session.query(OrderDailyRollup.currency).distinct().order_by(OrderDailyRollup.currency)]
+
+
+def daily(currency="USD", days=30, today=None):
+    """The last `days` days (oldest first, missing days as zero): [{"label", "orders", "revenue"}]."""
+    if not 1 <= days <= MAX_DAYS:
+        raise ValueError(f"days must be between 1 and {MAX_DAYS}")
+    today = today or datetime.utcnow().date()
+    first = today - timedelta(days=days - 1)
+    rows = {
+        r.day: r for r in OrderDailyRollup.query.filter(
+            OrderDailyRollup.currency == currency, OrderDailyRollup.day >= first, OrderDailyRollup.day <= today)
+    }
+    out = []
+    for i in range(days):
+        d = first + timedelta(days=i)
+        r = rows.get(d)
+        out.append({"label": d.isoformat(), "orders": r.orders if r else 0,
+                    "revenue": float(r.revenue) if r else 0.0})
+    return out
+
+
+def monthly(currency="USD", months=12, today=None):
+    """The last `months` calendar months, summed from the daily rows (at most ~31 per month)."""
+    if not 1 <= months <= MAX_MONTHS:
+        raise ValueError(f"months must be between 1 and {MAX_MONTHS}")
+    today = today or datetime.utcnow().date()
+    keys = []
+    y, m = today.year, today.month
+    for _ in range(months):
+        keys.append((y, m))
+        y, m = (y, m - 1) if m > 1 else (y - 1, 12)
+    keys.reverse()
+    buckets = {k: {"label": f"{k[0]}-{k[1]:02d}", "orders": 0, "revenue": Decimal(0)} for k in keys}
+    first = date(keys[0][0], keys[0][1], 1)
+    for r in OrderDailyRollup.query.filter(OrderDailyRollup.currency == currency, OrderDailyRollup.day >= first,
+                                           OrderDailyRollup.day <= today):
+        b = buckets[(r.day.year, r.day.month)]
+        b["orders"] += r.orders
+        b["revenue"] += Decimal(r.revenue)
+    return [dict(buckets[k], revenue=float(buckets[k]["revenue"])) for k in keys]
+
+
+def init_app(app):
+    @app.cli.command("orders-rollup")
+    @click.option("--since", type=click.DateTime(formats=["%Y-%m-%d"]), help="First day (default: oldest order).")
+    @click.option("--until", type=click.DateTime(formats=["%Y-%m-%d"]), help="Day after the last one (default: after the newest order).")
+    @click.option("--chunk-days", default=31, show_default=True)
+    def orders_rollup(since, until, chunk_days):
+        """Backfill / rebuild the daily order rollups from the orders table."""
+        began = time.perf_counter()
+
+        def progress(end, written):
+            click.echo(f"  ... up to {end.isoformat()}: {written} day rows", err=True)
+
+        written = rebuild(since.date() if since else None, until.date() if until else None,
+                          chunk_days=chunk_days, on_chunk=progress)
+        click.echo(f"Rebuilt {written} day rows in {time.perf_counter() - began:.1f}s")
@@ -0,0 +1,134 @@
+# payments.py -- capture a PayPal order exactly once, however often the client retries
+import json
+import logging
+import os
+import time
+import uuid
+from datetime import datetime
+
+from sqlalchemy.exc import IntegrityError
+
+import order_rollups
+from models import db, Order
+from paypal_gateway import PayPalError, get_gateway
+from redis_client import get_redis
+
+log = logging.getLogger(__name__)
+
+LOCK_PREFIX = "paypal:capture:"
+
+
+class CaptureInProgress(Exception):
+    """Another request is still capturing this PayPal order (we stopped waiting for it)."""
+
+
+def _stored(paypal_order_id):
+    return Order.query.filter_by(paypal_order_id=paypal_order_id).first()
+
+
+def _fresh(paypal_order_id):
+    db.session.rollback()  # end the read transaction: see other requests' commits
+    return _stored(paypal_order_id)
+
+
+def _wait_for_row(paypal_order_id, deadline):
+    while True:
+        order = _fresh(paypal_order_id)
+        if order is not None or time.monotonic() > deadline:
+            return order
+        time.sleep(0.1)
+
+
+def _stored_result(order):
+    return json.loads(order.capture_result) if order.capture_result else {"id": order.paypal_order_id}
+
+
+def _record(paypal_order_id, result):
+    """Insert the Order; (order, created). The unique index settles races no lock saw."""
+    capture = result["purchase_units"][0]["payments"]["captures"][0]
+    # Lưu đơn hàng
+    order = Order(
+        fullname="Khách hàng PayPal",
+        email="paypal@example.com",
+        address="Thanh toán qua PayPal",
+        total_amount=capture["amount"]["value"],
+        currency=capture["amount"].get("currency_code", "USD"),
+        created_at=datetime.utcnow(),
+        paypal_order_id=paypal_order_id,
+        capture_status=result.get("status"),
+        capture_result=json.dumps(result),
+    )
+    db.session.add(order)
+    try:
+        db.session.flush()  # the unique index answers here
+        # admin revenue charts, committed together with the order
+        order_rollups.add_order(order)
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        return _stored(paypal_order_id), False
+    return order, True
+
+
+def _release(r, key, token):
+    # only our own lock: after a TTL expiry it may belong to someone else
+    if r.get(key) == token.encode():
+        r.delete(key)
+
+
+def capture_once(paypal_order_id, lock_ttl=None, wait=None):
+    """
+    Capture `paypal_order_id` and store the Order, or replay what is stored.
+    Returns (order, capture result, replayed); replayed: the result an earlier
+    request stored (PayPal not called again, or its second answer discarded).
+
+    Duplicates (double click, client retry, a second tab) are stopped in layers:
+    the stored row, then a per-order lock in Redis (FileRedis stand-in without
+    REDIS_URL: this host only) that concurrent requests wait on, then
+    PayPal-Request-Id so PayPal itself answers a repeated capture with the
+    first result, and finally the unique index on orders.paypal_order_id.
+    PAYPAL_CAPTURE_LOCK_TTL must outlast a PayPal call (connect + read timeout).
+    """
+    lock_ttl = lock_ttl or int(os.getenv("PAYPAL_CAPTURE_LOCK_TTL", 30))
+    wait = float(os.getenv("PAYPAL_CAPTURE_WAIT", 20) if wait is None else wait)
+
+    order = _stored(paypal_order_id)
+    if order is not None:
+        return order, _stored_result(order), True
+
+    r = get_redis()
+    key = LOCK_PREFIX + paypal_order_id
+    token = uuid.uuid4().hex
+    deadline = time.monotonic() + wait
+    while not r.set(key, token, nx=True, ex=lock_ttl):
+        # someone else is capturing: wait for the lock (cheap), then share their row
+        while r.get(key) is not None:
+            if time.monotonic() > deadline:
+                raise CaptureInProgress(paypal_order_id)
+            time.sleep(0.05)
+        order = _fresh(paypal_order_id)
+        if order is not None:
+            return order, _stored_result(order), True
+
+    try:
+        # the holder before us may have finished between our first look and the lock
+        order = _fresh(paypal_order_id)
+        if order is not None:
+            return order, _stored_result(order), True
+        try:
+            result = get_gateway().capture_order(paypal_order_id, request_id=f"capture-{paypal_order_id}")
+        except PayPalError as exc:
+            # captured by a worker our lock does not reach (no shared Redis): its row follows
+            if exc.status != 422 or "ORDER_ALREADY_CAPTURED" not in (exc.body or ""):
+                raise
+            order = _wait_for_row(paypal_order_id, deadline)
+            if order is None:
+                raise
+            return order, _stored_result(order), True
+        order, created = _record(paypal_order_id, result)
+        if not created:
+            log.warning("PayPal order %s captured twice (no shared lock?), kept the first row", paypal_order_id)
+            return order, _stored_result(order), True
+        return order, result, False
+    finally:
+        _release(r, key, token)
@@ -0,0 +1,176 @@
+# paypal_gateway.py -- PayPal Orders v2 over one keep-alive HTTP session per process
+import logging
+import os
+import threading
+import time
+
+import metrics
+
+log = logging.getLogger(__name__)
+
+ENVIRONMENTS = {
+    "sandbox": "https://api-m.sandbox.paypal.com",
+    "live": "https://api-m.paypal.com",
+}
+# refresh this long before PayPal says the token expires (clock skew, slow calls)
+TOKEN_MARGIN = 60
+
+
+class PayPalError(Exception):
+    """Non-2xx answer (status set) or no answer at all (status None)."""
+
+    def __init__(self, message, status=None, body=None, debug_id=None):
+        super().__init__(message)
+        self.status = status
+        self.body = body
+        self.debug_id = debug_id
+
+
+class PayPalGateway:
+    """
+    Thread-safe: one requests.Session (pooled keep-alive connections) and
+    one OAuth token shared by every thread of the process. The token is
+    fetched once, reused until shortly before it expires, and refreshed by
+    a single thread while the others wait for it.
+    """
+
+    def __init__(self, client_id, client_secret, base_url, connect_timeout=3.05, read_timeout=15,
+                 pool_size=10):
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+
+        if not client_id or not client_secret:
+            raise RuntimeError("PAYPAL CLIENT ID / SECRET missing")
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.base_url = base_url.rstrip("/")
+        self.timeout = (connect_timeout, read_timeout)
+        self._requests = requests
+        self.session = requests.Session()
+        # retry only when the request never reached PayPal (connect errors);
+        # a capture that timed out on read must not be sent twice blindly
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size,
+                              max_retries=Retry(total=2, connect=2, read=0, status=0, other=0,
+                                                backoff_factor=0.1))
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._token = None
+        self._token_expires = 0.0
+        self._token_lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        """
+        PAYPAL_CLIENT_ID / PAYPAL_CLIENT_SECRET, PAYPAL_ENV (sandbox | live),
+        PAYPAL_API_BASE (overrides PAYPAL_ENV, e.g. a local stub server),
+        PAYPAL_CONNECT_TIMEOUT / PAYPAL_READ_TIMEOUT (seconds), PAYPAL_POOL_SIZE.
+        """
+        env = os.getenv("PAYPAL_ENV", "sandbox")
+        if env not in ENVIRONMENTS:
+            raise RuntimeError(f"PAYPAL_ENV must be one of {', '.join(ENVIRONMENTS)}, not {env!r}")
+        return cls(
+            os.getenv("PAYPAL_CLIENT_ID"),
+            os.getenv("PAYPAL_CLIENT_SECRET"),
+            os.getenv("PAYPAL_API_BASE") or ENVIRONMENTS[env],
+            connect_timeout=float(os.getenv("PAYPAL_CONNECT_TIMEOUT", 3.05)),
+            read_timeout=float(os.getenv("PAYPAL_READ_TIMEOUT", 15)),
+            pool_size=int(os.getenv("PAYPAL_POOL_SIZE", 10)),
+        )
+
+    # ----- OAuth token -----
+    def access_token(self, stale=None):
+        """
+        Cached token. `stale` is a token PayPal just rejected: it is replaced,
+        unless another thread already did that.
+        """
+        token = self._token
+        if token and token != stale and time.monotonic() < self._token_expires:
+            return token
+        with self._token_lock:
+            if self._token and self._token != stale and time.monotonic() < self._token_expires:
+                return self._token
+            data = self._send("oauth_token", "POST", "/v1/oauth2/token",
+                              data={"grant_type": "client_credentials"},
+                              auth=(self.client_id, self.client_secret))
+            self._token = data["access_token"]
+            self._token_expires = time.monotonic() + max(0, int(data.get("expires_in", 0)) - TOKEN_MARGIN)
+            return self._token
+
+    # ----- HTTP -----
+    def _send(self, operation, method, path, **kwargs):
+        start = time.perf_counter()
+        outcome = "error"
+        try:
+            try:
+                response = self.session.request(method, self.base_url + path, timeout=self.timeout, **kwargs)
+            except self._requests.RequestException as exc:
+                outcome = "timeout" if isinstance(exc, self._requests.Timeout) else "error"
+                raise PayPalError(f"PayPal {operation}: {exc}") from exc
+            outcome = str(response.status_code)
+            if response.status_code >= 400:
+                raise PayPalError(
+                    f"PayPal {operation}: HTTP {response.status_code}",
+                    status=response.status_code,
+                    body=response.text[:2000],
+                    debug_id=response.headers.get("PayPal-Debug-Id"),
+                )
+            return response.json() if response.content else {}
+        finally:
+            seconds = time.perf_counter() - start
+            metrics.registry.record_external("paypal", operation, seconds, outcome)
+            log.info("paypal %s -> %s in %.0f ms", operation, outcome, seconds * 1000)
+
+    def _call(self, operation, method, path, json=None, headers=None):
+        token = self.access_token()
+        for attempt in (1, 2):
+            try:
+                return self._send(operation, method, path, json=json,
+                                  headers={"Authorization": f"Bearer {token}", **(headers or {})})
+            except PayPalError as exc:
+                # revoked / expired early: one fresh token, one more try
+                if exc.status != 401 or attempt == 2:
+                    raise
+                token = self.access_token(stale=token)
+
+    # ----- Orders v2 -----
+    def create_order(self, purchase_units, intent="CAPTURE", request_id=None):
+        headers = {"Prefer": "return=representation"}
+        if request_id:
+            # PayPal answers a repeated request id with the first result
+            headers["PayPal-Request-Id"] = request_id
+        return self._call("create_order", "POST", "/v2/checkout/orders",
+                          json={"intent": intent, "purchase_units": purchase_units}, headers=headers)
+
+    def capture_order(self, order_id, request_id=None):
+        headers = {"Prefer": "return=representation"}
+        if request_id:
+            headers["PayPal-Request-Id"] = request_id
+        return self._call("capture_order", "POST", f"/v2/checkout/orders/{order_id}/capture",
+                          json={}, headers=headers)
+
+
+_gateway = None
+_lock = threading.Lock()
+
+
+def get_gateway():
+    """The process-wide gateway, built from the environment on first use."""
+    global _gateway
+    if _gateway is None:
+        with _lock:
+            if _gateway is None:
+                _gateway = PayPalGateway.from_env()
+    return _gateway
+
+
+def set_gateway(gateway):
+    """Swap the gateway (tests, benchmarks); None rebuilds it from the environment."""
+    global _gateway
+    with _lock:
+        _gateway = gateway
+
+
+def reset_gateway():
+    """Forget the gateway, e.g. after a fork so each worker opens its own connections."""
+    set_gateway(None)
@@ -0,0 +1,161 @@
+# paypal_stub.py -- local stand-in for the PayPal REST API (OAuth + Orders v2), for dev / tests
+# usage: python paypal_stub.py [--port 8099] [--latency-ms 0] [--token-ttl 32400]
+#        then PAYPAL_API_BASE=http://127.0.0.1:8099 PAYPAL_CLIENT_ID=x PAYPAL_CLIENT_SECRET=y flask run
+#
+# GET /_stats returns what the stub saw (token fetches, TCP connections, calls),
+# e.g. to check that the gateway reuses its token and its connections.
+import argparse
+import base64
+import json
+import socket
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubState:
+    def __init__(self, latency_ms=0, token_ttl=32400, fail_next=0):
+        self.latency_ms = latency_ms
+        self.token_ttl = token_ttl
+        self.fail_next = fail_next  # answer the next N order calls with 503
+        self.lock = threading.Lock()
+        self.tokens = set()
+        self.orders = {}
+        self.captured = set()
+        self.replies = {}  # PayPal-Request-Id -> (status, body): repeated requests get the first answer
+        self.stats = {"token_requests": 0, "connections": 0, "create_order": 0, "capture_order": 0, "unauthorized": 0,
+                      "replayed": 0}
+
+    def count(self, key):
+        with self.lock:
+            self.stats[key] += 1
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real API
+    state = None  # StubState, set by make_server
+
+    def setup(self):
+        super().setup()
+        # headers and body go out in two writes: without this, Nagle + delayed ACK add 40 ms
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.state.count("connections")
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def _reply(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.send_header("PayPal-Debug-Id", uuid.uuid4().hex[:13])
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def _authorized(self):
+        auth = self.headers.get("Authorization", "")
+        if auth.startswith("Bearer ") and auth[7:] in self.state.tokens:
+            return True
+        self.state.count("unauthorized")
+        self._reply(401, {"error": "invalid_token"})
+        return False
+
+    def do_GET(self):
+        if self.path == "/_stats":
+            with self.state.lock:
+                return self._reply(200, dict(self.state.stats))
+        self._reply(404, {"name": "RESOURCE_NOT_FOUND"})
+
+    def do_POST(self):
+        raw = self._body()
+        if self.state.latency_ms:
+            time.sleep(self.state.latency_ms / 1000)
+        if self.path == "/v1/oauth2/token":
+            auth = self.headers.get("Authorization", "")
+            if not auth.startswith("Basic ") or b":" not in base64.b64decode(auth[6:]):
+                return self._reply(401, {"error": "invalid_client"})
+            token = uuid.uuid4().hex
+            with self.state.lock:
+                self.state.tokens.add(token)
+                self.state.stats["token_requests"] += 1
+            return self._reply(200, {"access_token": token, "token_type": "Bearer",
+                                     "expires_in": self.state.token_ttl})
+        if not self.path.startswith("/v2/checkout/orders"):
+            return self._reply(404, {"name": "RESOURCE_NOT_FOUND"})
+        if not self._authorized():
+            return
+        with self.state.lock:
+            failing = self.state.fail_next > 0
+            if failing:
+                self.state.fail_next -= 1
+        if failing:
+            return self._reply(503, {"name": "SERVICE_UNAVAILABLE"})
+
+        if self.path == "/v2/checkout/orders":
+            self.state.count("create_order")
+            body = json.loads(raw or b"{}")
+            order_id = uuid.uuid4().hex[:17].upper()
+            with self.state.lock:
+                self.state.orders[order_id] = body.get("purchase_units") or []
+            return self._reply(201, {"id": order_id, "status": "CREATED", "purchase_units": body.get("purchase_units")})
+        if self.path.endswith("/capture"):
+            request_id = self.headers.get("PayPal-Request-Id")
+            with self.state.lock:
+                previous = self.state.replies.get(request_id) if request_id else None
+                if previous:
+                    self.state.stats["replayed"] += 1
+            if previous:
+                return self._reply(*previous)
+            self.state.count("capture_order")
+            order_id = self.path.split("/")[-2]
+            with self.state.lock:
+                units = self.state.orders.get(order_id)
+                captured = order_id in self.state.captured
+                self.state.captured.add(order_id)
+            if units is None:
+                return self._reply(404, {"name": "RESOURCE_NOT_FOUND"})
+            if captured:
+                return self._reply(422, {"name": "UNPROCESSABLE_ENTITY",
+                                         "details": [{"issue": "ORDER_ALREADY_CAPTURED"}]})
+            amount = (units[0].get("amount") if units else None) or {"currency_code": "USD", "value": "0.00"}
+            reply = (201, {
+                "id": order_id,
+                "status": "COMPLETED",
+                "purchase_units": [{"payments": {"captures": [
+                    {"id": uuid.uuid4().hex[:17].upper(), "status": "COMPLETED", "amount": amount}
+                ]}}],
+            })
+            if request_id:
+                with self.state.lock:
+                    self.state.replies[request_id] = reply
+            return self._reply(*reply)
+        self._reply(404, {"name": "RESOURCE_NOT_FOUND"})
+
+
+def make_server(port=0, **state):
+    """ThreadingHTTPServer on 127.0.0.1 (port 0 = any free port); run serve_forever in a thread."""
+    handler = type("Handler", (StubHandler,), {"state": StubState(**state)})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--latency-ms", type=float, default=0, help="added to every call")
+    parser.add_argument("--token-ttl", type=int, default=32400, help="expires_in of issued tokens")
+    args = parser.parse_args()
+    server = make_server(args.port, latency_ms=args.latency_ms, token_ttl=args.token_ttl)
+    print(f"PayPal stub on http://127.0.0.1:{server.server_address[1]}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
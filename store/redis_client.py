@@ -0,0 +1,193 @@
+# redis_client.py -- shared Redis connection (or a local stand-in for dev / tests)
+import os
+import sqlite3
+import threading
+import time
+
+_client = None
+_lock = threading.Lock()
+
+
+DEFAULT_LOCAL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "instance", "local_redis.db")
+
+
+class LocalRedis:
+    """
+    Tiny in-process stand-in for the few Redis commands the app uses.
+    Only shared inside one process: LOCAL_REDIS_PATH=":memory:" picks it
+    (tests, one-off scripts); the default without REDIS_URL is FileRedis.
+    """
+
+    def __init__(self):
+        self._data = {}
+        self._expires = {}
+        self._lock = threading.RLock()
+
+    def _alive(self, key):
+        exp = self._expires.get(key)
+        if exp is not None and exp <= time.time():
+            self._data.pop(key, None)
+            self._expires.pop(key, None)
+        return key in self._data
+
+    def get(self, key):
+        with self._lock:
+            if not self._alive(key):
+                return None
+            return str(self._data[key]).encode()
+
+    def mget(self, *keys):
+        return [self.get(key) for key in keys]
+
+    def set(self, key, value, nx=False, ex=None):
+        with self._lock:
+            if nx and self._alive(key):
+                return None
+            self._data[key] = value
+            self._expires.pop(key, None)
+            if ex:
+                self._expires[key] = time.time() + ex
+            return True
+
+    def incr(self, key, amount=1):
+        with self._lock:
+            value = int(self._data[key]) if self._alive(key) else 0
+            value += amount
+            self._data[key] = value
+            return value
+
+    def delete(self, *keys):
+        with self._lock:
+            removed = 0
+            for key in keys:
+                if self._alive(key):
+                    removed += 1
+                self._data.pop(key, None)
+                self._expires.pop(key, None)
+            return removed
+
+
+class FileRedis:
+    """
+    The same few commands on a small SQLite file (LOCAL_REDIS_PATH), so every
+    process on the host sees them: gunicorn workers share the catalog version,
+    job status and capture locks without a Redis server. One connection per
+    thread and process; set REDIS_URL once there is more than one host.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._conn() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS kv (key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL)"
+            )
+
+    def _conn(self):
+        # a connection must not cross fork(): reopen when the pid changes
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    @staticmethod
+    def _encode(value):
+        return value if isinstance(value, bytes) else str(value).encode()
+
+    def get(self, key):
+        return self.mget(key)[0]
+
+    def mget(self, *keys):
+        marks = ",".join("?" * len(keys))
+        rows = self._conn().execute(
+            f"SELECT key, value FROM kv WHERE key IN ({marks}) AND (expires IS NULL OR expires > ?)",
+            (*keys, time.time()),
+        )
+        found = {key: bytes(value) for key, value in rows}
+        return [found.get(key) for key in keys]
+
+    def set(self, key, value, nx=False, ex=None):
+        now = time.time()
+        expires = now + ex if ex else None
+        conn = self._conn()
+        if nx:
+            # insert, or take over a row whose TTL has passed
+            cursor = conn.execute(
+                "INSERT INTO kv (key, value, expires) VALUES (?, ?, ?) "
+                "ON CONFLICT (key) DO UPDATE SET value = excluded.value, expires = excluded.expires "
+                "WHERE kv.expires IS NOT NULL AND kv.expires <= ?",
+                (key, self._encode(value), expires, now),
+            )
+            return True if cursor.rowcount else None
+        conn.execute(
+            "INSERT OR REPLACE INTO kv (key, value, expires) VALUES (?, ?, ?)",
+            (key, self._encode(value), expires),
+        )
+        return True
+
+    def incr(self, key, amount=1):
+        conn = self._conn()
+        # BEGIN IMMEDIATE: read-modify-write under the file's write lock
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT value FROM kv WHERE key = ? AND (expires IS NULL OR expires > ?)",
+                (key, time.time()),
+            ).fetchone()
+            value = (int(row[0]) if row else 0) + amount
+            conn.execute(
+                "INSERT OR REPLACE INTO kv (key, value, expires) VALUES (?, ?, NULL)",
+                (key, self._encode(value)),
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return value
+
+    def delete(self, *keys):
+        marks = ",".join("?" * len(keys))
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            removed = conn.execute(
+                f"SELECT COUNT(*) FROM kv WHERE key IN ({marks}) AND (expires IS NULL OR expires > ?)",
+                (*keys, time.time()),
+            ).fetchone()[0]
+            conn.execute(f"DELETE FROM kv WHERE key IN ({marks})", keys)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return removed
+
+
+def get_redis():
+    """
+    Return the process-wide Redis client (one connection pool per process).
+    Without REDIS_URL a FileRedis stand-in (shared by the processes on this
+    host) is returned instead, or LocalRedis when LOCAL_REDIS_PATH=":memory:".
+    """
+    global _client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                url = os.getenv("REDIS_URL")
+                if url:
+                    import redis
+                    _client = redis.Redis(connection_pool=redis.ConnectionPool.from_url(url))
+                else:
+                    path = os.getenv("LOCAL_REDIS_PATH", DEFAULT_LOCAL_PATH)
+                    _client = LocalRedis() if path == ":memory:" else FileRedis(path)
+    return _client
+
+
+def reset_redis():
+    """Drop the cached client, e.g. after a fork so each worker opens its own pool."""
+    global _client
+    with _lock:
+        _client = None
@@ -0,0 +1,337 @@
+# related.py -- "similar items": top-K related products per product, precomputed with numpy
+#
+# Scores are computed offline (`flask related-rebuild`, or a job after an admin
+# edit) and stored in product_related, so serving them is a single lookup.
+# Candidates of a product are the WINDOW products of the same category closest
+# to it in price; each is scored on
+#   title  Jaccard similarity of the folded title tokens (hashed 128-bit sets)
+#   price  exp(-|log price difference| / PRICE_SCALE)
+#   rating the candidate's rating / 5 (better products first on a tie)
+# one block of products x candidates at a time, as numpy arrays.
+#
+# Stored lists have their own version (VERSION_KEY): a refresh after an admin
+# edit moves it instead of the catalog version the edit already bumped, so
+# only /api/products/<id>/related answers are invalidated.
+import bisect
+import re
+import time
+import zlib
+from collections import defaultdict
+
+import click
+from flask import g
+from sqlalchemy import and_, delete, or_, select
+
+from jobs import enqueue, job
+from models import db, Product, ProductRelated
+from redis_client import get_redis
+from search import fold
+
+TOP_K = 8
+WINDOW = 1024
+BLOCK = 256
+TITLE_BITS = 128
+WEIGHTS = {"title": 0.5, "price": 0.35, "rating": 0.15}
+PRICE_SCALE = 0.35
+INSERT_CHUNK = 10000
+VERSION_KEY = "related:version"
+UPDATED_AT_KEY = "related:updated_at"
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+_BYTE_POPCOUNT = None
+
+
+def _title_bits(title):
+    """Folded title tokens hashed into a 128-bit set, as two 64-bit words."""
+    bits = 0
+    for token in _TOKEN_RE.findall(fold(title)):
+        bits |= 1 << (zlib.crc32(token.encode("utf-8")) % TITLE_BITS)
+    return bits & 0xFFFFFFFFFFFFFFFF, bits >> 64
+
+
+def _popcount(words):
+    import numpy as np
+
+    if hasattr(np, "bitwise_count"):  # numpy >= 2.0
+        return np.bitwise_count(words).astype(np.int32)
+    global _BYTE_POPCOUNT
+    if _BYTE_POPCOUNT is None:
+        _BYTE_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.int32)
+    as_bytes = words.view(np.uint8).reshape(words.shape + (8,))
+    return _BYTE_POPCOUNT[as_bytes].sum(axis=-1)
+
+
+def lists_version():
+    """(version, unix time) of the stored lists, read once per request."""
+    if "related_version" not in g:
+        raw, updated_at = get_redis().mget(VERSION_KEY, UPDATED_AT_KEY)
+        g.related_version = (int(raw or 0), int(updated_at or 0))
+    return g.related_version
+
+
+def _lists_changed():
+    r = get_redis()
+    r.incr(VERSION_KEY)
+    r.set(UPDATED_AT_KEY, int(time.time()))
+    g.pop("related_version", None)
+
+
+def _category_clause(category):
+    return Product.category.is_(None) if category is None else Product.category == category
+
+
+_COLUMNS = (Product.id, Product.price, Product.rating, Product.title)
+
+
+class _Segment:
+    """A contiguous run of one category's (price, id) order, and whether it reaches either end."""
+
+    def __init__(self, rows, at_start, at_end):
+        self.rows = rows
+        self.keys = [(float(r.price or 0), r.id) for r in rows]
+        self.at_start = at_start
+        self.at_end = at_end
+
+    def covers(self, key, reach):
+        """True when `reach` rows either side of `key` are already in this run."""
+        i = bisect.bisect_left(self.keys, key)
+        return (i >= reach or self.at_start) and (len(self.keys) - i > reach or self.at_end)
+
+
+class CategoryIndex:
+    """One category's products sorted by (price, id): the arrays every score is computed from."""
+
+    def __init__(self, category, rows=None):
+        import numpy as np
+
+        if rows is None:
+            rows = db.session.execute(
+                select(*_COLUMNS).where(_category_clause(category)).order_by(Product.price, Product.id)
+            ).all()
+        self.category = category
+        self.ids = np.array([r.id for r in rows], dtype=np.int64)
+        self.prices = np.array([float(r.price or 0) for r in rows], dtype=np.float64)
+        self.log_price = np.log1p(self.prices)
+        self.rating = np.array([float(r.rating or 0) / 5 for r in rows], dtype=np.float64)
+        self.bits = np.array([_title_bits(r.title) for r in rows], dtype=np.uint64).reshape(-1, 2)
+        self.position = {pid: i for i, pid in enumerate(self.ids.tolist())}
+
+    @classmethod
+    def around_spots(cls, category, spots):
+        """
+        Only the rows within `reach` places of each (price, id, reach) spot, so
+        a refresh reads O(WINDOW) rows, not the whole category. Runs that do not
+        overlap leave gaps, which is fine: each spot's own neighbours are all
+        loaded, and nothing scored reaches past its run (see refresh).
+        """
+        clause = _category_clause(category)
+        segments = []
+        for price, pid, reach in sorted(spots, key=lambda spot: (float(spot[0] or 0), spot[1])):
+            key = (float(price or 0), pid)
+            if any(segment.covers(key, reach) for segment in segments):
+                continue
+            before_key = or_(Product.price < price, and_(Product.price == price, Product.id < pid))
+            before = db.session.execute(
+                select(*_COLUMNS).where(clause, before_key)
+                .order_by(Product.price.desc(), Product.id.desc()).limit(reach)
+            ).all()
+            after = db.session.execute(
+                select(*_COLUMNS).where(clause, ~before_key)
+                .order_by(Product.price, Product.id).limit(reach + 1)
+            ).all()
+            segments.append(_Segment(before[::-1] + after, len(before) < reach, len(after) <= reach))
+        rows = {r.id: r for segment in segments for r in segment.rows}
+        return cls(category, sorted(rows.values(), key=lambda r: (r.price, r.id)))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def around(self, position):
+        """Positions whose candidate window contains `position`."""
+        half = WINDOW // 2
+        return range(max(0, position - half), min(len(self), position + half + 1))
+
+    def around_spot(self, product_id, price):
+        """Same, for where a product was in the (price, id) order (it has moved or gone since)."""
+        import numpy as np
+
+        price = float(price or 0)
+        lo = int(np.searchsorted(self.prices, price, side="left"))
+        hi = int(np.searchsorted(self.prices, price, side="right"))
+        # ties on price are ordered by id
+        return self.around(lo + int(np.searchsorted(self.ids[lo:hi], product_id)))
+
+    def _scores(self, rows):
+        """rows: sorted positions spanning at most BLOCK -> (candidate positions, scores)."""
+        import numpy as np
+
+        half = WINDOW // 2
+        lo, hi = max(0, int(rows[0]) - half), min(len(self), int(rows[-1]) + half + 1)
+        cols = np.arange(lo, hi)
+        a, b = self.bits[rows][:, None, :], self.bits[lo:hi][None, :, :]
+        inter = _popcount(a & b).sum(axis=-1)
+        union = _popcount(a | b).sum(axis=-1)
+        title = inter / np.maximum(union, 1)
+        price = np.exp(-np.abs(self.log_price[rows][:, None] - self.log_price[lo:hi][None, :]) / PRICE_SCALE)
+        scores = (WEIGHTS["title"] * title + WEIGHTS["price"] * price
+                  + WEIGHTS["rating"] * self.rating[lo:hi][None, :])
+        # exact ties (same tokens, price, rating) are common: lower id first, so the
+        # pick does not depend on which block or refresh computed the list
+        scores -= self.ids[lo:hi][None, :] * 1e-13
+        # itself, and what lies outside its own window (same result whichever block it is in)
+        distance = np.abs(cols[None, :] - rows[:, None])
+        scores[(distance == 0) | (distance > half)] = -np.inf
+        return cols, scores
+
+    def top(self, positions, k=TOP_K):
+        """{product id: [(related id, score), ...]} for the products at `positions`, best first."""
+        import numpy as np
+
+        positions = np.unique(np.asarray(positions, dtype=np.int64))
+        out = {}
+        start = 0
+        while start < len(positions):
+            # a run of positions no wider than BLOCK shares one candidate matrix
+            end = int(np.searchsorted(positions, positions[start] + BLOCK, side="left"))
+            rows = positions[start:end]
+            cols, scores = self._scores(rows)
+            kk = min(k, scores.shape[1])
+            best = np.argpartition(-scores, kk - 1, axis=1)[:, :kk]
+            best_scores = np.take_along_axis(scores, best, axis=1)
+            order = np.argsort(-best_scores, axis=1, kind="stable")
+            best = np.take_along_axis(best, order, axis=1)
+            best_scores = np.take_along_axis(best_scores, order, axis=1)
+            for row, picks, values in zip(rows.tolist(), best, best_scores):
+                out[int(self.ids[row])] = [
+                    (int(self.ids[cols[c]]), round(float(v), 4)) for c, v in zip(picks, values) if np.isfinite(v)
+                ]
+            start = end
+        return out
+
+
+def _write(lists):
+    """Replace the stored lists of these products (caller commits)."""
+    ids = list(lists)
+    for i in range(0, len(ids), 5000):
+        db.session.execute(delete(ProductRelated).where(ProductRelated.product_id.in_(ids[i:i + 5000])))
+    rows = [
+        {"product_id": pid, "rank": rank, "related_id": rid, "score": score}
+        for pid, picks in lists.items() for rank, (rid, score) in enumerate(picks)
+    ]
+    for i in range(0, len(rows), INSERT_CHUNK):
+        db.session.execute(ProductRelated.__table__.insert(), rows[i:i + INSERT_CHUNK])
+    return len(rows)
+
+
+def rebuild(on_category=None):
+    """Recompute every product's list, one category (and one transaction) at a time."""
+    categories = [c for (c,) in db.session.query(Product.category).distinct()]
+    products = rows = 0
+    for category in categories:
+        index = CategoryIndex(category)
+        lists = index.top(range(len(index)))
+        rows += _write(lists)
+        db.session.commit()
+        products += len(lists)
+        if on_category:
+            on_category(category, len(lists))
+    # lists of deleted products
+    db.session.execute(delete(ProductRelated).where(ProductRelated.product_id.not_in(select(Product.id))))
+    db.session.commit()
+    _lists_changed()
+    return products, rows
+
+
+def refresh(product_ids, previous=()):
+    """
+    Redo only the lists an edit of `product_ids` (added, changed or deleted)
+    can change: their own, those of their price neighbours in their category
+    (whose candidate window they are in), every list that names them, and
+    the neighbours of where they were before (`previous`: [id, category,
+    price] from before the edit). Returns the number of lists rewritten.
+
+    Only the price windows around those spots are read: WINDOW rows either
+    side of an edited product (its neighbours, and their neighbours), half
+    that around a list that merely names it. The caller bumps the catalog
+    version for the edit itself; this moves the lists' own version.
+    """
+    product_ids = {int(pid) for pid in product_ids}
+    referrers = {pid for (pid,) in db.session.query(ProductRelated.product_id)
+                 .filter(ProductRelated.related_id.in_(product_ids))}
+    todo = product_ids | referrers
+    rows = db.session.query(Product.id, Product.category, Product.price).filter(Product.id.in_(todo)).all()
+    gone = todo - {pid for pid, _, _ in rows}
+    if gone:
+        db.session.execute(delete(ProductRelated).where(ProductRelated.product_id.in_(gone)))
+
+    wanted = defaultdict(set)  # category -> product ids to redo
+    loads = defaultdict(list)  # category -> (price, id, reach) to read around
+    for pid, category, price in rows:
+        wanted[category].add(pid)
+        loads[category].append((price, pid, WINDOW if pid in product_ids else WINDOW // 2))
+    spots = defaultdict(list)  # category -> (id, price) spots the edited products left
+    for pid, category, price in previous:
+        spots[category].append((pid, price))
+        loads[category].append((price, pid, WINDOW))
+
+    rewritten = 0
+    for category in set(wanted) | set(spots):
+        index = CategoryIndex.around_spots(category, loads[category])
+        positions = set()
+        for pid in wanted.get(category, ()):
+            position = index.position.get(pid)
+            if position is None:
+                continue
+            positions.add(position)
+            if pid in product_ids:
+                positions.update(index.around(position))
+        for pid, price in spots.get(category, ()):
+            positions.update(index.around_spot(pid, price))
+        if positions:
+            lists = index.top(sorted(positions))
+            _write(lists)
+            rewritten += len(lists)
+    db.session.commit()
+    _lists_changed()
+    return rewritten
+
+
+@job("refresh_related")
+def refresh_related(product_ids, previous=()):
+    return {"lists": refresh(product_ids, previous)}
+
+
+@job("rebuild_related")
+def rebuild_related():
+    products, rows = rebuild()
+    return {"lists": products, "rows": rows}
+
+
+def queue_refresh(product_ids, previous=()):
+    """After an admin edit: recompute the affected lists in the background."""
+    return enqueue("refresh_related", [int(pid) for pid in product_ids],
+                   [[int(pid), category, float(price or 0)] for pid, category, price in previous])
+
+
+def queue_rebuild():
+    return enqueue("rebuild_related")
+
+
+def related_products(product_id, limit=TOP_K):
+    """The stored list, best first: one query (index range on product_related + products by id)."""
+    return (Product.query.join(ProductRelated, ProductRelated.related_id == Product.id)
+            .filter(ProductRelated.product_id == product_id, ProductRelated.rank < limit)
+            .order_by(ProductRelated.rank).all())
+
+
+def init_app(app):
+    @app.cli.command("related-rebuild")
+    def related_rebuild():
+        """Precompute the related products of every product."""
+        began = time.perf_counter()
+
+        def progress(category, count):
+            click.echo(f"  {category or '(no category)'}: {count} products", err=True)
+
+        products, rows = rebuild(on_category=progress)
+        click.echo(f"Rebuilt {products} lists ({rows} rows) in {time.perf_counter() - began:.1f}s")
@@ -0,0 +1,137 @@
+# search.py -- full-text product search (SQLite FTS5, accent-insensitive for Vietnamese)
+#
+# Other databases (Postgres, ...) fall back to ILIKE on title / description,
+# which is case-insensitive but NOT accent-insensitive: "ao thun" does not
+# find "Áo Thun" there.
+import re
+import sqlite3
+import unicodedata
+
+import click
+from sqlalchemy import DDL, event, func, literal_column, select, table, column, text
+from sqlalchemy.engine import Engine
+
+from models import db, Product
+
+FTS_TABLE = "products_fts"
+
+# FTS rows hold folded text: "Áo Thun Basic" -> "ao thun basic".
+# Triggers keep them in sync with `products` on every insert / update / delete,
+# including bulk writes that bypass the ORM.
+FTS_DDL = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(title, description, tokenize='unicode61')",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON products BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, title, description) VALUES (new.id, fold_vi(new.title), fold_vi(new.description));
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON products BEGIN
+        DELETE FROM {FTS_TABLE} WHERE rowid = old.id;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF title, description ON products BEGIN
+        UPDATE {FTS_TABLE} SET title = fold_vi(new.title), description = fold_vi(new.description) WHERE rowid = new.id;
+    END""",
+]
+
+fts = table(FTS_TABLE, column("rowid"), column("title"), column("description"))
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def fold(s):
+    """Lowercase and strip diacritics ("Đầm Dạ Hội" -> "dam da hoi")."""
+    if not s:
+        return ""
+    s = s.replace("đ", "d").replace("Đ", "D")
+    s = unicodedata.normalize("NFD", s)
+    s = "".join(ch for ch in s if not unicodedata.combining(ch))
+    return s.lower()
+
+
+def match_expression(q):
+    """User query -> FTS5 MATCH string with prefix matching on every token."""
+    tokens = _WORD_RE.findall(fold(q))
+    return " ".join(f'"{t}"*' for t in tokens)
+
+
+# fold_vi() must exist on every SQLite connection, the triggers call it
+@event.listens_for(Engine, "connect")
+def _register_fold(dbapi_conn, connection_record):
+    if isinstance(dbapi_conn, sqlite3.Connection):
+        dbapi_conn.create_function("fold_vi", 1, fold, deterministic=True)
+
+
+# create / drop the index together with the products table (db.create_all / drop_all)
+for _stmt in FTS_DDL:
+    event.listen(Product.__table__, "after_create", DDL(_stmt).execute_if(dialect="sqlite"))
+event.listen(Product.__table__, "before_drop", DDL(f"DROP TABLE IF EXISTS {FTS_TABLE}").execute_if(dialect="sqlite"))
+
+
+_fts_ready = {}
+
+
+def fts_available():
+    """True when the DB is SQLite and the FTS table exists (cached per engine)."""
+    engine = db.engine
+    if engine.dialect.name != "sqlite":
+        return False
+    key = str(engine.url)
+    if key not in _fts_ready:
+        with engine.connect() as conn:
+            found = conn.execute(
+                text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :n"), {"n": FTS_TABLE}
+            ).first()
+        _fts_ready[key] = found is not None
+    return _fts_ready[key]
+
+
+def apply_search(query, q, rank=False):
+    """
+    Filter `query` (on Product) to rows matching `q`.
+    With rank=True the relevance column (bm25, title weighted 10x, lower is better)
+    is returned too so the caller can sort on it.
+    Falls back to ILIKE when FTS is not available (e.g. Postgres), without
+    diacritic folding.
+    """
+    if not fts_available():
+        return query.filter(
+            (Product.title.ilike(f"%{q}%")) | (Product.description.ilike(f"%{q}%"))
+        ), None
+
+    expr = match_expression(q)
+    if not expr:
+        return query, None
+    hits = (
+        select(
+            fts.c.rowid.label("product_id"),
+            literal_column(f"bm25({FTS_TABLE}, 10.0, 1.0)").label("rank"),
+        )
+        .where(literal_column(FTS_TABLE).op("MATCH")(expr))
+        .subquery("search_hits")
+    )
+    query = query.join(hits, hits.c.product_id == Product.id)
+    return query, (hits.c.rank if rank else None)
+
+
+def rebuild_index():
+    """(Re)create the FTS table + triggers and refill it from `products`."""
+    engine = db.engine
+    if engine.dialect.name != "sqlite":
+        return 0
+    with engine.begin() as conn:
+        for stmt in FTS_DDL:
+            conn.execute(text(stmt))
+        conn.execute(text(f"DELETE FROM {FTS_TABLE}"))
+        conn.execute(text(
+            f"INSERT INTO {FTS_TABLE}(rowid, title, description) "
+            "SELECT id, fold_vi(title), fold_vi(description) FROM products"
+        ))
+        count = conn.execute(select(func.count()).select_from(fts)).scalar()
+    _fts_ready.pop(str(engine.url), None)
+    return count
+
+
+def init_app(app):
+    @app.cli.command("search-reindex")
+    def search_reindex():
+        """Rebuild the product full-text index."""
+        count = rebuild_index()
+        click.echo(f"Indexed {count} products")
@@ -1,5 +1,6 @@
 from backend import create_app
 from models import db, Product
+from catalog_cache import bump_catalog_version
 
 app = create_app()
 with app.app_context():
@@ -20,4 +21,5 @@ with app.app_context():
     for s in sample:
         db.session.add(Product(**s))
     db.session.commit()
+    bump_catalog_version()
     print("✅ Seeded clothing products successfully!")
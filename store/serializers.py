@@ -0,0 +1,96 @@
+# serializers.py -- the one product -> JSON-ready dict conversion used by the API
+from functools import lru_cache
+
+from images import variant_urls
+
+EXCERPT_LENGTH = 100
+
+
+class _Attrs:
+    """Mapping view going through the ORM (loads expired / deferred attributes)."""
+
+    __slots__ = ("obj",)
+
+    def __init__(self, obj):
+        self.obj = obj
+
+    def __getitem__(self, name):
+        return getattr(self.obj, name)
+
+
+def _excerpt(d):
+    desc = d["description"] or ""
+    return desc if len(desc) <= EXCERPT_LENGTH else desc[:EXCERPT_LENGTH] + "..."
+
+
+# field name -> getter over the row values; defaults match what products.js expects
+_GETTERS = {
+    "id": lambda d: d["id"],
+    "title": lambda d: d["title"] or "",
+    "description": lambda d: d["description"] or "",
+    "price": lambda d: float(d["price"]) if d["price"] is not None else 0.0,
+    "currency": lambda d: d["currency"] or "USD",
+    "image": lambda d: d["image"] or "",
+    "rating": lambda d: float(d["rating"] or 0),
+    "category": lambda d: d["category"] or "",
+    "images": lambda d: variant_urls(d["image_variants"]),
+    # not in the default set: short description for the grid cards
+    "excerpt": _excerpt,
+}
+
+PRODUCT_FIELDS = ("id", "title", "description", "price", "currency", "image", "images", "rating", "category")
+# what the product grid shows (products.js asks for exactly these, /products renders them)
+GRID_FIELDS = ("id", "title", "excerpt", "price", "image", "images", "rating", "category")
+
+
+def parse_fields(value):
+    """
+    `?fields=id,title,price` -> ("id", "title", "price").
+    Unknown names are ignored, id is always included; None/empty -> None (all default fields).
+    """
+    if not value:
+        return None
+    wanted = [f.strip() for f in value.split(",")]
+    return tuple(f for f in dict.fromkeys(["id"] + wanted) if f in _GETTERS)
+
+
+def _full(d):
+    # default field set, spelled out: the hot path of every listing
+    price = d["price"]
+    return {
+        "id": d["id"],
+        "title": d["title"] or "",
+        "description": d["description"] or "",
+        "price": float(price) if price is not None else 0.0,
+        "currency": d["currency"] or "USD",
+        "image": d["image"] or "",
+        "images": variant_urls(d["image_variants"]),
+        "rating": float(d["rating"] or 0),
+        "category": d["category"] or "",
+    }
+
+
+@lru_cache(maxsize=64)
+def _serializer(fields):
+    if fields is None or fields == PRODUCT_FIELDS:
+        return _full
+    getters = tuple((name, _GETTERS[name]) for name in fields)
+    return lambda d: {name: get(d) for name, get in getters}
+
+
+def _serialize(fn, p):
+    # loaded column values live in the instance __dict__: read them without descriptor overhead
+    try:
+        return fn(p.__dict__)
+    except KeyError:
+        return fn(_Attrs(p))
+
+
+def serialize_product(p, fields=None):
+    """Product -> dict with only `fields` (default: PRODUCT_FIELDS)."""
+    return _serialize(_serializer(fields), p)
+
+
+def serialize_products(products, fields=None):
+    fn = _serializer(fields)
+    return [_serialize(fn, p) for p in products]
@@ -4,6 +4,11 @@ console.log("[products.js] loaded (Cloudinary fixed)");
 /* ---------- Helpers ---------- */
 function dlog(...args){ console.log("[PDBG]", ...args); }
 function escapeHtml(s){ if(!s && s !== 0) return ''; return String(s).replaceAll('&','&amp;').replaceAll('<','&lt;').replaceAll('>','&gt;'); }
+// resized rendition (images.py) if the product has one, e.g. variantSrc(p.images, 'grid')
+function variantSrc(images, size){
+  const v = images && images[size];
+  return v ? (v.jpeg || v.webp || null) : null;
+}
 function renderStars(r){
   const full = Math.floor(r||0);
   let s = '';
@@ -43,8 +48,12 @@ function toast(msg = '', timeout = 1200, isError = false){
 }
 
 /* ---------- Cart API helpers ---------- */
+// version of the cart the drawer shows (summary.version): same version = nothing to redraw
+let renderedCartVersion = null;
+
 async function fetchCartAPI(){
   try{
+    // ETag = cart version: the browser revalidates and gets a 304 when nothing changed
     const res = await fetch('/api/cart', { credentials: 'same-origin' });
     if(!res.ok) { dlog('/api/cart not ok', res.status); return null; }
     return await res.json();
@@ -54,10 +63,27 @@ async function fetchCartAPI(){
   }
 }
 
+// ops: [{op: 'add' | 'set' | 'remove', product_id, qty}], applied together;
+// the answer carries the new summary, so no /api/cart round trip afterwards
+async function cartBatch(ops){
+  const res = await fetch('/api/cart/batch', {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify({ ops }),
+    credentials: 'same-origin'
+  });
+  const j = await res.json().catch(() => ({}));
+  if(!res.ok || !j.success) throw new Error(j.error || ('cart batch ' + res.status));
+  renderCartInDrawer(j.cart);
+  return j;
+}
+
 function renderCartInDrawer(cartJson){
   const container = document.getElementById('cartItems');
   const totalEl = document.getElementById('cartTotal');
   if(!container || !totalEl) return;
+  if(cartJson && cartJson.version && cartJson.version === renderedCartVersion) return;
+  renderedCartVersion = cartJson ? cartJson.version : null;
 
   if(!cartJson || !cartJson.items || cartJson.items.length === 0){
     container.innerHTML = '<p class="text-muted">Giỏ hàng trống.</p>';
@@ -70,7 +96,8 @@ function renderCartInDrawer(cartJson){
   cartJson.items.forEach(item => {
     const row = document.createElement('div');
     row.className = 'd-flex align-items-center mb-3';
-    const imgsrc = item.image && item.image.startsWith('http') ? item.image : '/static/images/' + (item.image || 'a1.jpg');
+    const thumb = item.thumb && (item.thumb.webp || item.thumb.jpeg);
+    const imgsrc = thumb || (item.image && item.image.startsWith('http') ? item.image : '/static/images/' + (item.image || 'a1.jpg'));
     row.innerHTML = `
       <img src="${imgsrc}" style="width:64px;height:64px;object-fit:cover;border-radius:6px;margin-right:10px;">
       <div style="flex:1">
@@ -89,12 +116,8 @@ function renderCartInDrawer(cartJson){
   container.querySelectorAll('.drawer-remove').forEach(b => {
     b.addEventListener('click', (e) => {
       const pid = e.currentTarget.dataset.id;
-      const fd = new URLSearchParams();
-      fd.append('product_id', pid);
-      fd.append('qty', 0);
-      fetch('/cart/update', { method: 'POST', body: fd, credentials: 'same-origin' })
-        .then(r=> r.ok ? r.json() : Promise.reject('update failed'))
-        .then(()=> { refreshCart(false); toast('Đã xóa', 900); })
+      cartBatch([{ op: 'remove', product_id: Number(pid) }])
+        .then(()=> { toast('Đã xóa', 900); })
         .catch(err => { dlog('drawer remove error', err); toast('Lỗi khi xóa', 1200, true); });
     });
   });
@@ -117,45 +140,89 @@ document.addEventListener('DOMContentLoaded', () => {
   const grid = document.getElementById('productGrid');
   const searchInput = document.getElementById('searchInput');
   const categoryBtns = document.getElementsByClassName('category-btn');
+  const categoryList = document.getElementById('categoryList');
+  const priceFacets = document.getElementById('priceFacets');
   const priceMin = document.getElementById('priceMin');
   const priceMax = document.getElementById('priceMax');
   const applyPriceBtn = document.getElementById('applyPriceBtn');
   const sortSelect = document.getElementById('sortSelect');
   const resultInfo = document.getElementById('resultInfo');
-  const pagination = document.getElementById('pagination');
+  const loadMoreBtn = document.getElementById('loadMoreBtn');
   const cartCount = document.getElementById('cartCount');
   const openCartBtn = document.getElementById('openCartBtn');
 
   if(!grid){ dlog('productGrid not found'); return; }
 
-  let state = { q:'', category:'', price_min:null, price_max:null, page:1, per_page:9, sort:'' };
+  let state = { q:'', category:'', price_min:null, price_max:null, per_page:9, sort:'', cursor:null, shown:0, total:0 };
   const debounce = (fn, wait=300) => { let t; return (...a)=>{ clearTimeout(t); t = setTimeout(()=>fn(...a), wait); }; };
 
-  async function fetchProducts(){
+  // keyset ("cursor") mode: first page resets the grid, "Xem thêm" appends the next one
+  async function fetchProducts(append = false){
     try{
-      const params = new URLSearchParams();
-      if(state.q) params.append('q', state.q);
-      if(state.category) params.append('category', state.category);
-      if(state.price_min != null) params.append('price_min', state.price_min);
-      if(state.price_max != null) params.append('price_max', state.price_max);
-      params.append('page', state.page);
+      const params = filterParams();
+      if(state.sort) params.append('sort', state.sort);
       params.append('per_page', state.per_page);
+      // the grid only needs a short excerpt, the modal fetches the full description
+      params.append('fields', 'id,title,excerpt,price,image,images,rating,category');
+      params.append('cursor', append && state.cursor ? state.cursor : '');
+      if(!append){
+        params.append('with_total', 1);
+        fetchFacets();
+      }
 
       const res = await fetch('/api/products?' + params.toString(), { credentials: 'same-origin' });
       if(!res.ok) throw new Error('API ' + res.status);
       const data = await res.json();
-      renderProducts(data.products || []);
-      renderPagination(data.page, data.pages);
-      if(resultInfo) resultInfo.textContent = `Hiển thị ${data.products.length} / ${data.total || data.products.length}`;
+      const products = data.products || [];
+      renderProducts(products, append);
+      state.cursor = data.next_cursor || null;
+      state.shown = (append ? state.shown : 0) + products.length;
+      if(!append) state.total = data.total || products.length;
+      if(loadMoreBtn) loadMoreBtn.classList.toggle('d-none', !state.cursor);
+      if(resultInfo) resultInfo.textContent = `Hiển thị ${state.shown} / ${state.total || state.shown}`;
     } catch(err){
       dlog('fetchProducts error', err);
-      grid.innerHTML = '<div class="col-12"><p class="text-muted">Không tải được sản phẩm.</p></div>';
+      if(!append) grid.innerHTML = '<div class="col-12"><p class="text-muted">Không tải được sản phẩm.</p></div>';
+      else toast('Lỗi khi tải thêm', 1200, true);
+    }
+  }
+
+  function filterParams(){
+    const params = new URLSearchParams();
+    if(state.q) params.append('q', state.q);
+    if(state.category) params.append('category', state.category);
+    if(state.price_min != null) params.append('price_min', state.price_min);
+    if(state.price_max != null) params.append('price_max', state.price_max);
+    return params;
+  }
+
+  // counts for the sidebar: one request, cached server-side per filter set
+  async function fetchFacets(){
+    try{
+      const res = await fetch('/api/products/facets?' + filterParams().toString(), { credentials: 'same-origin' });
+      if(!res.ok) throw new Error('API ' + res.status);
+      renderFacets(await res.json());
+    } catch(err){ dlog('fetchFacets error', err); }
+  }
+
+  function renderFacets(facets){
+    if(categoryList){
+      const cats = facets.categories || [];
+      const total = cats.reduce((n, c) => n + c.count, 0);
+      const btn = (value, label, count) =>
+        `<button class="btn btn-sm btn-outline-secondary mb-1 category-btn ${state.category === value ? 'active' : ''}" data-cat="${escapeHtml(value)}">${escapeHtml(label)} <span class="text-muted">(${count})</span></button>`;
+      categoryList.innerHTML = btn('', 'Tất cả', total) + cats.map(c => btn(c.value, c.value, c.count)).join(' ');
+    }
+    if(priceFacets){
+      priceFacets.innerHTML = (facets.price || []).filter(b => b.count).map(b =>
+        `<a href="#" class="d-block price-facet" data-min="${b.min}" data-max="${b.max}">${b.min} – ${b.max} <span class="text-muted">(${b.count})</span></a>`
+      ).join('');
     }
   }
 
-  function renderProducts(products){
-    grid.innerHTML = '';
-    if(!products.length){
+  function renderProducts(products, append = false){
+    if(!append) grid.innerHTML = '';
+    if(!products.length && !append){
       grid.innerHTML = '<div class="col-12"><p class="text-muted">Không tìm thấy sản phẩm.</p></div>';
       return;
     }
@@ -165,18 +232,20 @@ document.addEventListener('DOMContentLoaded', () => {
       if (!imgsrc.startsWith('http') && !imgsrc.startsWith('/static/')) {
         imgsrc = '/static/images/' + imgsrc;
       }
+      imgsrc = variantSrc(p.images, 'grid') || imgsrc;
+      const srcset = (p.images && p.images.srcset && p.images.srcset.webp) || '';
 
       const col = document.createElement('div');
       col.className = 'col-md-4';
       col.innerHTML = `
         <div class="card product-card h-100">
-          <img data-src="${imgsrc}" loading="lazy" class="card-img-top lazy-img" alt="${escapeHtml(p.title)}">
+          <img data-src="${imgsrc}" data-srcset="${srcset}" sizes="(min-width: 768px) 300px, 100vw" loading="lazy" class="card-img-top lazy-img" alt="${escapeHtml(p.title)}">
           <div class="card-body d-flex flex-column">
             <div class="mb-2">
               <div class="product-title">${escapeHtml(p.title)}</div>
               <div class="product-meta">${escapeHtml(p.category || '')}</div>
             </div>
-            <p class="small text-muted mb-3">${escapeHtml((p.description||'').slice(0,100))}${p.description && p.description.length>100 ? '...' : ''}</p>
+            <p class="small text-muted mb-3">${escapeHtml(p.excerpt || '')}</p>
             <div class="mt-auto d-flex justify-content-between align-items-center">
               <div>
                 <div class="price">$${(p.price||0).toFixed(2)}</div>
@@ -193,13 +262,14 @@ document.addEventListener('DOMContentLoaded', () => {
     });
 
     // lazy-load images
-    const lazyImgs = document.querySelectorAll('.lazy-img');
+    const lazyImgs = document.querySelectorAll('.lazy-img[data-src]');
     if('IntersectionObserver' in window){
       const obs = new IntersectionObserver((entries, ob)=>{
         entries.forEach(entry=>{
           if(entry.isIntersecting){
             const img = entry.target;
             const src = img.dataset.src;
+            if(img.dataset.srcset){ img.srcset = img.dataset.srcset; }
             if(src){ img.src = src; img.removeAttribute('data-src'); }
             ob.unobserve(img);
           }
@@ -207,45 +277,21 @@ document.addEventListener('DOMContentLoaded', () => {
       }, { rootMargin: '200px' });
       lazyImgs.forEach(i => obs.observe(i));
     } else {
-      lazyImgs.forEach(i => { i.src = i.dataset.src; i.removeAttribute('data-src'); });
+      lazyImgs.forEach(i => { if(i.dataset.srcset) i.srcset = i.dataset.srcset; i.src = i.dataset.src; i.removeAttribute('data-src'); });
     }
 
     attachCardHandlers();
   }
 
-  function renderPagination(page, pages){
-    if(!pagination) return;
-    pagination.innerHTML = '';
-    if(!pages || pages <= 1) return;
-    for(let i=1;i<=pages;i++){
-      const li = document.createElement('li');
-      li.className = 'page-item' + (i===page ? ' active' : '');
-      li.innerHTML = `<a class="page-link" href="#" data-page="${i}">${i}</a>`;
-      pagination.appendChild(li);
-    }
-    pagination.querySelectorAll('.page-link').forEach(link=>{
-      link.addEventListener('click', e=>{
-        e.preventDefault();
-        state.page = parseInt(e.target.dataset.page);
-        fetchProducts();
-      });
-    });
-  }
-
   function attachCardHandlers(){
     document.querySelectorAll('.add-to-cart').forEach(btn=>{
       btn.onclick = async () => {
         const id = btn.dataset.id;
-        const fd = new URLSearchParams();
-        fd.append('product_id', id);
-        fd.append('qty', 1);
         try{
-          const res = await fetch('/cart/add', { method:'POST', body: fd, credentials: 'same-origin' });
-          if(!res.ok) throw new Error('add failed');
-          const j = await res.json();
-          if(j.success){ toast('Đã thêm vào giỏ'); updateCartCount(); refreshCart(false); }
-          else toast('Lỗi khi thêm', 1400, true);
-        } catch(e){ dlog('add-to-cart error', e); toast('Lỗi mạng', 1400, true); }
+          // drawer + count come back with the answer
+          await cartBatch([{ op: 'add', product_id: Number(id), qty: 1 }]);
+          toast('Đã thêm vào giỏ');
+        } catch(e){ dlog('add-to-cart error', e); toast('Lỗi khi thêm', 1400, true); }
       };
     });
 
@@ -263,9 +309,9 @@ document.addEventListener('DOMContentLoaded', () => {
   function showModal(p){
     const body = document.getElementById('productModalBody');
     if(!body) return;
-    const imgsrc = p.image && p.image.startsWith('http')
+    const imgsrc = variantSrc(p.images, 'detail') || (p.image && p.image.startsWith('http')
       ? p.image
-      : '/static/images/' + (p.image || 'a1.jpg');
+      : '/static/images/' + (p.image || 'a1.jpg'));
 
     body.innerHTML = `
       <div class="row">
@@ -278,24 +324,52 @@ document.addEventListener('DOMContentLoaded', () => {
           <div class="mb-2">${renderStars(p.rating)} <span class="ms-2">(${p.rating})</span></div>
           <button class="btn btn-dark" id="modalAddCart" data-id="${p.id}">Add to Cart</button>
         </div>
-      </div>`;
-    const modal = new bootstrap.Modal(document.getElementById('productModal'));
+      </div>
+      <div id="relatedItems" class="mt-4"></div>`;
+    // same modal when opened again from a related item
+    const modal = bootstrap.Modal.getOrCreateInstance(document.getElementById('productModal'));
     modal.show();
+    loadRelated(p.id);
     document.getElementById('modalAddCart').onclick = async (e) => {
       const id = e.target.dataset.id;
-      const fd = new URLSearchParams();
-      fd.append('product_id', id);
-      fd.append('qty', 1);
       try{
-        const res = await fetch('/api/cart/add', { method:'POST', body: fd, credentials: 'same-origin' });
-        if(!res.ok) throw new Error('add failed');
-        const j = await res.json();
-        if(j.success){ toast('Đã thêm vào giỏ'); updateCartCount(); setTimeout(()=> modal.hide(), 600); }
-        else toast('Lỗi', 1000, true);
-      } catch(err){ toast('Lỗi mạng', 1200, true); }
+        await cartBatch([{ op: 'add', product_id: Number(id), qty: 1 }]);
+        toast('Đã thêm vào giỏ');
+        setTimeout(()=> modal.hide(), 600);
+      } catch(err){ dlog('modal add error', err); toast('Lỗi', 1200, true); }
     };
   }
 
+  // precomputed "similar items" (one lookup server-side), see related.py
+  async function loadRelated(id){
+    const box = document.getElementById('relatedItems');
+    if(!box) return;
+    try{
+      const res = await fetch(`/api/products/${id}/related?limit=4`, { credentials: 'same-origin' });
+      if(!res.ok) return;
+      const j = await res.json();
+      if(!j.related || !j.related.length) return;
+      box.innerHTML = `<h6 class="mb-2">Sản phẩm tương tự</h6><div class="row g-2">` + j.related.map(r => {
+        const src = variantSrc(r.images, 'thumb') || (r.image && r.image.startsWith('http') ? r.image : '/static/images/' + (r.image || 'a1.jpg'));
+        return `<div class="col-3">
+          <a href="#" class="related-item text-decoration-none text-reset" data-id="${r.id}">
+            <img src="${src}" class="img-fluid rounded mb-1" style="aspect-ratio:1;object-fit:cover" alt="${escapeHtml(r.title)}" loading="lazy">
+            <div class="small text-truncate">${escapeHtml(r.title)}</div>
+            <div class="small fw-semibold">$${(r.price||0).toFixed(2)}</div>
+          </a></div>`;
+      }).join('') + `</div>`;
+      box.querySelectorAll('.related-item').forEach(a => {
+        a.onclick = (e) => {
+          e.preventDefault();
+          fetch(`/api/products/${a.dataset.id}`, { credentials: 'same-origin' })
+            .then(r=>r.json())
+            .then(showModal)
+            .catch(err=>{ dlog('related item err', err); });
+        };
+      });
+    } catch(e){ dlog('loadRelated err', e); }
+  }
+
   async function updateCartCount(){
     try{
       const res = await fetch('/api/cart', { credentials: 'same-origin' });
@@ -305,24 +379,36 @@ document.addEventListener('DOMContentLoaded', () => {
     } catch(e){ dlog('updateCartCount err', e); }
   }
 
+  loadMoreBtn && loadMoreBtn.addEventListener('click', ()=> { fetchProducts(true); });
+
   if(openCartBtn){
     openCartBtn.addEventListener('click', ()=> { refreshCart(true); });
   }
 
-  Array.from(categoryBtns).forEach(b=>{
-    b.addEventListener('click', ()=> {
-      Array.from(categoryBtns).forEach(x=>x.classList.remove('active'));
-      b.classList.add('active');
-      state.category = b.dataset.cat || '';
-      state.page = 1;
-      fetchProducts();
-    });
+  // buttons are re-rendered with counts, so listen on the container
+  categoryList && categoryList.addEventListener('click', (e)=> {
+    const b = e.target.closest('.category-btn');
+    if(!b) return;
+    Array.from(categoryBtns).forEach(x=>x.classList.remove('active'));
+    b.classList.add('active');
+    state.category = b.dataset.cat || '';
+    fetchProducts();
+  });
+
+  priceFacets && priceFacets.addEventListener('click', (e)=> {
+    const a = e.target.closest('.price-facet');
+    if(!a) return;
+    e.preventDefault();
+    priceMin.value = a.dataset.min;
+    priceMax.value = a.dataset.max;
+    state.price_min = parseFloat(a.dataset.min);
+    state.price_max = parseFloat(a.dataset.max);
+    fetchProducts();
   });
 
   applyPriceBtn && applyPriceBtn.addEventListener('click', ()=> {
     state.price_min = priceMin.value ? parseFloat(priceMin.value) : null;
     state.price_max = priceMax.value ? parseFloat(priceMax.value) : null;
-    state.page = 1;
     fetchProducts();
   });
 
@@ -334,11 +420,30 @@ document.addEventListener('DOMContentLoaded', () => {
   if(searchInput){
     searchInput.addEventListener('input', debounce((e)=>{
       state.q = e.target.value.trim();
-      state.page = 1;
       fetchProducts();
     }, 350));
   }
 
-  fetchProducts();
+  // /products rendered the first page (cards, facets, counts): take over its state
+  // instead of fetching the same page again
+  function hydrate(initial){
+    const f = initial.filters || {};
+    const page = initial.page || {};
+    state.q = f.q || '';
+    state.category = f.category || '';
+    state.price_min = f.price_min ?? null;
+    state.price_max = f.price_max ?? null;
+    state.sort = initial.sort || '';
+    state.per_page = initial.per_page || state.per_page;
+    state.cursor = page.next_cursor || null;
+    state.shown = (page.products || []).length;
+    state.total = page.total || state.shown;
+    if(searchInput && state.q) searchInput.value = state.q;
+    attachCardHandlers();
+  }
+
+  const initialState = document.getElementById('initialState');
+  if(initialState) hydrate(JSON.parse(initialState.textContent));
+  else fetchProducts();
   updateCartCount();
 });
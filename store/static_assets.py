@@ -0,0 +1,157 @@
+# static_assets.py -- content-hashed, precompressed static files served with immutable caching
+#
+# `flask assets-build` copies css / js into static/dist/ under names carrying
+# a hash of their content (css/styles.3f2a9c1b0d4e.css) with .br / .gz
+# siblings next to them, and writes static/dist/manifest.json. Once a
+# manifest exists, url_for('static', filename='css/styles.css') points at the
+# hashed copy, and that copy is sent precompressed with a one-year immutable
+# Cache-Control: a new build means new names, so browsers never revalidate.
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import shutil
+import time
+
+import click
+from flask import current_app, request, send_from_directory
+
+try:
+    import brotli
+except ImportError:  # optional: .gz siblings only without it
+    brotli = None
+
+DIST = "dist"
+MANIFEST = "manifest.json"
+HASHED_EXTENSIONS = (".css", ".js", ".svg", ".json", ".txt", ".woff2")
+# already compressed formats gain nothing from a .gz / .br sibling
+PRECOMPRESS_EXTENSIONS = (".css", ".js", ".svg", ".json", ".txt")
+PRECOMPRESS_MIN_SIZE = 256
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+
+def _hashed_name(path, data):
+    root, ext = os.path.splitext(path)
+    return f"{root}.{hashlib.sha256(data).hexdigest()[:12]}{ext}"
+
+
+def _write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def build(static_folder, clean=False):
+    """
+    Hash + precompress every asset of `static_folder` (images excluded: they
+    are addressed by name from the database). Returns the manifest
+    {"css/styles.css": "dist/css/styles.<hash>.css", ...}.
+    Old hashed files are kept unless `clean`: pages rendered by workers still
+    on the previous build keep working during a rolling deploy.
+    """
+    dist = os.path.join(static_folder, DIST)
+    if clean and os.path.isdir(dist):
+        shutil.rmtree(dist)
+    manifest = {}
+    for root, dirs, files in os.walk(static_folder):
+        rel_root = os.path.relpath(root, static_folder)
+        if rel_root == ".":
+            dirs[:] = [d for d in dirs if d not in (DIST, "images")]
+        for name in sorted(files):
+            if not name.endswith(HASHED_EXTENSIONS):
+                continue
+            logical = os.path.normpath(os.path.join(rel_root, name)).replace(os.sep, "/")
+            with open(os.path.join(root, name), "rb") as f:
+                data = f.read()
+            hashed = f"{DIST}/{_hashed_name(logical, data)}"
+            target = os.path.join(static_folder, hashed)
+            if not os.path.exists(target):
+                _write(target, data)
+                if name.endswith(PRECOMPRESS_EXTENSIONS) and len(data) >= PRECOMPRESS_MIN_SIZE:
+                    # built once, so the slowest / smallest settings
+                    _write(target + ".gz", gzip.compress(data, compresslevel=9, mtime=0))
+                    if brotli is not None:
+                        _write(target + ".br", brotli.compress(data, quality=11))
+            manifest[logical] = hashed
+    _write(os.path.join(dist, MANIFEST), json.dumps(manifest, indent=2, sort_keys=True).encode("utf-8"))
+    return manifest
+
+
+def load_manifest(static_folder):
+    try:
+        with open(os.path.join(static_folder, DIST, MANIFEST), encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def manifest_mtime(static_folder):
+    try:
+        return int(os.path.getmtime(os.path.join(static_folder, DIST, MANIFEST)))
+    except OSError:
+        return 0
+
+
+class StaticAssets:
+    def __init__(self, app):
+        self.app = app
+        self.reload()
+
+    def reload(self):
+        self.manifest = load_manifest(self.app.static_folder)
+        self.hashed = set(self.manifest.values())
+        # pages embed the hashed urls: their validators must change with the build
+        raw = json.dumps(self.manifest, sort_keys=True).encode("utf-8")
+        self.build_id = hashlib.sha256(raw).hexdigest()[:12] if self.manifest else ""
+        self.built_at = manifest_mtime(self.app.static_folder)
+
+    def url_defaults(self, endpoint, values):
+        # debug: edited sources show up without a rebuild
+        if endpoint == "static" and not current_app.debug and self.manifest:
+            hashed = self.manifest.get(values.get("filename"))
+            if hashed:
+                values["filename"] = hashed
+
+    def send(self, filename):
+        """The static view: hashed files precompressed + immutable, the rest as Flask does."""
+        if filename not in self.hashed:
+            return self.app.send_static_file(filename)
+        folder = self.app.static_folder
+        mimetype = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+        for encoding, suffix in ENCODINGS:
+            if request.accept_encodings[encoding] and os.path.isfile(os.path.join(folder, filename + suffix)):
+                response = send_from_directory(folder, filename + suffix, mimetype=mimetype)
+                response.headers["Content-Encoding"] = encoding
+                break
+        else:
+            response = send_from_directory(folder, filename, mimetype=mimetype)
+        if os.path.isfile(os.path.join(folder, filename + ".gz")):
+            response.vary.add("Accept-Encoding")
+        response.cache_control.public = True
+        response.cache_control.max_age = IMMUTABLE_MAX_AGE
+        response.cache_control.immutable = True
+        response.cache_control.no_cache = None
+        return response
+
+
+def init_app(app):
+    assets = StaticAssets(app)
+    app.extensions["static_assets"] = assets
+    app.url_defaults(assets.url_defaults)
+    app.view_functions["static"] = assets.send
+
+    @app.cli.command("assets-build")
+    @click.option("--clean", is_flag=True, help="Delete earlier builds first.")
+    def assets_build(clean):
+        """Hash + precompress static css / js into static/dist (run on deploy)."""
+        began = time.perf_counter()
+        manifest = build(app.static_folder, clean=clean)
+        assets.reload()
+        for logical, hashed in sorted(manifest.items()):
+            click.echo(f"  {logical} -> {hashed}")
+        click.echo(f"Built {len(manifest)} assets in {time.perf_counter() - began:.2f}s")
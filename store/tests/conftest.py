@@ -0,0 +1,95 @@
+# conftest.py -- the app on a throwaway SQLite file, cookie carts, inline jobs
+import os
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope="session")
+def app(tmp_path_factory):
+    tmp = tmp_path_factory.mktemp("store")
+    os.environ["DATABASE_URL"] = f"sqlite:///{tmp / 'store.db'}"
+    os.environ["LOCAL_REDIS_PATH"] = str(tmp / "local_redis.db")
+    os.environ["JOBS_BACKEND"] = "sync"
+    os.environ.pop("REDIS_URL", None)
+    os.environ.pop("CART_BACKEND", None)
+
+    from backend import app
+    from models import db
+
+    app.config.update(TESTING=True, WTF_CSRF_ENABLED=False)
+    with app.app_context():
+        db.create_all()
+    yield app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def admin_client(client):
+    with client.session_transaction() as sess:
+        sess["is_admin"] = True
+    return client
+
+
+@pytest.fixture(params=["cookie", "redis"])
+def cart_backend(request, app, monkeypatch):
+    """Run a test with each cart store; redis is a fakeredis-backed RedisCartStore."""
+    from cart_store import RedisCartStore, SessionCartStore
+
+    if request.param == "redis":
+        fakeredis = pytest.importorskip("fakeredis")
+        store = RedisCartStore(client=fakeredis.FakeRedis())
+    else:
+        store = SessionCartStore()
+    monkeypatch.setitem(app.extensions, "cart_store", store)
+    return store
+
+
+@pytest.fixture
+def products(app):
+    """26 products, removed again after the test."""
+    from models import db, Product
+
+    with app.app_context():
+        rows = [Product(title=f"Product {i}", price=10 + i, category="test") for i in range(26)]
+        db.session.add_all(rows)
+        db.session.commit()
+        ids = [p.id for p in rows]
+    yield ids
+    with app.app_context():
+        Product.query.filter(Product.id.in_(ids)).delete(synchronize_session=False)
+        db.session.commit()
+
+
+@pytest.fixture
+def paypal_stub():
+    """A local PayPal stub (paypal_stub.py) on a free port; the server's state is `.state`."""
+    import paypal_stub
+
+    server = paypal_stub.make_server()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    server.base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    server.state = server.RequestHandlerClass.state
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def gateway(paypal_stub):
+    """A PayPalGateway against the stub, installed as the process-wide gateway."""
+    pytest.importorskip("requests")
+    from paypal_gateway import PayPalGateway, set_gateway
+
+    gateway = PayPalGateway("client", "secret", paypal_stub.base_url, connect_timeout=1, read_timeout=2)
+    set_gateway(gateway)
+    yield gateway
+    set_gateway(None)
@@ -0,0 +1,54 @@
+# single-line cart endpoints use the per-line store calls, batches apply as one change
+import pytest
+
+from cart_store import SessionCartStore
+
+
+class RecordingStore(SessionCartStore):
+    def __init__(self):
+        self.calls = []
+
+    def add(self, cart_id, pid, qty):
+        self.calls.append("add")
+        return super().add(cart_id, pid, qty)
+
+    def set(self, cart_id, pid, qty):
+        self.calls.append("set")
+        return super().set(cart_id, pid, qty)
+
+    def remove(self, cart_id, pid):
+        self.calls.append("remove")
+        return super().remove(cart_id, pid)
+
+    def apply(self, cart_id, ops):
+        self.calls.append("apply")
+        return super().apply(cart_id, ops)
+
+
+@pytest.fixture
+def store(app, monkeypatch):
+    store = RecordingStore()
+    monkeypatch.setitem(app.extensions, "cart_store", store)
+    return store
+
+
+def test_single_line_endpoints_use_per_line_calls(client, products, store):
+    pid = products[0]
+    assert client.post("/cart/add", json={"product_id": pid, "qty": 2}).json["cart"]["count"] == 2
+    assert client.post("/cart/update", json={"product_id": pid, "qty": 5}).json["cart"]["count"] == 5
+    assert client.post("/api/cart/remove", json={"product_id": pid}).json["cart"]["count"] == 0
+    assert store.calls == ["add", "set", "remove"]
+
+
+def test_batch_applies_as_one_change(client, products, store):
+    ops = [{"op": "add", "product_id": pid, "qty": 1} for pid in products[:3]]
+    body = client.post("/api/cart/batch", json={"ops": ops}).json
+    assert body["changed"] is True
+    assert body["cart"]["count"] == 3
+    assert store.calls == ["apply"]
+
+
+def test_unknown_product_is_not_added(client, store):
+    response = client.post("/cart/add", json={"product_id": 999999, "qty": 1})
+    assert response.status_code == 404
+    assert store.calls == []
@@ -0,0 +1,70 @@
+# every cart endpoint prices the cart with a constant number of queries
+import pytest
+from sqlalchemy import event
+
+from cart_store import SessionCartStore
+from models import db
+
+LINE_COUNTS = (1, 5, 25)
+
+
+class QueryCounter:
+    def __init__(self, engine):
+        self.engine = engine
+        self.count = 0
+
+    def _count(self, *args):
+        self.count += 1
+
+    def __enter__(self):
+        event.listen(self.engine, "before_cursor_execute", self._count)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, "before_cursor_execute", self._count)
+
+
+def _fill_cart(client, store, ids):
+    cart = {str(pid): 2 for pid in ids}
+    with client.session_transaction() as sess:
+        if isinstance(store, SessionCartStore):
+            sess["cart"] = cart
+        else:
+            sess["cart_id"] = "query-count"
+            store.replace("query-count", cart)
+
+
+def _queries(app, client, store, ids, request):
+    _fill_cart(client, store, ids)
+    with app.app_context():
+        engine = db.engine
+    with QueryCounter(engine) as counter:
+        response = request(client)
+    assert response.status_code == 200
+    return counter.count
+
+
+ENDPOINTS = {
+    "cart page": lambda c, pid: c.get("/cart"),
+    "api cart": lambda c, pid: c.get("/api/cart"),
+    "add": lambda c, pid: c.post("/cart/add", json={"product_id": pid, "qty": 1}),
+    "update": lambda c, pid: c.post("/cart/update", json={"product_id": pid, "qty": 3}),
+    "remove": lambda c, pid: c.post("/api/cart/remove", json={"product_id": pid}),
+    "batch": lambda c, pid: c.post("/api/cart/batch", json={"ops": [
+        {"op": "add", "product_id": pid, "qty": 1},
+        {"op": "set", "product_id": pid, "qty": 4},
+    ]}),
+}
+
+
+@pytest.mark.parametrize("name", sorted(ENDPOINTS))
+def test_cart_endpoint_query_count_does_not_grow_with_lines(app, client, cart_backend, products, name):
+    endpoint = ENDPOINTS[name]
+    # writes touch a product that is not in the cart yet, so every size pays the same lookup
+    target = products[-1]
+    counts = {
+        lines: _queries(app, client, cart_backend, products[:lines], lambda c: endpoint(c, target))
+        for lines in LINE_COUNTS
+    }
+    assert len(set(counts.values())) == 1, counts
+    assert counts[LINE_COUNTS[0]] <= 2, counts
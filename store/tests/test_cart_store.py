@@ -0,0 +1,76 @@
+# RedisCartStore against fakeredis: per-line commands, batches, the WATCH retry
+import pytest
+from flask import Flask
+
+import cart_store
+from cart_store import RedisCartStore
+
+fakeredis = pytest.importorskip("fakeredis")
+
+
+@pytest.fixture
+def server():
+    return fakeredis.FakeServer()
+
+
+@pytest.fixture
+def store(server):
+    return RedisCartStore(client=fakeredis.FakeRedis(server=server), ttl=600)
+
+
+def test_redis_backend_without_redis_url_fails_at_startup(monkeypatch):
+    monkeypatch.setenv("CART_BACKEND", "redis")
+    monkeypatch.delenv("REDIS_URL", raising=False)
+    with pytest.raises(RuntimeError, match="REDIS_URL"):
+        cart_store.init_app(Flask(__name__))
+
+
+def test_add_update_remove(store):
+    assert store.get("c1") == {}
+    assert store.add("c1", 3, 2) == {"3": 2}
+    assert store.add("c1", 3, 1) == {"3": 3}
+    assert 0 < store.client.ttl("cart:c1") <= 600
+    assert store.add("c1", 4, 1) == {"3": 3, "4": 1}
+    assert store.set("c1", 3, 5) == {"3": 5, "4": 1}
+    assert store.set("c1", 4, 0) == {"3": 5}
+    assert store.add("c1", 3, -5) == {}
+    store.add("c1", 7, 1)
+    assert store.remove("c1", 7) == {}
+
+
+def test_concurrent_adds_do_not_overwrite_each_other(server):
+    tab_a = RedisCartStore(client=fakeredis.FakeRedis(server=server))
+    tab_b = RedisCartStore(client=fakeredis.FakeRedis(server=server))
+    tab_a.add("c1", 1, 1)
+    tab_b.add("c1", 2, 1)
+    assert tab_a.add("c1", 1, 1) == {"1": 2, "2": 1}
+
+
+def test_batch_applies_all_ops(store):
+    store.add("c1", 1, 1)
+    cart, changed = store.apply("c1", [("add", 1, 2), ("set", 2, 4), ("remove", 1, 0), ("add", 3, 1)])
+    assert changed is True
+    assert cart == {"2": 4, "3": 1}
+    assert store.get("c1") == cart
+    assert store.apply("c1", [("set", 2, 4)]) == ({"2": 4, "3": 1}, False)
+
+
+def test_batch_retries_when_cart_changes_under_watch(server, store, monkeypatch):
+    other_tab = RedisCartStore(client=fakeredis.FakeRedis(server=server))
+    store.add("c1", 1, 1)
+    calls = []
+    real_apply_ops = cart_store.apply_ops
+
+    def racing_apply_ops(cart, ops):
+        calls.append(dict(cart))
+        if len(calls) == 1:
+            # another request writes between WATCH + read and EXEC
+            other_tab.add("c1", 9, 1)
+        return real_apply_ops(cart, ops)
+
+    monkeypatch.setattr(cart_store, "apply_ops", racing_apply_ops)
+    cart, changed = store.apply("c1", [("add", 1, 1), ("add", 2, 1)])
+    assert calls == [{"1": 1}, {"1": 1, "9": 1}]
+    assert changed is True
+    assert cart == {"1": 2, "2": 1, "9": 1}
+    assert store.get("c1") == cart
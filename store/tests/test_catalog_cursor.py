@@ -0,0 +1,53 @@
+# keyset cursors: round trip, and tampered cursors rejected as 400, not 500
+import base64
+import json
+from decimal import Decimal
+
+import pytest
+
+from catalog import decode_cursor, encode_cursor, sort_keys
+
+
+def _raw_cursor(data):
+    return base64.urlsafe_b64encode(json.dumps(data).encode()).decode().rstrip("=")
+
+
+TAMPERED = [
+    {"s": "price_asc", "v": ["abc", 1]},
+    {"s": "price_asc", "v": ["NaN", 1]},
+    {"s": "price_asc", "v": ["12.5", "1"]},
+    {"s": "price_asc", "v": [None, 1]},
+    {"s": "", "v": [[1]]},
+    {"s": "", "v": [True]},
+    {"s": "", "v": [{"a": 1}]},
+    {"s": "title_asc", "v": [5, 1]},
+    {"s": "", "v": "1"},
+]
+
+
+def test_cursor_round_trip():
+    keys = sort_keys("price_asc")
+    cursor = encode_cursor("price_asc", [Decimal("12.50"), 7])
+    assert decode_cursor(cursor, "price_asc", keys) == [Decimal("12.50"), 7]
+
+
+@pytest.mark.parametrize("data", TAMPERED)
+def test_tampered_cursor_raises_value_error(data):
+    sort = data["s"] or None
+    with pytest.raises(ValueError):
+        decode_cursor(_raw_cursor(data), sort, sort_keys(sort))
+
+
+@pytest.mark.parametrize("data", TAMPERED)
+def test_api_answers_400_for_tampered_cursor(client, data):
+    params = {"cursor": _raw_cursor(data)}
+    if data["s"]:
+        params["sort"] = data["s"]
+    response = client.get("/api/products", query_string=params)
+    assert response.status_code == 400
+    assert response.json == {"error": "invalid cursor"}
+
+
+def test_admin_list_drops_tampered_cursor(admin_client):
+    response = admin_client.get("/admin/", query_string={"sort": "price_asc", "cursor": _raw_cursor(TAMPERED[0])})
+    assert response.status_code == 302
@@ -0,0 +1,40 @@
+# filter sidebar facets
+import pytest
+
+from catalog_cache import bump_catalog_version
+from models import db, Product
+
+
+@pytest.fixture
+def one_price(app):
+    """A catalog where every product costs the same: the price range has a single edge."""
+    with app.app_context():
+        db.session.add_all([Product(title=f"Same {i}", price=25, category="facet-test") for i in range(3)])
+        db.session.commit()
+        bump_catalog_version()
+    yield
+    with app.app_context():
+        Product.query.filter_by(category="facet-test").delete()
+        db.session.commit()
+        bump_catalog_version()
+
+
+def test_price_histogram_with_one_price(client, one_price):
+    response = client.get("/api/products/facets")
+    assert response.status_code == 200
+    price = response.json["price"]
+    assert len(price) == 1
+    assert price[0]["count"] == 3
+    assert price[0]["min"] <= 25 < price[0]["max"]
+
+
+def test_products_page_with_one_price(client, one_price):
+    assert client.get("/products").status_code == 200
+
+
+def test_price_histogram_buckets(client, products):
+    with client.application.app_context():
+        bump_catalog_version()
+    price = client.get("/api/products/facets").json["price"]
+    assert len(price) > 1
+    assert sum(bucket["count"] for bucket in price) == len(products)
@@ -0,0 +1,69 @@
+# validators and Cache-Control on catalog reads
+import time
+
+import pytest
+
+
+def test_catalog_read_sends_stale_while_revalidate(client):
+    response = client.get("/api/products")
+    assert response.status_code == 200
+    directives = {d.strip() for d in response.headers["Cache-Control"].split(",")}
+    assert {"public", "max-age=60", "s-maxage=60", "stale-while-revalidate=30"} <= directives
+
+
+def test_not_modified_keeps_cache_control(client):
+    etag = client.get("/api/products").headers["ETag"]
+    response = client.get("/api/products", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert "stale-while-revalidate=30" in response.headers["Cache-Control"]
+
+
+def test_page_validators_change_with_asset_build(app, client, monkeypatch):
+    assets = app.extensions["static_assets"]
+    first = client.get("/products")
+    assert first.status_code == 200
+    etag = first.headers["ETag"]
+    assert client.get("/products", headers={"If-None-Match": etag}).status_code == 304
+
+    # redeploy with new css / js: same catalog version, new dist/ names
+    monkeypatch.setattr(assets, "build_id", assets.build_id + "new")
+    monkeypatch.setattr(assets, "built_at", int(time.time()) + 60)
+    response = client.get("/products", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    modified_since = {"If-Modified-Since": first.headers["Last-Modified"]}
+    assert client.get("/products", headers=modified_since).status_code == 200
+
+
+def test_api_etag_ignores_asset_build(app, client, monkeypatch):
+    etag = client.get("/api/products").headers["ETag"]
+    monkeypatch.setattr(app.extensions["static_assets"], "build_id", "other")
+    assert client.get("/api/products", headers={"If-None-Match": etag}).status_code == 304
+
+
+@pytest.mark.parametrize("url", ["/api/products", "/products", "/api/products/facets"])
+def test_public_response_never_sets_cookie(client, url):
+    # a visitor with a cart: permanent session, refreshed on every other request
+    with client.session_transaction() as sess:
+        sess.permanent = True
+        sess["cart_id"] = "abc"
+    for headers in ({}, {"If-None-Match": client.get(url).headers["ETag"]}):
+        response = client.get(url, headers=headers)
+        assert "public" in response.headers["Cache-Control"]
+        assert "Set-Cookie" not in response.headers
+        assert "Cookie" not in response.headers.get("Vary", "")
+
+
+def test_session_write_downgrades_to_private(app):
+    from flask import session
+
+    from http_cache import CatalogSessionInterface, _cache_control
+
+    with app.test_request_context("/api/products"):
+        session["cart_id"] = "abc"
+        response = _cache_control(app.response_class("{}"))
+        CatalogSessionInterface().save_session(app, session, response)
+    assert "Set-Cookie" in response.headers
+    directives = {d.strip() for d in response.headers["Cache-Control"].split(",")}
+    assert "private" in directives
+    assert not {"public", "s-maxage=60", "stale-while-revalidate=30"} & directives
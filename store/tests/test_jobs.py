@@ -0,0 +1,26 @@
+# background job backends
+import pytest
+from flask import Flask
+
+import jobs
+
+
+def test_redis_backend_without_redis_url_fails_at_startup(monkeypatch):
+    monkeypatch.setenv("JOBS_BACKEND", "redis")
+    monkeypatch.delenv("REDIS_URL", raising=False)
+    with pytest.raises(RuntimeError, match="REDIS_URL"):
+        jobs.init_app(Flask(__name__))
+
+
+def test_enqueue_records_status(app):
+    calls = []
+
+    @jobs.job("test_echo")
+    def echo(value):
+        calls.append(value)
+        return value
+
+    with app.app_context():
+        job_id = jobs.enqueue("test_echo", 7)
+        assert jobs.get_status(job_id)["state"] == "done"
+    assert calls == [7]
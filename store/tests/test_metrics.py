@@ -0,0 +1,36 @@
+# /metrics access and SQL timing bookkeeping
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+import metrics
+from models import db
+
+
+def test_metrics_without_token_is_local_only(client, monkeypatch):
+    monkeypatch.delenv("METRICS_TOKEN", raising=False)
+    assert client.get("/metrics").status_code == 200
+    remote = client.get("/metrics", environ_base={"REMOTE_ADDR": "203.0.113.7"})
+    assert remote.status_code == 403
+
+
+def test_metrics_token(client, monkeypatch):
+    monkeypatch.setenv("METRICS_TOKEN", "s3cret")
+    assert client.get("/metrics").status_code == 401
+    assert client.get("/metrics", headers={"Authorization": "Bearer nope"}).status_code == 401
+    response = client.get("/metrics", headers={"Authorization": "Bearer s3cret"},
+                          environ_base={"REMOTE_ADDR": "203.0.113.7"})
+    assert response.status_code == 200
+
+
+def test_failed_statement_leaves_no_start_time(app):
+    token = metrics._current.set(metrics.RequestStats())
+    try:
+        with app.app_context(), db.engine.connect() as conn:
+            with pytest.raises(OperationalError):
+                conn.execute(text("SELECT * FROM no_such_table"))
+            assert conn.info.get("metrics_start") == []
+            conn.execute(text("SELECT 1"))
+            assert conn.info.get("metrics_start") == []
+    finally:
+        metrics._current.reset(token)
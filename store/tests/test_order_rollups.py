@@ -0,0 +1,19 @@
+# admin revenue charts read from the daily rollups
+import pytest
+
+
+@pytest.mark.parametrize("query", [
+    {"days": 0}, {"days": -3}, {"days": 367}, {"months": 0}, {"months": -1}, {"months": 37},
+])
+def test_out_of_range_chart_window_is_rejected(admin_client, query):
+    response = admin_client.get("/admin/orders", query_string=dict(query, format="json"))
+    assert response.status_code == 400
+    assert "between" in response.json["error"]
+    assert admin_client.get("/admin/orders", query_string=query).status_code == 400
+
+
+def test_chart_window_bounds(admin_client):
+    response = admin_client.get("/admin/orders", query_string={"format": "json", "days": 366, "months": 1})
+    assert response.status_code == 200
+    assert len(response.json["daily"]) == 366
+    assert len(response.json["monthly"]) == 1
@@ -0,0 +1,91 @@
+# capture a PayPal order exactly once: stored replay, the Redis lock, the unique index
+import json
+from datetime import datetime
+
+import pytest
+
+import payments
+from models import db, Order, OrderDailyRollup
+from payments import LOCK_PREFIX, CaptureInProgress, capture_once
+from redis_client import get_redis
+
+UNITS = [{"amount": {"currency_code": "USD", "value": "19.90"}}]
+
+
+@pytest.fixture
+def paypal_order(app, gateway):
+    """A PayPal order created on the stub, ready to capture; its Order rows are removed afterwards."""
+    order_id = gateway.create_order(UNITS)["id"]
+    yield order_id
+    with app.app_context():
+        Order.query.filter_by(paypal_order_id=order_id).delete()
+        OrderDailyRollup.query.delete()
+        db.session.commit()
+
+
+def _capture(client, order_id):
+    response = client.post(f"/api/capture-paypal-order/{order_id}")
+    return response.status_code, response.json
+
+
+def test_double_submit_replays_the_stored_capture(app, client, paypal_stub, paypal_order):
+    status, first = _capture(client, paypal_order)
+    assert status == 200
+    assert first["replayed"] is False
+    status, second = _capture(client, paypal_order)
+    assert status == 200
+    assert second["replayed"] is True
+    assert second["order_id"] == first["order_id"]
+    assert second["capture"] == first["capture"]
+    assert paypal_stub.state.stats["capture_order"] == 1
+    with app.app_context():
+        assert Order.query.filter_by(paypal_order_id=paypal_order).count() == 1
+        assert get_redis().get(LOCK_PREFIX + paypal_order) is None
+
+
+def test_lock_held_elsewhere_is_waited_on(app, client, paypal_stub, paypal_order):
+    with app.app_context():
+        r = get_redis()
+        key = LOCK_PREFIX + paypal_order
+        assert r.set(key, "other-request", nx=True, ex=30)
+        try:
+            with pytest.raises(CaptureInProgress):
+                capture_once(paypal_order, wait=0.2)
+            # the holder's lock is left alone
+            assert r.get(key) == b"other-request"
+        finally:
+            r.delete(key)
+    assert paypal_stub.state.stats["capture_order"] == 0
+
+
+def test_unique_index_absorbs_a_race_no_lock_saw(app, gateway, paypal_stub, paypal_order, monkeypatch):
+    real_capture = gateway.capture_order
+
+    def capture_raced(order_id, request_id=None):
+        result = real_capture(order_id, request_id=request_id)
+        # a worker the lock does not reach stores the same capture first
+        with db.engine.begin() as conn:
+            conn.execute(Order.__table__.insert().values(
+                fullname="other worker", email="paypal@example.com", address="-", total_amount=19.90,
+                currency="USD", paypal_order_id=order_id, capture_status=result["status"],
+                capture_result=json.dumps(result), created_at=datetime.utcnow(),
+            ))
+        return result
+
+    monkeypatch.setattr(gateway, "capture_order", capture_raced)
+    with app.app_context():
+        order, result, replayed = capture_once(paypal_order)
+        assert replayed is True
+        assert order.fullname == "other worker"
+        assert Order.query.filter_by(paypal_order_id=paypal_order).count() == 1
+        # the losing insert was rolled back with its rollup
+        assert sum(r.orders for r in OrderDailyRollup.query) == 0
+
+
+def test_stored_result_is_replayed_without_paypal(app, paypal_stub, paypal_order, monkeypatch):
+    with app.app_context():
+        first = capture_once(paypal_order)
+        monkeypatch.setattr(payments, "get_gateway", lambda: pytest.fail("PayPal called again"))
+        order, result, replayed = capture_once(paypal_order)
+    assert replayed is True
+    assert result == first[1]
@@ -0,0 +1,68 @@
+# PayPalGateway against the local stub: token cache, expiry, retry policy
+import time
+
+import pytest
+
+from paypal_gateway import TOKEN_MARGIN, PayPalError, PayPalGateway
+
+pytest.importorskip("requests")
+
+UNITS = [{"amount": {"currency_code": "USD", "value": "12.00"}}]
+
+
+def test_token_and_connection_are_reused(gateway, paypal_stub):
+    for _ in range(3):
+        gateway.create_order(UNITS)
+    stats = paypal_stub.state.stats
+    assert stats["token_requests"] == 1
+    assert stats["create_order"] == 3
+    # keep-alive: token + three orders over one connection
+    assert stats["connections"] == 1
+
+
+def test_expired_token_is_refreshed(gateway, paypal_stub):
+    # tokens that are already inside the refresh margin when issued
+    paypal_stub.state.token_ttl = TOKEN_MARGIN
+    gateway.create_order(UNITS)
+    gateway.create_order(UNITS)
+    assert paypal_stub.state.stats["token_requests"] == 2
+
+
+def test_revoked_token_gets_one_fresh_try(gateway, paypal_stub):
+    gateway.create_order(UNITS)
+    paypal_stub.state.tokens.clear()
+    assert gateway.create_order(UNITS)["status"] == "CREATED"
+    stats = paypal_stub.state.stats
+    assert stats["unauthorized"] == 1
+    assert stats["token_requests"] == 2
+
+
+def test_server_errors_are_not_retried(gateway, paypal_stub):
+    paypal_stub.state.fail_next = 1
+    with pytest.raises(PayPalError) as exc:
+        gateway.create_order(UNITS)
+    assert exc.value.status == 503
+    assert exc.value.debug_id
+    # the 503 was the only attempt: the next call goes through
+    assert gateway.create_order(UNITS)["status"] == "CREATED"
+    assert paypal_stub.state.stats["create_order"] == 1
+
+
+def test_read_timeout_is_not_retried(paypal_stub):
+    gateway = PayPalGateway("client", "secret", paypal_stub.base_url, connect_timeout=1, read_timeout=0.2)
+    gateway.access_token()
+    paypal_stub.state.latency_ms = 500
+    with pytest.raises(PayPalError) as exc:
+        gateway.create_order(UNITS)
+    assert exc.value.status is None
+    time.sleep(0.6)
+    assert paypal_stub.state.stats["create_order"] == 1
+
+
+def test_connect_errors_are_retried():
+    retry = PayPalGateway("client", "secret", "http://127.0.0.1:9").session.get_adapter("https://").max_retries
+    assert (retry.total, retry.connect, retry.read, retry.status) == (2, 2, 0, 0)
+    gateway = PayPalGateway("client", "secret", "http://127.0.0.1:9", connect_timeout=0.5)
+    with pytest.raises(PayPalError) as exc:
+        gateway.access_token()
+    assert exc.value.status is None
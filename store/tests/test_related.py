@@ -0,0 +1,118 @@
+# "similar items": a local refresh matches a full rebuild and reads only its windows
+import random
+
+import pytest
+
+pytest.importorskip("numpy")
+
+import related  # noqa: E402
+from catalog_cache import catalog_cache  # noqa: E402
+from models import db, Product, ProductRelated  # noqa: E402
+
+WORDS = ["ao", "thun", "quan", "jean", "dam", "vay", "basic", "den", "trang", "xanh"]
+
+
+@pytest.fixture
+def catalog(app, monkeypatch):
+    """Two categories of 150 products with a small window, so windows do not cover a category."""
+    monkeypatch.setattr(related, "WINDOW", 16)
+    monkeypatch.setattr(related, "BLOCK", 8)
+    rnd = random.Random(7)
+    with app.app_context():
+        for category in ("rel-a", "rel-b"):
+            db.session.add_all([
+                Product(title=" ".join(rnd.sample(WORDS, 3)), price=rnd.choice([5, 9.5, 12, 20, 33, 50, 75]),
+                        rating=rnd.randint(0, 5), category=category)
+                for _ in range(150)
+            ])
+        db.session.commit()
+        related.rebuild()
+    yield
+    with app.app_context():
+        db.session.query(ProductRelated).delete()
+        Product.query.filter(Product.category.in_(["rel-a", "rel-b"])).delete(synchronize_session=False)
+        db.session.commit()
+
+
+def _stored():
+    lists = {}
+    for row in ProductRelated.query.order_by(ProductRelated.product_id, ProductRelated.rank):
+        lists.setdefault(row.product_id, []).append((row.related_id, round(row.score, 4)))
+    return lists
+
+
+def _rebuilt():
+    related.rebuild()
+    return _stored()
+
+
+def _check_refresh(product_ids, previous):
+    related.refresh(product_ids, previous)
+    refreshed = _stored()
+    assert refreshed == _rebuilt()
+
+
+def _spot(product):
+    return [(product.id, product.category, float(product.price))]
+
+
+def test_edit_moving_price_and_category(app, catalog):
+    with app.app_context():
+        product = Product.query.filter_by(category="rel-a").order_by(Product.id).first()
+        previous = _spot(product)
+        product.price, product.category, product.title = 74, "rel-b", "dam vay den"
+        db.session.commit()
+        _check_refresh([product.id], previous)
+
+
+def test_add_and_delete(app, catalog):
+    with app.app_context():
+        product = Product(title="ao thun trang", price=12, rating=4, category="rel-a")
+        db.session.add(product)
+        db.session.commit()
+        _check_refresh([product.id], [])
+
+        previous = _spot(product)
+        product_id = product.id
+        db.session.delete(product)
+        db.session.commit()
+        _check_refresh([product_id], previous)
+        assert ProductRelated.query.filter_by(product_id=product_id).count() == 0
+
+
+def test_refresh_reads_windows_not_the_category(app, catalog, monkeypatch):
+    loaded = []
+    real_init = related.CategoryIndex.__init__
+
+    def spy(self, category, rows=None):
+        real_init(self, category, rows)
+        loaded.append(len(self))
+
+    monkeypatch.setattr(related.CategoryIndex, "__init__", spy)
+    with app.app_context():
+        product = Product.query.filter_by(category="rel-a").order_by(Product.price.desc()).first()
+        previous = _spot(product)
+        product.price = 5
+        db.session.commit()
+        related.refresh([product.id], previous)
+    assert loaded and max(loaded) < 150
+
+
+def test_refresh_moves_lists_version_not_catalog_version(app, client, catalog):
+    with app.app_context():
+        product = Product.query.filter_by(category="rel-a").first()
+        product_id = product.id
+    url = f"/api/products/{product_id}/related"
+    first = client.get(url)
+    assert first.status_code == 200
+
+    with app.test_request_context():
+        catalog_version = catalog_cache.version()
+        lists_version = related.lists_version()[0]
+        related.refresh([product_id])
+    with app.test_request_context():
+        assert catalog_cache.version() == catalog_version
+        assert related.lists_version()[0] == lists_version + 1
+
+    # the related answer revalidates, the rest of the catalog keeps its validators
+    assert client.get(url, headers={"If-None-Match": first.headers["ETag"]}).status_code == 200
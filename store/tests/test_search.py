@@ -0,0 +1,49 @@
+# full-text search: folded FTS rows kept in sync by triggers
+import pytest
+
+from models import db, Product
+from search import apply_search, fold, match_expression
+
+
+def _search(q):
+    query, _ = apply_search(Product.query.filter_by(category="search-test"), q)
+    return sorted(p.title for p in query)
+
+
+@pytest.fixture
+def shirt(app):
+    with app.app_context():
+        product = Product(title="Áo Thun Basic", description="Cotton, dệt kim", price=9, category="search-test")
+        db.session.add(product)
+        db.session.commit()
+        product_id = product.id
+    yield product_id
+    with app.app_context():
+        Product.query.filter_by(category="search-test").delete()
+        db.session.commit()
+
+
+def test_fold_strips_vietnamese_diacritics():
+    assert fold("Đầm Dạ Hội") == "dam da hoi"
+    assert match_expression("Áo thun") == '"ao"* "thun"*'
+
+
+def test_search_is_diacritic_insensitive(app, shirt):
+    with app.app_context():
+        assert _search("ao thun") == ["Áo Thun Basic"]
+        assert _search("ÁO") == ["Áo Thun Basic"]
+        assert _search("det kim") == ["Áo Thun Basic"]
+        assert _search("quan") == []
+
+
+def test_triggers_follow_update_and_delete(app, shirt):
+    with app.app_context():
+        product = db.session.get(Product, shirt)
+        product.title = "Quần Jean"
+        db.session.commit()
+        assert _search("quan jean") == ["Quần Jean"]
+        assert _search("ao thun") == []
+
+        db.session.delete(product)
+        db.session.commit()
+        assert _search("quan") == []
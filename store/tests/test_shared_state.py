@@ -0,0 +1,57 @@
+# without REDIS_URL, state every worker relies on lives in one file per host
+import os
+import time
+
+from redis_client import FileRedis, get_redis
+
+
+def _worker():
+    """A second process' view of the shared state: its own connection to the same file."""
+    return FileRedis(os.environ["LOCAL_REDIS_PATH"])
+
+
+def test_file_redis_commands(tmp_path):
+    r = FileRedis(str(tmp_path / "kv.db"))
+    assert r.get("missing") is None
+    assert r.set("a", 1) is True
+    assert r.mget("a", "missing") == [b"1", None]
+    assert r.incr("a", 2) == 3
+    assert r.incr("counter") == 1
+    assert r.set("lock", "x", nx=True, ex=60) is True
+    assert r.set("lock", "y", nx=True, ex=60) is None
+    assert r.get("lock") == b"x"
+    assert r.delete("lock", "missing") == 1
+    assert r.get("lock") is None
+
+
+def test_file_redis_expired_key_can_be_taken(tmp_path):
+    r = FileRedis(str(tmp_path / "kv.db"))
+    r.set("lock", "old", ex=0.01)
+    time.sleep(0.02)
+    assert r.get("lock") is None
+    assert r.set("lock", "new", nx=True, ex=60) is True
+    assert r.get("lock") == b"new"
+
+
+def test_catalog_bump_reaches_other_workers(app, client):
+    with app.test_request_context():
+        assert isinstance(get_redis(), FileRedis)
+    first = client.get("/api/products")
+    etag = first.headers["ETag"]
+    assert client.get("/api/products", headers={"If-None-Match": etag}).status_code == 304
+
+    # an admin write handled by another worker
+    _worker().incr("catalog:version")
+
+    response = client.get("/api/products", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+
+def test_job_status_visible_from_other_workers(app):
+    import jobs
+
+    with app.app_context():
+        jobs.set_status("job-1", name="test", state="running")
+    raw = _worker().get("job:job-1")
+    assert b'"running"' in raw
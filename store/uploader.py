@@ -0,0 +1,86 @@
+# uploader.py -- where product images go: Cloudinary, or a local fake for dev / tests
+import hashlib
+import os
+import shutil
+import time
+
+from images import IMAGES_DIR
+
+CLOUDINARY_PREFIX = "https://res.cloudinary.com/"
+
+
+class CloudinaryUploader:
+    def __init__(self):
+        # imported here: only the upload job needs the SDK
+        import cloudinary
+        # 🧩 Cấu hình Cloudinary
+        cloudinary.config(
+            cloud_name=os.getenv("CLOUDINARY_CLOUD_NAME"),
+            api_key=os.getenv("CLOUDINARY_API_KEY"),
+            api_secret=os.getenv("CLOUDINARY_API_SECRET")
+        )
+
+    def upload(self, path):
+        """Upload a local file, return its public URL."""
+        import cloudinary.uploader
+        return cloudinary.uploader.upload(path).get("secure_url")
+
+    def destroy(self, url):
+        """Delete a previously uploaded image (no-op for non-Cloudinary URLs)."""
+        if url and url.startswith(CLOUDINARY_PREFIX):
+            # Tách public_id từ URL cũ
+            public_id = url.split("/")[-1].split(".")[0]
+            import cloudinary.uploader
+            cloudinary.uploader.destroy(public_id)
+
+
+class FakeUploader:
+    """
+    Copies files under static/images/uploads and returns that relative path,
+    which the templates / products.js already resolve as a local image.
+    FAKE_UPLOAD_DELAY (seconds) and FAKE_UPLOAD_FAILURES (first N calls fail)
+    simulate a slow or flaky remote.
+    """
+
+    def __init__(self, delay=None, failures=None):
+        self.delay = float(os.getenv("FAKE_UPLOAD_DELAY", 0) if delay is None else delay)
+        self.failures = int(os.getenv("FAKE_UPLOAD_FAILURES", 0) if failures is None else failures)
+        self.calls = 0
+        self.destroyed = []
+
+    def upload(self, path):
+        self.calls += 1
+        if self.delay:
+            time.sleep(self.delay)
+        if self.calls <= self.failures:
+            raise IOError(f"fake upload failure {self.calls}/{self.failures}")
+        with open(path, "rb") as f:
+            digest = hashlib.sha1(f.read()).hexdigest()[:16]
+        ext = os.path.splitext(path)[1] or ".jpg"
+        out_dir = os.path.join(IMAGES_DIR, "uploads")
+        os.makedirs(out_dir, exist_ok=True)
+        shutil.copyfile(path, os.path.join(out_dir, digest + ext))
+        return f"uploads/{digest}{ext}"
+
+    def destroy(self, url):
+        self.destroyed.append(url)
+
+
+_uploader = None
+
+
+def get_uploader():
+    """IMAGE_UPLOADER=fake selects the local fake, anything else Cloudinary."""
+    global _uploader
+    if _uploader is None:
+        if os.getenv("IMAGE_UPLOADER", "cloudinary") == "fake":
+            _uploader = FakeUploader()
+        else:
+            _uploader = CloudinaryUploader()
+    return _uploader
+
+
+def set_uploader(uploader):
+    """Swap the uploader (tests)."""
+    global _uploader
+    _uploader = uploader
@@ -0,0 +1,39 @@
+# wsgi.py -- production entry point: gunicorn -c gunicorn.conf.py wsgi:app
+import os
+import time
+
+from backend import app
+
+# what the storefront asks for right after a deploy: the grid's first page + facets
+WARMUP_URLS = [
+    "/products",
+    "/api/products?per_page=9&fields=id,title,excerpt,price,image,images,rating,category&cursor=&with_total=1",
+    "/api/products/facets",
+]
+
+
+def warm_up(app):
+    """
+    Prime the process before it takes traffic: DB connection + FTS check,
+    compiled templates and the catalog cache for the first page. With
+    preload_app this runs once in the gunicorn master and every forked
+    worker inherits the result.
+    """
+    import metrics
+    from search import fts_available
+
+    start = time.perf_counter()
+    with app.app_context():
+        fts_available()
+        for name in ("products.html", "cart.html", "base.html"):
+            app.jinja_env.get_template(name)
+    client = app.test_client()
+    for url in WARMUP_URLS:
+        client.get(url)
+    # warm-up requests are not traffic
+    metrics.registry.reset()
+    app.logger.info("warm-up done in %.0f ms", (time.perf_counter() - start) * 1000)
+
+
+if os.getenv("WARMUP", "1") not in ("0", "false", "no"):
+    warm_up(app)